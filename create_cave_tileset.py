@@ -4,8 +4,19 @@ Generate NES cave tileset PNG for Zelda 2B.
 Style for natural caves, including Death Mountain lava caves.
 """
 
+import sys
+from pathlib import Path
+
 from PIL import Image
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+import nestrace
+from nesasset import TileSheet
+
+# Profiling is enabled through $NESTOOL_PROFILE (see tools/nestrace.py)
+nestrace.setup("create_cave_tileset")
+nestrace.begin("draw")
+
 # NES palette for cave (example)
 # Index 0: black background
 # Index 1: dark brown/rock
@@ -22,16 +33,14 @@ PALETTE = [
 WIDTH = 128
 HEIGHT = 32
 
-img = Image.new('P', (WIDTH, HEIGHT))
-img.putpalette(PALETTE + [0] * 756)
+COLS = WIDTH // 8
+sheet = TileSheet.blank(COLS * (HEIGHT // 8))
 
 def set_tile_pixel(col, row, x, y, color):
-    img.putpixel((col * 8 + x, row * 8 + y), color)
+    sheet.pixels[row * COLS + col, y, x] = color
 
 def fill_tile(col, row, color):
-    for y in range(8):
-        for x in range(8):
-            set_tile_pixel(col, row, x, y, color)
+    sheet.pixels[row * COLS + col] = color
 
 def draw_tile(col, row, pattern):
     for y in range(8):
@@ -427,6 +436,10 @@ pebble_2 = [
 ]
 draw_tile(15, 1, pebble_2)
 
+nestrace.end()
 print("Cave tileset created: 64 tiles")
-img.save('/Users/jschmidt/lab/hub/.hub-data/projects/a79ec915-7144-4467-8392-2d2c0af9a18e/workspaces/0a7ebf0c-38ed-41c6-a0d0-3b3d580abd60/zelda2b/assets/tilesets/cave.png')
+with nestrace.phase("write"):
+    img = Image.fromarray(sheet.to_indexed(COLS), 'P')
+    img.putpalette(PALETTE + [0] * 756)
+    img.save(Path(__file__).resolve().parent / 'assets/tilesets/cave.png')
 print("Saved to assets/tilesets/cave.png")
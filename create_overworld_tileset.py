@@ -4,8 +4,19 @@ Generate NES overworld tileset PNG for Zelda 2B.
 Style inspired by Link's Awakening and LttP, adapted to NES 4-color constraints.
 """
 
+import sys
+from pathlib import Path
+
 from PIL import Image
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "tools"))
+import nestrace
+from nesasset import TileSheet
+
+# Profiling is enabled through $NESTOOL_PROFILE (see tools/nestrace.py)
+nestrace.setup("create_overworld_tileset")
+nestrace.begin("draw")
+
 # NES palette for overworld (example - will be finalized by PaletteDesigner)
 # Index 0: background (light green grass base)
 # Index 1: dark outline/shadow
@@ -22,18 +33,16 @@ PALETTE = [
 WIDTH = 128  # 16 tiles * 8 pixels
 HEIGHT = 128  # 16 rows * 8 pixels
 
-img = Image.new('P', (WIDTH, HEIGHT))
-img.putpalette(PALETTE + [0] * 756)
+COLS = WIDTH // 8
+sheet = TileSheet.blank(COLS * (HEIGHT // 8))
 
 def set_tile_pixel(col, row, x, y, color):
     """Set a pixel within a tile at grid position (col, row)."""
-    img.putpixel((col * 8 + x, row * 8 + y), color)
+    sheet.pixels[row * COLS + col, y, x] = color
 
 def fill_tile(col, row, color):
     """Fill entire tile with one color."""
-    for y in range(8):
-        for x in range(8):
-            set_tile_pixel(col, row, x, y, color)
+    sheet.pixels[row * COLS + col] = color
 
 def draw_tile(col, row, pattern):
     """Draw a tile from an 8x8 pattern (list of 8 strings, each 8 chars)."""
@@ -638,6 +647,10 @@ draw_tile(1, 4, tall_grass)
 # Fill more useful tiles
 # Additional ground transitions, decorations, etc.
 
+nestrace.end()
 print("Overworld tileset created: 256 tiles (16x16 grid)")
-img.save('/Users/jschmidt/lab/hub/.hub-data/projects/a79ec915-7144-4467-8392-2d2c0af9a18e/workspaces/0a7ebf0c-38ed-41c6-a0d0-3b3d580abd60/zelda2b/assets/tilesets/overworld.png')
+with nestrace.phase("write"):
+    img = Image.fromarray(sheet.to_indexed(COLS), 'P')
+    img.putpalette(PALETTE + [0] * 756)
+    img.save(Path(__file__).resolve().parent / 'assets/tilesets/overworld.png')
 print("Saved to assets/tilesets/overworld.png")
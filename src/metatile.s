@@ -20,6 +20,10 @@
 ;                       Input: A=metatile_id, X=metatile_col (0-15), Y=metatile_row (0-14)
 ;   metatile_fill_screen — Fill visible nametable with one metatile
 ;                       Input: A=metatile_id
+;   metatile_upload_attrs     — Upload a precomputed 64-byte attribute table
+;                       Input: ptr0=table, A=nametable high byte ($20/$24/...)
+;   metatile_upload_attrs_rle — Same, from an RLE-coded table
+;                       Input: ptr0=table, A=nametable high byte
 ; ============================================================================
 
 .include "nes.inc"
@@ -28,6 +32,7 @@
 .import ppu_buf_put
 
 .export metatile_draw, metatile_fill_screen
+.export metatile_upload_attrs, metatile_upload_attrs_rle
 .export metatile_data
 
 .segment "PRG_FIXED_C"
@@ -271,3 +276,76 @@ metatile_data:
 
     rts
 .endproc
+
+; ============================================================================
+; metatile_upload_attrs — Upload a screen's attribute table in one burst
+; ============================================================================
+; Input: ptr0 = 64-byte attribute table (json2asm --type map --attributes)
+;        A = nametable address high byte ($20, $24, $28, $2C)
+; Note: Writes directly to PPU (rendering off or in vblank), +1 increment.
+; Clobbers: A, Y
+; ============================================================================
+.proc metatile_upload_attrs
+    bit PPUSTATUS
+    ora #$03
+    sta PPUADDR
+    lda #$C0
+    sta PPUADDR
+
+    ldy #0
+@loop:
+    lda (ptr0), y
+    sta PPUDATA
+    iny
+    cpy #64
+    bne @loop
+    rts
+.endproc
+
+; ============================================================================
+; metatile_upload_attrs_rle — Upload an RLE-coded attribute table
+; ============================================================================
+; Input: ptr0 = RLE data (json2asm --type map --attributes --rle)
+;        A = nametable address high byte ($20, $24, $28, $2C)
+; RLE: $01-$7F = that many literal bytes follow,
+;      $81-$FF = repeat the next byte (n & $7F) times, $00 = end
+; Note: Writes directly to PPU (rendering off or in vblank), +1 increment.
+; Clobbers: A, X, Y
+; ============================================================================
+.proc metatile_upload_attrs_rle
+    bit PPUSTATUS
+    ora #$03
+    sta PPUADDR
+    lda #$C0
+    sta PPUADDR
+
+    ldy #0
+@next:
+    lda (ptr0), y           ; Control byte
+    beq @done
+    iny
+    cmp #$80
+    bcs @run
+    tax                     ; X = literal count
+@literal:
+    lda (ptr0), y
+    sta PPUDATA
+    iny
+    dex
+    bne @literal
+    beq @next               ; Always taken
+
+@run:
+    and #$7F
+    tax                     ; X = repeat count
+    lda (ptr0), y
+    iny
+@repeat:
+    sta PPUDATA
+    dex
+    bne @repeat
+    beq @next               ; Always taken
+
+@done:
+    rts
+.endproc
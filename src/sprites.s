@@ -10,12 +10,15 @@
 ;   sprite_put   — Add one sprite to OAM buffer
 ;                  Input: A=tile, X=x_pos, Y=y_pos
 ;                         tmp0=attributes
+;   metasprite_put — Add a metasprite (tools/metasprite.py tables)
+;                  Input: ptr0=metasprite, X=x_pos, Y=y_pos
+;                         tmp0=attribute bits ORed into every sprite
 ; ============================================================================
 
 .include "nes.inc"
 .include "globals.inc"
 
-.export sprite_clear, sprite_put
+.export sprite_clear, sprite_put, metasprite_put
 
 .segment "PRG_FIXED_C"
 
@@ -83,3 +86,74 @@
     ldx tmp2
     rts
 .endproc
+
+; ============================================================================
+; metasprite_put — Add a whole metasprite to the OAM buffer
+; Metasprite format (tools/metasprite.py): count byte, then per sprite
+; Y offset, tile, attributes, X offset (OAM byte order; offsets signed).
+; Input:
+;   ptr0 = metasprite data
+;   X    = X position of the origin
+;   Y    = Y position of the origin
+;   tmp0 = attribute bits ORed into every sprite (e.g. palette)
+; Output:
+;   sprite_count advanced; sprites beyond 64 are dropped. Offsets wrap
+;   at the screen edges (no clipping).
+; Timing: 64 cycles + 77 per sprite, including jsr/rts
+; Clobbers: A, X, Y, tmp1-tmp3
+; ============================================================================
+.proc metasprite_put
+    stx tmp2                ; Origin X
+    sty tmp3                ; Origin Y
+
+    ; Count = min(metasprite count, free OAM slots)
+    ldy #0
+    lda #64
+    sec
+    sbc sprite_count        ; A = free slots
+    cmp (ptr0), y
+    bcc @clip
+    lda (ptr0), y
+@clip:
+    sta tmp1
+    beq @done
+
+    ; X = OAM offset; reserve the slots up front
+    lda sprite_count
+    asl                     ; * 2
+    asl                     ; * 4
+    tax
+    lsr
+    lsr                     ; C = 0
+    adc tmp1
+    sta sprite_count
+    iny
+
+@loop:
+    lda (ptr0), y           ; Byte 0: Y = origin + offset
+    clc
+    adc tmp3
+    sta oam_buf, x
+    iny
+    lda (ptr0), y           ; Byte 1: Tile
+    sta oam_buf+1, x
+    iny
+    lda (ptr0), y           ; Byte 2: Attributes
+    ora tmp0
+    sta oam_buf+2, x
+    iny
+    lda (ptr0), y           ; Byte 3: X = origin + offset
+    clc
+    adc tmp2
+    sta oam_buf+3, x
+    iny
+    inx
+    inx
+    inx
+    inx
+    dec tmp1
+    bne @loop
+
+@done:
+    rts
+.endproc
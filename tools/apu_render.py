@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+apu_render.py — Render music and SFX data to WAV for offline auditioning.
+
+Interprets the ca65 data formats used in assets/music and assets/sfx and
+synthesizes the 2A03 pulse, triangle and noise channels with NumPy, so a
+whole song renders in a fraction of its playing time.
+
+Music format (assets/music/*.s):
+  music_<name>_channels: .word pulse1, pulse2, triangle, noise
+  Each channel stream is (note, duration_frames) byte pairs.
+  note = MIDI note number, $00 = rest, $FE = loop, $FF = end.
+  Noise notes: low nibble = noise period index, bit 7 = short (93-step) mode.
+  Channels use instruments 0, 1, 2 and 3 from instruments.s.
+
+SFX format (assets/sfx/sfx_data.s):
+  (channel_ctrl, freq_lo, freq_hi, duration_frames) records, $FF = end.
+  ctrl with duty bits (7-6) = 0 and bit 4 set selects the noise channel,
+  anything else is a pulse write. Low nibble of ctrl = volume.
+
+Output is 16-bit mono WAV. Hashes of the PCM data can be written and checked
+for audio regression testing.
+
+Usage:
+  python3 apu_render.py assets/music/overworld.s -o build/audio
+  python3 apu_render.py assets/music/*.s assets/sfx/sfx_data.s -o build/audio
+  python3 apu_render.py assets/sfx/sfx_data.s --only sfx_fanfare -o build/audio
+  python3 apu_render.py assets/music/*.s --no-wav --hashes audio_hashes.json
+  python3 apu_render.py assets/music/*.s --no-wav --check audio_hashes.json
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import wave
+from pathlib import Path
+
+import nestrace
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: NumPy is required. Install with: pip3 install numpy", file=sys.stderr)
+    sys.exit(1)
+
+
+CPU_CLOCK = 1789773          # NTSC 2A03 clock (Hz)
+FRAME_RATE = 60.0988         # NTSC frame rate (Hz)
+DEFAULT_SAMPLE_RATE = 44100
+
+NOTE_REST = 0x00
+NOTE_LOOP = 0xFE
+NOTE_END = 0xFF
+SFX_END = 0xFF
+
+# Pulse duty cycles selected by duty index 0-3
+DUTY_TABLE = [0.125, 0.25, 0.5, 0.75]
+
+# Triangle output sequence (32 steps)
+TRIANGLE_SEQ = np.array(list(range(15, -1, -1)) + list(range(16)), dtype=np.float64)
+
+# NTSC noise timer periods (CPU cycles) by period index
+NOISE_PERIODS = [4, 8, 16, 32, 64, 96, 128, 160, 202, 254, 380, 508, 762, 1016, 2034, 4068]
+
+# Music channel order in music_<name>_channels and the instrument each uses
+MUSIC_CHANNELS = ["pulse1", "pulse2", "triangle", "noise"]
+MUSIC_INSTRUMENTS = {"pulse1": 0, "pulse2": 1, "triangle": 2, "noise": 3}
+
+_LFSR_CACHE = {}
+
+
+# ============================================================================
+# ca65 data parsing
+# ============================================================================
+
+def parse_number(token: str):
+    """Parse a ca65 numeric literal ($hex, %binary, decimal). Returns None if not numeric."""
+    token = token.strip()
+    try:
+        if token.startswith("$"):
+            return int(token[1:], 16)
+        if token.startswith("%"):
+            return int(token[1:], 2)
+        return int(token, 10)
+    except ValueError:
+        return None
+
+
+def parse_asm_data(path: Path, symbols: dict = None, blocks: dict = None,
+                   words: dict = None) -> tuple:
+    """Collect constants, .byte blocks and .word blocks from a ca65 data file.
+
+    Follows .include directives relative to the including file. Returns
+    (symbols, blocks, words) where blocks maps label -> list of byte tokens
+    and words maps label -> list of word tokens. Tokens are resolved later
+    so constants may be defined after use.
+    """
+    symbols = {} if symbols is None else symbols
+    blocks = {} if blocks is None else blocks
+    words = {} if words is None else words
+    label = None
+
+    for raw in path.read_text().splitlines():
+        line = raw.split(";", 1)[0].strip()
+        if not line:
+            continue
+
+        m = re.match(r'\.include\s+"([^"]+)"', line)
+        if m:
+            parse_asm_data(path.parent / m.group(1), symbols, blocks, words)
+            continue
+
+        m = re.match(r"([A-Za-z_]\w*)\s*=\s*(\S+)$", line)
+        if m:
+            symbols[m.group(1)] = m.group(2)
+            continue
+
+        m = re.match(r"([A-Za-z_]\w*):$", line)
+        if m:
+            label = m.group(1)
+            continue
+
+        m = re.match(r"\.(byte|word)\s+(.*)$", line)
+        if m and label is not None:
+            tokens = [t.strip() for t in m.group(2).split(",") if t.strip()]
+            target = blocks if m.group(1) == "byte" else words
+            target.setdefault(label, []).extend(tokens)
+
+    return symbols, blocks, words
+
+
+def resolve(token: str, symbols: dict, depth: int = 0):
+    """Resolve a token to an integer through the constant table, or None."""
+    val = parse_number(token)
+    if val is not None or depth > 8:
+        return val
+    if token in symbols:
+        return resolve(symbols[token], symbols, depth + 1)
+    return None
+
+
+def resolve_block(tokens: list, symbols: dict):
+    """Resolve a list of byte tokens. Returns None if any token is not a constant."""
+    out = []
+    for token in tokens:
+        val = resolve(token, symbols)
+        if val is None:
+            return None
+        out.append(val & 0xFF)
+    return out
+
+
+def load_instruments(symbols: dict, blocks: dict) -> list:
+    """Return instrument_table as a list of (duty, attack, sustain, decay, release)."""
+    data = resolve_block(blocks.get("instrument_table", []), symbols) or []
+    return [tuple(data[i:i + 5]) for i in range(0, len(data) - 4, 5)]
+
+
+# ============================================================================
+# Frame-level channel state
+# ============================================================================
+
+def music_stream_events(stream: list, loops: int = 1) -> tuple:
+    """Split a (note, duration) channel stream into note and duration arrays."""
+    notes, durs = [], []
+    for i in range(0, len(stream) - 1, 2):
+        note, dur = stream[i], stream[i + 1]
+        if note in (NOTE_LOOP, NOTE_END):
+            break
+        if dur == 0:
+            continue
+        notes.append(note)
+        durs.append(dur)
+    notes = np.array(notes * loops, dtype=np.int64)
+    durs = np.array(durs * loops, dtype=np.int64)
+    return notes, durs
+
+
+def envelope(durs: np.ndarray, instrument: tuple) -> np.ndarray:
+    """Per-frame volume (0-15) for consecutive notes of the given durations."""
+    _duty, attack, sustain, decay, release = instrument
+    total = int(durs.sum())
+    starts = np.cumsum(durs) - durs
+    t = np.arange(total) - np.repeat(starts, durs)
+    length = np.repeat(durs, durs)
+
+    if decay > 0:
+        vol = np.where(t < decay, attack + (sustain - attack) * t / decay, sustain)
+    else:
+        vol = np.full(total, float(sustain))
+    if release > 0:
+        remaining = length - t
+        vol = np.where(remaining <= release, vol * remaining / (release + 1), vol)
+    return np.clip(np.round(vol), 0, 15)
+
+
+def music_channel_frames(channel: str, stream: list, instrument: tuple, loops: int) -> dict:
+    """Build per-frame frequency/volume/duty arrays for one music channel."""
+    notes, durs = music_stream_events(stream, loops)
+    note_f = np.repeat(notes, durs)
+    vol = envelope(durs, instrument) if len(durs) else np.zeros(0)
+    gate = note_f != NOTE_REST
+
+    if channel == "noise":
+        period_idx = note_f & 0x0F
+        freq = CPU_CLOCK / np.array(NOISE_PERIODS, dtype=np.float64)[period_idx]
+        return {"freq": np.where(gate, freq, 0.0), "vol": np.where(gate, vol, 0.0),
+                "mode": (note_f >> 7) & 1}
+
+    freq = 440.0 * 2.0 ** ((note_f - 69) / 12.0)
+    if channel == "triangle":
+        vol = np.full(len(note_f), 15.0)
+    return {"freq": np.where(gate, freq, 0.0), "vol": np.where(gate, vol, 0.0),
+            "duty": DUTY_TABLE[instrument[0] & 0x03]}
+
+
+def sfx_channel_frames(records: list) -> dict:
+    """Build per-frame pulse and noise state for an SFX record list.
+
+    Channel registers persist between records, so each channel holds its last
+    write until the other channel's record finishes.
+    """
+    durs = np.array([r[3] for r in records], dtype=np.int64)
+    ctrl = np.array([r[0] for r in records], dtype=np.int64)
+    lo = np.array([r[1] for r in records], dtype=np.int64)
+    hi = np.array([r[2] for r in records], dtype=np.int64)
+
+    is_noise = ((ctrl & 0xC0) == 0) & ((ctrl & 0x10) != 0)
+    vol = (ctrl & 0x0F).astype(np.float64)
+
+    timer = ((hi & 0x07) << 8) | lo
+    pulse_freq = np.where(timer >= 8, CPU_CLOCK / (16.0 * (timer + 1)), 0.0)
+    noise_freq = CPU_CLOCK / np.array(NOISE_PERIODS, dtype=np.float64)[lo & 0x0F]
+
+    rec_idx = np.repeat(np.arange(len(records)), durs)
+    out = {}
+    for name, mask, freq in (("pulse", ~is_noise, pulse_freq), ("noise", is_noise, noise_freq)):
+        # Forward-fill: index of the most recent record that wrote this channel
+        last = np.where(mask[rec_idx], rec_idx, -1)
+        last = np.maximum.accumulate(last) if len(last) else last
+        active = last >= 0
+        src = np.where(active, last, 0)
+        out[name] = {
+            "freq": np.where(active, freq[src], 0.0),
+            "vol": np.where(active, vol[src], 0.0),
+        }
+    out["pulse"]["duty"] = np.array(DUTY_TABLE)[(ctrl >> 6) & 0x03][rec_idx]
+    out["noise"]["mode"] = (lo[rec_idx] >> 7) & 1
+    return out
+
+
+# ============================================================================
+# Vectorized synthesis
+# ============================================================================
+
+def frames_to_samples(values: np.ndarray, n_samples: int, sample_rate: int) -> np.ndarray:
+    """Expand a per-frame array to per-sample resolution."""
+    if len(values) == 0:
+        return np.zeros(n_samples)
+    idx = np.minimum((np.arange(n_samples) * FRAME_RATE / sample_rate).astype(np.int64),
+                     len(values) - 1)
+    return values[idx]
+
+
+def lfsr_sequence(short_mode: bool) -> np.ndarray:
+    """Noise LFSR output sequence (1 = audible) for one full period."""
+    if short_mode in _LFSR_CACHE:
+        return _LFSR_CACHE[short_mode]
+    tap = 6 if short_mode else 1
+    length = 93 if short_mode else 32767
+    reg = 1
+    seq = np.empty(length, dtype=np.float64)
+    for i in range(length):
+        seq[i] = 0.0 if reg & 1 else 1.0
+        feedback = (reg & 1) ^ ((reg >> tap) & 1)
+        reg = (reg >> 1) | (feedback << 14)
+    _LFSR_CACHE[short_mode] = seq
+    return seq
+
+
+def synth_pulse(freq: np.ndarray, vol: np.ndarray, duty, sample_rate: int) -> np.ndarray:
+    """Pulse wave, output 0-15. duty may be a scalar or per-sample array."""
+    phase = np.cumsum(freq / sample_rate) % 1.0
+    return np.where(phase < duty, vol, 0.0)
+
+
+def synth_triangle(freq: np.ndarray, vol: np.ndarray, sample_rate: int) -> np.ndarray:
+    """32-step triangle, output 0-15. Holds its last step while silent."""
+    step = (np.cumsum(freq / sample_rate) * 32).astype(np.int64) % 32
+    return np.where(vol > 0, TRIANGLE_SEQ[step], 0.0)
+
+
+def synth_noise(freq: np.ndarray, vol: np.ndarray, mode: np.ndarray, sample_rate: int) -> np.ndarray:
+    """LFSR noise, output 0-15. freq is the LFSR clock rate."""
+    clocks = np.cumsum(freq / sample_rate).astype(np.int64)
+    long_seq = lfsr_sequence(False)
+    short_seq = lfsr_sequence(True)
+    bits = np.where(mode == 1, short_seq[clocks % len(short_seq)], long_seq[clocks % len(long_seq)])
+    return bits * vol
+
+
+def mix(pulse1: np.ndarray, pulse2: np.ndarray, triangle: np.ndarray,
+        noise: np.ndarray) -> np.ndarray:
+    """NES non-linear mixer. Returns int16 PCM with DC removed."""
+    p = pulse1 + pulse2
+    pulse_out = np.where(p > 0, 95.88 / (8128.0 / np.maximum(p, 1e-9) + 100.0), 0.0)
+    tnd = triangle / 8227.0 + noise / 12241.0
+    tnd_out = np.where(tnd > 0, 159.79 / (1.0 / np.maximum(tnd, 1e-12) + 100.0), 0.0)
+    out = pulse_out + tnd_out
+    if len(out):
+        out = out - out.mean()
+    return np.clip(np.round(out * 32767.0), -32768, 32767).astype("<i2")
+
+
+def render_music(song: str, symbols: dict, blocks: dict, words: dict,
+                 sample_rate: int = DEFAULT_SAMPLE_RATE, loops: int = 1) -> np.ndarray:
+    """Render music_<song> to int16 PCM."""
+    instruments = load_instruments(symbols, blocks)
+    channel_labels = words[f"music_{song}_channels"]
+    frames = {}
+    for name, label in zip(MUSIC_CHANNELS, channel_labels):
+        stream = resolve_block(blocks.get(label, []), symbols) or []
+        frames[name] = music_channel_frames(name, stream, instruments[MUSIC_INSTRUMENTS[name]], loops)
+
+    n_frames = max(len(f["freq"]) for f in frames.values())
+    n_samples = int(n_frames * sample_rate / FRAME_RATE)
+    up = {name: {k: frames_to_samples(v, n_samples, sample_rate) if isinstance(v, np.ndarray) else v
+                 for k, v in f.items()} for name, f in frames.items()}
+
+    return mix(
+        synth_pulse(up["pulse1"]["freq"], up["pulse1"]["vol"], up["pulse1"]["duty"], sample_rate),
+        synth_pulse(up["pulse2"]["freq"], up["pulse2"]["vol"], up["pulse2"]["duty"], sample_rate),
+        synth_triangle(up["triangle"]["freq"], up["triangle"]["vol"], sample_rate),
+        synth_noise(up["noise"]["freq"], up["noise"]["vol"], up["noise"]["mode"], sample_rate),
+    )
+
+
+def render_sfx(data: list, sample_rate: int = DEFAULT_SAMPLE_RATE) -> np.ndarray:
+    """Render one SFX record list to int16 PCM."""
+    records = []
+    for i in range(0, len(data), 4):
+        if data[i] == SFX_END or i + 3 >= len(data):
+            break
+        records.append(tuple(data[i:i + 4]))
+    if not records:
+        return np.zeros(0, dtype="<i2")
+
+    frames = sfx_channel_frames(records)
+    n_frames = len(frames["pulse"]["freq"])
+    n_samples = int(n_frames * sample_rate / FRAME_RATE)
+    pulse = {k: frames_to_samples(v, n_samples, sample_rate) for k, v in frames["pulse"].items()}
+    noise = {k: frames_to_samples(v, n_samples, sample_rate) for k, v in frames["noise"].items()}
+    silent = np.zeros(n_samples)
+
+    return mix(
+        synth_pulse(pulse["freq"], pulse["vol"], pulse["duty"], sample_rate),
+        silent, silent,
+        synth_noise(noise["freq"], noise["vol"], noise["mode"], sample_rate),
+    )
+
+
+# ============================================================================
+# Track discovery and output
+# ============================================================================
+
+def find_tracks(path: Path) -> list:
+    """Return [(track_name, render_fn)] for every song or SFX defined in a file."""
+    symbols, blocks, words = parse_asm_data(path)
+    tracks = []
+
+    songs = [m.group(1) for m in (re.match(r"music_(\w+)_channels$", w) for w in words) if m]
+    for song in songs:
+        tracks.append((f"music_{song}",
+                       lambda sr, loops, s=song: render_music(s, symbols, blocks, words, sr, loops)))
+
+    if not songs:
+        for label, tokens in blocks.items():
+            data = resolve_block(tokens, symbols)
+            if data is None or not data or data[-1] != SFX_END or (len(data) - 1) % 4 != 0:
+                continue
+            tracks.append((label, lambda sr, loops, d=data: render_sfx(d, sr)))
+
+    return tracks
+
+
+def write_wav(path: Path, pcm: np.ndarray, sample_rate: int):
+    """Write mono 16-bit PCM to a WAV file."""
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render NES music/SFX data to WAV")
+    parser.add_argument("inputs", nargs="+", help="Music or SFX .s files")
+    parser.add_argument("-o", "--output-dir", type=str, default="build/audio",
+                        help="Directory for WAV files (default: build/audio)")
+    parser.add_argument("--only", type=str, action="append", default=None,
+                        help="Render only the named track (repeatable)")
+    parser.add_argument("--rate", type=int, default=DEFAULT_SAMPLE_RATE,
+                        help=f"Sample rate in Hz (default: {DEFAULT_SAMPLE_RATE})")
+    parser.add_argument("--loops", type=int, default=1,
+                        help="Times to play each music loop (default: 1)")
+    parser.add_argument("--no-wav", action="store_true",
+                        help="Do not write WAV files (hashing only)")
+    parser.add_argument("--hashes", type=str, default=None,
+                        help="Write a JSON file of PCM SHA-256 hashes per track")
+    parser.add_argument("--check", type=str, default=None,
+                        help="Compare PCM hashes against a JSON file written by --hashes")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("apu_render", args)
+
+    out_dir = Path(args.output_dir)
+    if not args.no_wav:
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+    hashes = {}
+    total_seconds = 0.0
+    for inp in args.inputs:
+        path = Path(inp)
+        if not path.exists():
+            print(f"ERROR: {inp} not found", file=sys.stderr)
+            sys.exit(1)
+        with nestrace.phase("load", {"file": inp}):
+            tracks = find_tracks(path)
+        for name, render in tracks:
+            if args.only and name not in args.only:
+                continue
+            with nestrace.phase("encode", {"track": name}):
+                pcm = render(args.rate, args.loops)
+            seconds = len(pcm) / args.rate
+            total_seconds += seconds
+            hashes[name] = hashlib.sha256(pcm.tobytes()).hexdigest()
+            if not args.no_wav:
+                with nestrace.phase("write", {"track": name}):
+                    write_wav(out_dir / f"{name}.wav", pcm, args.rate)
+            print(f"  {name}: {seconds:.1f}s  sha256={hashes[name][:16]}")
+
+    if args.hashes:
+        Path(args.hashes).write_text(json.dumps(hashes, indent=2, sort_keys=True) + "\n")
+
+    if args.check:
+        expected = json.loads(Path(args.check).read_text())
+        changed = sorted(n for n in hashes if n in expected and expected[n] != hashes[n])
+        missing = sorted(n for n in expected if n not in hashes)
+        for n in changed:
+            print(f"CHANGED: {n}")
+        for n in missing:
+            print(f"MISSING: {n}")
+        if changed or missing:
+            print(f"FAIL: {len(changed)} changed, {len(missing)} missing", file=sys.stderr)
+            sys.exit(1)
+
+    print(f"OK: Rendered {len(hashes)} tracks ({total_seconds:.1f}s of audio)")
+
+
+if __name__ == "__main__":
+    main()
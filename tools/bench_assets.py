@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+bench_assets.py — Benchmark the asset pipeline on synthetic worst-case inputs.
+
+Generates a reproducible corpus sized at the limits of the hardware and the
+data formats, times each tool's core function in-process and each tool's
+CLI as a subprocess, and compares the results with a stored baseline.
+
+Corpus (seeded, regenerated on demand):
+- chr_full.chr     256KB of random CHR data (16384 tiles, the whole CHR space)
+- sheet_full.png   the same tiles as an indexed PNG sheet (16 tiles wide)
+- metatiles.json   4096 random metatile definitions
+- dialog.json      20000 dialog strings of up to 4 lines x 28 chars
+- raw.json         large byte and word arrays for json2asm raw mode
+
+Results are saved as JSON (minimum and median of --repeat runs). With
+--baseline, any benchmark slower than baseline * (1 + threshold) is reported
+as a regression and the exit status is 1.
+
+Usage:
+  python3 bench_assets.py generate build/bench_corpus
+  python3 bench_assets.py run
+  python3 bench_assets.py run --output build/bench.json --baseline build/bench_baseline.json
+  python3 bench_assets.py run --save-baseline build/bench_baseline.json
+  python3 bench_assets.py run --only render_chr --repeat 5
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import chr2png
+import chr_dupes
+import json2asm
+import png2chr
+import text2asm
+from nespng import save_indexed
+
+
+TOOLS_DIR = Path(__file__).resolve().parent
+DEFAULT_CORPUS = "build/bench_corpus"
+DEFAULT_BASELINE = "build/bench_baseline.json"
+CHR_SPACE_TILES = 16384     # 256KB CHR ROM
+SEED = 2026
+
+WORDS = ["THE", "PALACE", "SWORD", "MAGIC", "LINK", "CAVE", "KEY", "FIND", "NORTH",
+         "TOWN", "SPELL", "HEART", "SEEK", "GREAT", "SEA", "RAFT", "HAMMER", "BOOTS",
+         "YOU", "GOT", "A", "TO", "IN", "OF", "IT", "DARK", "LIGHT", "FAIRY", "!", "?"]
+
+
+# ============================================================================
+# Corpus generation
+# ============================================================================
+
+def random_line(rng: random.Random, max_chars: int = 28) -> str:
+    """Random dialog line of whole words, filled close to max_chars."""
+    line = rng.choice(WORDS)
+    while True:
+        word = rng.choice(WORDS)
+        if len(line) + 1 + len(word) > max_chars:
+            return line
+        line += " " + word
+
+
+def generate_corpus(out_dir: Path, tiles: int = CHR_SPACE_TILES, seed: int = SEED):
+    """Write the synthetic benchmark corpus to out_dir."""
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    chr_data = rng.randbytes(tiles * 16)
+    (out_dir / "chr_full.chr").write_bytes(chr_data)
+
+    width = 128
+    height = (tiles + 15) // 16 * 8
+    pixels = rng.randbytes(width * height).translate(bytes(i & 3 for i in range(256)))
+    save_indexed(out_dir / "sheet_full.png", pixels, width, height, chr2png.DEFAULT_PALETTE)
+
+    metatiles = [{"name": f"mt_{i}", "tl": rng.randrange(256), "tr": rng.randrange(256),
+                  "bl": rng.randrange(256), "br": rng.randrange(256), "attr": rng.randrange(16)}
+                 for i in range(4096)]
+    (out_dir / "metatiles.json").write_text(json.dumps({"name": "bench_metatiles",
+                                                        "metatiles": metatiles}))
+
+    def dialog(i):
+        return {"id": f"d{i}", "lines": [random_line(rng) for _ in range(rng.randint(1, 4))]}
+
+    n = 0
+    npcs = {}
+    for town in range(40):
+        npcs[f"town_{town}"] = [dialog(n + k) for k in range(400)]
+        n += 400
+    signs = [dialog(n + k) for k in range(1000)]
+    n += 1000
+    items = [dialog(n + k) for k in range(1000)]
+    n += 1000
+    story = [dialog(n + k) for k in range(2000)]
+    (out_dir / "dialog.json").write_text(json.dumps(
+        {"npcs": npcs, "signs": signs, "items": items, "story": story}))
+
+    raw = {
+        "big_bytes": {"type": "byte", "values": list(rng.randbytes(262144))},
+        "big_words": {"type": "word", "values": [rng.randrange(65536) for _ in range(65536)]},
+    }
+    (out_dir / "raw.json").write_text(json.dumps(raw))
+
+
+# ============================================================================
+# Benchmarks
+# ============================================================================
+
+def core_benchmarks(corpus: Path) -> dict:
+    """In-process benchmarks: name -> zero-argument callable."""
+    chr_data = (corpus / "chr_full.chr").read_bytes()
+    sheet = corpus / "sheet_full.png"
+    metatiles = json.loads((corpus / "metatiles.json").read_text())
+    dialog = json.loads((corpus / "dialog.json").read_text())
+    raw = json.loads((corpus / "raw.json").read_text())
+
+    all_dialogs = [d for group in dialog["npcs"].values() for d in group]
+    all_dialogs += dialog["signs"] + dialog["items"] + dialog["story"]
+
+    return {
+        "png_to_chr": lambda: png2chr.png_file_to_chr(sheet),
+        "render_chr": lambda: chr2png.render_chr(chr_data, cols=16, scale=1),
+        "near_dupes": lambda: chr_dupes.close_pairs(
+            np.unique(chr_dupes.tile_words(chr_data), axis=0), 2),
+        "convert_metatiles": lambda: json2asm.convert_metatiles(metatiles),
+        "encode_dialog": lambda: [text2asm.encode_dialog(d["lines"]) for d in all_dialogs],
+        "convert_raw": lambda: json2asm.convert_raw(raw),
+    }
+
+
+def cli_benchmarks(corpus: Path, scratch: Path) -> dict:
+    """Subprocess benchmarks of each tool's CLI: name -> argv."""
+    py = sys.executable
+    return {
+        "cli_png2chr": [py, str(TOOLS_DIR / "png2chr.py"), str(corpus / "sheet_full.png"),
+                        str(scratch / "out.chr")],
+        "cli_chr2png": [py, str(TOOLS_DIR / "chr2png.py"), str(corpus / "chr_full.chr"),
+                        str(scratch / "out.png"), "--scale", "1"],
+        "cli_json2asm_metatiles": [py, str(TOOLS_DIR / "json2asm.py"),
+                                   str(corpus / "metatiles.json"), str(scratch / "mt.s"),
+                                   "--type", "metatiles"],
+        "cli_json2asm_raw": [py, str(TOOLS_DIR / "json2asm.py"), str(corpus / "raw.json"),
+                             str(scratch / "raw.s"), "--type", "raw"],
+        "cli_text2asm": [py, str(TOOLS_DIR / "text2asm.py"), str(corpus / "dialog.json"),
+                         str(scratch / "dialog.s")],
+        "cli_validate_chr": [py, str(TOOLS_DIR / "validate_chr.py"), str(corpus / "chr_full.chr")],
+    }
+
+
+def time_callable(fn, repeat: int) -> list:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def time_command(argv: list, repeat: int) -> list:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return [(name, base_s, new_s)] for benchmarks slower than the threshold allows."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        if res["min"] > base["min"] * (1.0 + threshold):
+            regressions.append((name, base["min"], res["min"]))
+    return regressions
+
+
+def run(args):
+    corpus = Path(args.corpus)
+    if not (corpus / "chr_full.chr").exists():
+        print(f"Generating corpus in {corpus} ...")
+        generate_corpus(corpus, args.tiles)
+    scratch = corpus / "scratch"
+    scratch.mkdir(exist_ok=True)
+
+    results = {}
+    for name, fn in core_benchmarks(corpus).items():
+        if args.only and name not in args.only:
+            continue
+        runs = time_callable(fn, args.repeat)
+        results[name] = {"kind": "core", "min": min(runs), "median": statistics.median(runs),
+                         "runs": runs}
+        print(f"  {name:<26} {min(runs) * 1000:10.2f} ms")
+    if not args.no_cli:
+        for name, argv in cli_benchmarks(corpus, scratch).items():
+            if args.only and name not in args.only:
+                continue
+            runs = time_command(argv, args.repeat)
+            results[name] = {"kind": "cli", "min": min(runs), "median": statistics.median(runs),
+                             "runs": runs}
+            print(f"  {name:<26} {min(runs) * 1000:10.2f} ms")
+
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "repeat": args.repeat, "tiles": args.tiles},
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline and Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text())
+        for name, res in results.items():
+            base = baseline["results"].get(name)
+            if base:
+                change = (res["min"] / base["min"] - 1.0) * 100.0
+                print(f"  {name:<26} {base['min'] * 1000:10.2f} → {res['min'] * 1000:10.2f} ms "
+                      f"({change:+.1f}%)")
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new in regressions:
+            print(f"REGRESSION: {name} {old * 1000:.2f} → {new * 1000:.2f} ms "
+                  f"(threshold {args.threshold * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+
+    print(f"OK: {len(results)} benchmarks")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the asset pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="Generate the synthetic corpus")
+    gen.add_argument("out_dir", nargs="?", default=DEFAULT_CORPUS,
+                     help=f"Corpus directory (default: {DEFAULT_CORPUS})")
+    gen.add_argument("--tiles", type=int, default=CHR_SPACE_TILES,
+                     help=f"Tiles in the CHR corpus (default: {CHR_SPACE_TILES})")
+
+    bench = sub.add_parser("run", help="Run benchmarks")
+    bench.add_argument("--corpus", type=str, default=DEFAULT_CORPUS,
+                       help=f"Corpus directory, generated if missing (default: {DEFAULT_CORPUS})")
+    bench.add_argument("--tiles", type=int, default=CHR_SPACE_TILES,
+                       help="Tiles in the CHR corpus when generating it")
+    bench.add_argument("--repeat", type=int, default=3,
+                       help="Runs per benchmark; the minimum is compared (default: 3)")
+    bench.add_argument("--only", type=str, action="append", default=None,
+                       help="Run only the named benchmark (repeatable)")
+    bench.add_argument("--no-cli", action="store_true", help="Skip CLI subprocess benchmarks")
+    bench.add_argument("--output", type=str, default=None, help="Write results JSON")
+    bench.add_argument("--baseline", type=str, default=DEFAULT_BASELINE,
+                       help=f"Baseline results JSON to compare against (default: {DEFAULT_BASELINE})")
+    bench.add_argument("--save-baseline", type=str, default=None,
+                       help="Write these results as the new baseline")
+    bench.add_argument("--threshold", type=float, default=0.20,
+                       help="Allowed slowdown before flagging a regression (default: 0.20)")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        generate_corpus(Path(args.out_dir), args.tiles)
+        print(f"OK: Corpus written to {args.out_dir}")
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
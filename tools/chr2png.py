@@ -15,11 +15,9 @@ import argparse
 import sys
 from pathlib import Path
 
-try:
-    from PIL import Image
-except ImportError:
-    print("ERROR: Pillow is required. Install with: pip3 install Pillow", file=sys.stderr)
-    sys.exit(1)
+import nestrace
+from nesasset import TILE_SIZE, chr_to_indexed
+from nespng import encode_indexed
 
 
 # Default NES-ish grayscale palette for review
@@ -60,58 +58,36 @@ def parse_palette(palette_str: str) -> list:
 
 def chr_to_pixels(chr_data: bytes) -> list:
     """Decode CHR data into a list of tiles, each tile = 8x8 array of palette indices (0-3)."""
-    tiles = []
-    num_tiles = len(chr_data) // 16
-    for t in range(num_tiles):
-        offset = t * 16
-        tile = []
-        for row in range(8):
-            row_pixels = []
-            byte0 = chr_data[offset + row]
-            byte1 = chr_data[offset + 8 + row]
-            for col in range(8):
-                bit = 7 - col
-                val = ((byte0 >> bit) & 1) | (((byte1 >> bit) & 1) << 1)
-                row_pixels.append(val)
-            tile.append(row_pixels)
-        tiles.append(tile)
-    return tiles
-
+    pixels, _width, height = chr_to_indexed(chr_data, cols=1)
+    return [[list(pixels[y * TILE_SIZE:(y + 1) * TILE_SIZE]) for y in range(t, t + TILE_SIZE)]
+            for t in range(0, height, TILE_SIZE)]
 
-def render_chr(chr_data: bytes, cols: int = 16, scale: int = 1,
-               palette: list = None) -> Image.Image:
-    """Render CHR data as a PIL Image."""
-    if palette is None:
-        palette = DEFAULT_PALETTE
 
-    tiles = chr_to_pixels(chr_data)
-    if not tiles:
+def render_indexed(chr_data: bytes, cols: int = 16, scale: int = 1) -> tuple:
+    """(row-major palette indices, width, height) of CHR tiles laid out cols wide."""
+    # Unused cells in the last row are index 0, i.e. palette[0] like the background
+    pixels, width, height = chr_to_indexed(chr_data, cols)
+    if not pixels:
         raise ValueError("No tiles found in CHR data.")
+    if scale > 1:
+        wide = bytearray(len(pixels) * scale)
+        for k in range(scale):
+            wide[k::scale] = pixels
+        width *= scale
+        pixels = b"".join(wide[y * width:(y + 1) * width] * scale for y in range(height))
+        height *= scale
+    return pixels, width, height
 
-    num_tiles = len(tiles)
-    rows = (num_tiles + cols - 1) // cols
 
-    img_w = cols * 8 * scale
-    img_h = rows * 8 * scale
-    img = Image.new("RGB", (img_w, img_h), palette[0])
-
-    for idx, tile in enumerate(tiles):
-        tx = (idx % cols) * 8
-        ty = (idx // cols) * 8
-        for r in range(8):
-            for c in range(8):
-                color = palette[tile[r][c]]
-                for sy in range(scale):
-                    for sx in range(scale):
-                        img.putpixel((
-                            (tx + c) * scale + sx,
-                            (ty + r) * scale + sy
-                        ), color)
-
-    return img
+def render_chr(chr_data: bytes, cols: int = 16, scale: int = 1,
+               palette: list = None) -> bytes:
+    """Render CHR data as indexed PNG file data."""
+    if palette is None:
+        palette = DEFAULT_PALETTE
+    return encode_indexed(*render_indexed(chr_data, cols, scale), palette)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Render NES CHR data as PNG")
     parser.add_argument("input", help="Input CHR file")
     parser.add_argument("output", help="Output PNG file")
@@ -123,9 +99,12 @@ def main():
                         help="4 hex colors, comma-separated (e.g., '#000,#555,#aaa,#fff')")
     parser.add_argument("--nes-palette", type=str, default=None,
                         help="4 NES palette indices, comma-separated (e.g., '0x0F,0x00,0x10,0x30')")
-    args = parser.parse_args()
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("chr2png", args)
 
-    chr_data = Path(args.input).read_bytes()
+    with nestrace.phase("load"):
+        chr_data = Path(args.input).read_bytes()
     if len(chr_data) < 16:
         print(f"ERROR: CHR file too small ({len(chr_data)} bytes, need at least 16)", file=sys.stderr)
         sys.exit(1)
@@ -137,11 +116,15 @@ def main():
         indices = [int(x.strip(), 0) for x in args.nes_palette.split(",")]
         palette = [NES_PALETTE[i & 0x3F] for i in indices]
 
-    img = render_chr(chr_data, cols=args.cols, scale=args.scale, palette=palette)
-    img.save(args.output)
+    with nestrace.phase("decode"):
+        pixels, width, height = render_indexed(chr_data, cols=args.cols, scale=args.scale)
+    with nestrace.phase("encode"):
+        png = encode_indexed(pixels, width, height, palette)
+    with nestrace.phase("write"):
+        Path(args.output).write_bytes(png)
 
     num_tiles = len(chr_data) // 16
-    print(f"OK: Rendered {num_tiles} tiles to {args.output} ({img.size[0]}x{img.size[1]})")
+    print(f"OK: Rendered {num_tiles} tiles to {args.output} ({width}x{height})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+chr_anim.py — Compile tile animations into per-frame 1KB CHR banks.
+
+Animating tiles by rewriting them through the PPU buffer costs VRAM
+bandwidth every frame. MMC3 can instead swap a 1KB CHR window (64 tiles)
+with one mmc3_set_chr_1k call. This tool builds those banks: for each
+window it copies the 1KB bank of the source CHR, and for each animation
+frame overwrites the animated tiles with that frame's source tiles, so
+every surrounding tile stays identical across the frames.
+
+Several animated sets can share a window. The window then cycles through
+lcm(frame counts) combined frames, and set i shows its frame (f mod n_i).
+Identical combined banks are stored once.
+
+Banks are built by copying 16-byte tiles of the raw CHR data, so the tool
+needs neither NumPy nor Pillow.
+
+Config (JSON, paths relative to the repo root like config/chr_layout.json):
+
+  {
+    "bank": 24,                             first CHR ROM bank of the output
+    "windows": [
+      {
+        "name": "overworld_water",
+        "chr": "assets/tilesets/overworld.chr",
+        "window": 0,                        1KB bank of that file to animate
+        "register": 2,                      MMC3 1KB register (2-5) mapping it
+        "sets": [
+          {"name": "water", "tiles": [8], "frames": [[8], [9]]}
+        ]
+      }
+    ]
+  }
+
+"tiles" are tile indices in the file (inside the window); each entry of
+"frames" lists the source tiles copied onto them for that frame.
+
+Outputs:
+- CHR: every window's banks back to back, to be placed at "bank" through
+  config/chr_layout.json (tools/chr_splice.py)
+- .s: {name}_anim_banks (absolute CHR bank per frame), {name}_anim_len
+  and {name}_anim_reg per window. Per animation step:
+
+      ldy anim_frame
+      lda overworld_water_anim_banks, y
+      ldx #overworld_water_anim_reg
+      jsr mmc3_set_chr_1k
+
+In CHR mode 0 registers 2-5 map $1000-$1FFF. The game runs CHR mode 0
+with the background pattern table at $0000 (src/mmc3.s, src/main.s), so
+these windows can only animate sprite tiles as it stands; background tiles
+need the background table moved to $1000, or CHR mode 1. No animation is
+configured in the build until then.
+
+Usage:
+  python3 chr_anim.py anims.json build/chr_anim.chr build/chr_anim.s
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+import nestrace
+from nesasset import TILE_BYTES, TILES_PER_BANK
+
+
+MMC3_1K_REGISTERS = range(2, 6)
+MAX_FRAMES = 256
+
+
+def window_frames(data: bytes, window: dict) -> list:
+    """Combined frames of one window, as 1KB banks of CHR data."""
+    name = window["name"]
+    tiles = len(data) // TILE_BYTES
+    first = window["window"] * TILES_PER_BANK
+    if first + TILES_PER_BANK > tiles:
+        raise ValueError(f"{name}: window {window['window']} is outside the "
+                         f"{tiles}-tile CHR")
+    claimed = {}
+    for s in window["sets"]:
+        if not s["frames"]:
+            raise ValueError(f"{name}/{s['name']}: no frames")
+        for tile in s["tiles"]:
+            if not first <= tile < first + TILES_PER_BANK:
+                raise ValueError(f"{name}/{s['name']}: tile {tile} is outside window "
+                                 f"{window['window']} (tiles {first}-{first + TILES_PER_BANK - 1})")
+            if tile in claimed:
+                raise ValueError(f"{name}/{s['name']}: tile {tile} also animated by {claimed[tile]}")
+            claimed[tile] = s["name"]
+        for f, sources in enumerate(s["frames"]):
+            if len(sources) != len(s["tiles"]):
+                raise ValueError(f"{name}/{s['name']}: frame {f} has {len(sources)} tiles, "
+                                 f"expected {len(s['tiles'])}")
+            bad = [t for t in sources if not 0 <= t < tiles]
+            if bad:
+                raise ValueError(f"{name}/{s['name']}: frame {f} source tiles {bad} not in CHR")
+
+    count = math.lcm(*(len(s["frames"]) for s in window["sets"]))
+    if count > MAX_FRAMES:
+        raise ValueError(f"{name}: {count} combined frames (lcm of the set lengths) "
+                         f"exceed {MAX_FRAMES}")
+    frames = []
+    for f in range(count):
+        bank = bytearray(data[first * TILE_BYTES:(first + TILES_PER_BANK) * TILE_BYTES])
+        for s in window["sets"]:
+            sources = s["frames"][f % len(s["frames"])]
+            for tile, src in zip(s["tiles"], sources):
+                at = (tile - first) * TILE_BYTES
+                bank[at:at + TILE_BYTES] = data[src * TILE_BYTES:(src + 1) * TILE_BYTES]
+        frames.append(bytes(bank))
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile tile animations into CHR bank frames")
+    parser.add_argument("config", help="Animation config JSON")
+    parser.add_argument("chr_output", help="Output CHR (all windows' banks)")
+    parser.add_argument("asm_output", help="Output .s with the frame→bank tables")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the tables")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("chr_anim", args)
+
+    with nestrace.phase("load"):
+        config = json.loads(Path(args.config).read_text())
+        sheets = {}
+        for window in config["windows"]:
+            if window["chr"] not in sheets:
+                sheets[window["chr"]] = Path(window["chr"]).read_bytes()
+
+    banks = []                  # unique 1KB banks, output order
+    tables = []
+    with nestrace.phase("encode"):
+        for window in config["windows"]:
+            if window["register"] not in MMC3_1K_REGISTERS:
+                print(f"ERROR: {window['name']}: register {window['register']} is not a "
+                      f"1KB CHR register (2-5)", file=sys.stderr)
+                sys.exit(1)
+            try:
+                frames = window_frames(sheets[window["chr"]], window)
+            except ValueError as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                sys.exit(1)
+            index = {}
+            table = []
+            for frame in frames:
+                if frame not in index:
+                    index[frame] = len(banks)
+                    banks.append(frame)
+                table.append(config["bank"] + index[frame])
+            tables.append((window, table, len(index)))
+
+    out = [
+        "; ==========================================================",
+        "; CHR Bank Animations — auto-generated by chr_anim.py",
+        f"; Source: {args.config}",
+        "; DO NOT EDIT — regenerate from animation config",
+        "; Per window: CHR bank per frame for mmc3_set_chr_1k",
+        "; ==========================================================",
+        "",
+    ]
+    if args.segment:
+        out += [f'.segment "{args.segment}"', ""]
+    for window, table, _unique in tables:
+        name = window["name"]
+        out.append(f"{name}_anim_len = {len(table)}")
+        out.append(f"{name}_anim_reg = {window['register']}")
+        out.append(f".export {name}_anim_len, {name}_anim_reg, {name}_anim_banks")
+        out.append(f"{name}_anim_banks:")
+        for i in range(0, len(table), 16):
+            out.append("    .byte " + ", ".join(f"${b:02X}" for b in table[i:i + 16]))
+        out.append("")
+
+    with nestrace.phase("write"):
+        for path in (args.chr_output, args.asm_output):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.chr_output).write_bytes(b"".join(banks))
+        Path(args.asm_output).write_text("\n".join(out))
+
+    for window, table, unique in tables:
+        animated = sum(len(s["tiles"]) for s in window["sets"])
+        print(f"  {window['name']:<20} {len(table):3d} frames, {unique} banks, "
+              f"{animated} animated tiles, register {window['register']}")
+    last = config["bank"] + len(banks) - 1
+    print(f"OK: {len(banks)} CHR banks ({config['bank']}-{last}) → {args.chr_output}, "
+          f"{args.asm_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+chr_dupes.py — Find near-duplicate tiles across CHR files.
+
+Exact deduplication misses tiles that differ by a pixel or two (grass and
+wall variants drawn by hand). This tool measures the number of differing
+pixels between every pair of distinct tiles in all the given files and
+clusters the tiles within a threshold, so they can be merged.
+
+Distances are computed on the packed CHR data, without decoding pixels.
+Each bit-plane of a tile is 8 bytes, i.e. one uint64, and a pixel differs
+when either plane bit differs, so
+
+    distance(a, b) = popcount((a.p0 ^ b.p0) | (a.p1 ^ b.p1))
+
+Identical tiles are collapsed first. The unique tiles are then compared
+in row blocks against the rest of the upper triangle, so memory stays
+bounded even for the whole 16384-tile CHR space. Pairs within the
+threshold are joined with union-find (single linkage: a chain of small
+differences can make a loose cluster, which is why the report gives
+every member's distance to the cluster's representative, its most used
+tile).
+
+The report lists the largest clusters, and per file the tiles it would
+need deduplicated, after merging, and the 1KB banks merging frees.
+
+Usage:
+  python3 chr_dupes.py assets/tilesets/*.chr assets/sprites/*.chr
+  python3 chr_dupes.py assets/tilesets/overworld.chr --max-pixels 4 --top 50
+  python3 chr_dupes.py assets/*/*.chr --json build/chr_dupes.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from nesasset import TILE_BYTES, TILES_PER_BANK, chr_planes
+
+
+BLOCK_CELLS = 1 << 22           # pair distances held at once (per row block)
+
+
+def popcount64(x: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 element."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    # NumPy < 2.0: SWAR popcount, wrapping uint64 arithmetic
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def tile_words(data) -> np.ndarray:
+    """(N, 2) uint64: the two bit-planes of every tile as 64-bit words."""
+    return chr_planes(data).reshape(-1, TILE_BYTES).view(np.uint64)
+
+
+def close_pairs(words: np.ndarray, max_pixels: int) -> tuple:
+    """(i, j, distance) arrays of unique-tile pairs i < j at most max_pixels apart."""
+    n = len(words)
+    p0, p1 = words[:, 0], words[:, 1]
+    block = max(1, BLOCK_CELLS // max(n, 1))
+    found_i, found_j, found_d = [], [], []
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        # Rows start..stop against columns start..n; keep column > row
+        diff = (p0[start:stop, np.newaxis] ^ p0[np.newaxis, start:]) | \
+               (p1[start:stop, np.newaxis] ^ p1[np.newaxis, start:])
+        dist = popcount64(diff)
+        rows, cols = np.nonzero(dist <= max_pixels)
+        upper = cols > rows
+        rows, cols = rows[upper], cols[upper]
+        found_i.append(rows + start)
+        found_j.append(cols + start)
+        found_d.append(dist[rows, cols])
+    if not found_i:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, empty
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_d)
+
+
+def distance(words: np.ndarray, a: int, b: int) -> int:
+    diff = (words[a, 0] ^ words[b, 0]) | (words[a, 1] ^ words[b, 1])
+    return int(popcount64(np.array([diff]))[0])
+
+
+def clusters(n: int, pairs_i: np.ndarray, pairs_j: np.ndarray) -> np.ndarray:
+    """Union-find over the pairs. Returns each tile's cluster root."""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(pairs_i.tolist(), pairs_j.tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return np.array([find(x) for x in range(n)], dtype=np.intp)
+
+
+def banks(tiles: int) -> int:
+    return -(-tiles // TILES_PER_BANK)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate tiles across CHR files")
+    parser.add_argument("files", nargs="+", help="CHR files to compare")
+    parser.add_argument("--max-pixels", type=int, default=2,
+                        help="Largest pixel difference counted as a near duplicate (default: 2)")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Clusters listed in the report (default: 20)")
+    parser.add_argument("--json", type=str, default=None,
+                        help="Write every cluster and its members to this JSON file")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("chr_dupes", args)
+
+    with nestrace.phase("load"):
+        chunks, owners = [], []
+        for i, f in enumerate(args.files):
+            path = Path(f)
+            if not path.exists():
+                print(f"ERROR: {f} not found", file=sys.stderr)
+                sys.exit(1)
+            words = tile_words(path.read_bytes())
+            chunks.append(words)
+            owners.append(np.full(len(words), i, dtype=np.intp))
+        words = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.uint64)
+        owners = np.concatenate(owners)
+        offsets = np.cumsum([0] + [len(c) for c in chunks])
+
+    with nestrace.phase("unique"):
+        # Identical tiles collapse to one; inverse maps every tile to its unique id
+        unique, first, inverse, uses = np.unique(words, axis=0, return_index=True,
+                                                 return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+    with nestrace.phase("distances", {"tiles": len(unique)}):
+        pi, pj, _pd = close_pairs(unique, args.max_pixels)
+    with nestrace.phase("cluster"):
+        root = clusters(len(unique), pi, pj)
+        groups = {}
+        for u, r in enumerate(root.tolist()):
+            groups.setdefault(r, []).append(u)
+        merged = [g for g in groups.values() if len(g) > 1]
+        # Representative: most used tile, then earliest in the inputs
+        merged = [sorted(g, key=lambda u: (-uses[u], first[u])) for g in merged]
+        merged.sort(key=lambda g: (-len(g), first[g[0]]))
+        rep = np.arange(len(unique))
+        for g in merged:
+            rep[g] = g[0]
+
+    def label(u: int) -> str:
+        t = int(first[u])
+        f = int(owners[t])
+        return f"{Path(args.files[f]).name}:{t - offsets[f]}"
+
+    for g in merged[:args.top]:
+        members = ", ".join(f"{label(u)} ({distance(unique, g[0], u)}px)" for u in g[1:])
+        print(f"  {label(g[0])} x{uses[g[0]]} ← {members}")
+    if len(merged) > args.top:
+        print(f"  ... {len(merged) - args.top} more clusters")
+
+    print("  file                      tiles  unique  merged  banks  freed")
+    total_freed = 0
+    for i, f in enumerate(args.files):
+        ids = inverse[offsets[i]:offsets[i + 1]]
+        own = len(np.unique(ids))
+        after = len(np.unique(rep[ids]))
+        freed = banks(own) - banks(after)
+        total_freed += freed
+        print(f"  {Path(f).name:<24} {len(ids):6d}  {own:6d}  {after:6d}  {banks(own):5d}  {freed:5d}")
+    after_all = len(np.unique(rep))
+    print(f"  {'(all files)':<24} {len(words):6d}  {len(unique):6d}  {after_all:6d}  "
+          f"{banks(len(unique)):5d}  {banks(len(unique)) - banks(after_all):5d}")
+
+    if args.json:
+        report = {
+            "max_pixels": args.max_pixels,
+            "clusters": [
+                {"representative": label(g[0]), "uses": int(uses[g[0]]),
+                 "members": [{"tile": label(u), "uses": int(uses[u]),
+                              "pixels": distance(unique, g[0], u)} for u in g[1:]]}
+                for g in merged
+            ],
+        }
+        with nestrace.phase("write"):
+            Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+
+    print(f"OK: {len(words)} tiles, {len(unique)} unique, {len(pi)} pairs within "
+          f"{args.max_pixels}px in {len(merged)} clusters; merging frees {total_freed} "
+          f"banks across files" + (f" → {args.json}" if args.json else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+chr_splice.py — Write .chr files straight into the CHR ROM of a linked ROM.
+
+Post-link step for CHR art: reads a layout that maps .chr files to 1KB CHR
+bank numbers and copies them into the CHR region of build/zelda2b.nes
+through mmap. Only CHR bytes are touched, and only banks whose contents
+differ are written, so a tile edit needs neither ca65 nor ld65.
+
+Checks:
+- iNES magic, CHR-ROM present, and file size matching the header
+- Each file is whole tiles and fits in the CHR region from its bank
+- No two entries share a bank, and no entry lands in a reserved range
+  (banks still filled by src/chr_data.s through the linker)
+
+Files that are not a whole number of banks are padded with blank tiles up
+to the next bank boundary, so stale tiles never survive in a partly
+overwritten bank.
+
+Layout (JSON):
+  {
+    "reserved": [{"banks": [0, 7], "owner": "src/chr_data.s"}],
+    "banks": [
+      {"file": "assets/tilesets/overworld.chr", "bank": 8},
+      {"file": "assets/sprites/link.chr", "bank": 20}
+    ]
+  }
+
+Usage:
+  python3 chr_splice.py config/chr_layout.json build/zelda2b.nes
+  python3 chr_splice.py config/chr_layout.json build/zelda2b.nes --dry-run
+"""
+
+import argparse
+import json
+import mmap
+import sys
+from pathlib import Path
+
+import nestrace
+from nesasset import BANK_BYTES, TILE_BYTES, parse_ines
+
+
+def fail(message: str):
+    print(f"ERROR: {message}", file=sys.stderr)
+    sys.exit(1)
+
+
+def load_layout(path: Path, chr_banks: int) -> list:
+    """Read and check the layout. Returns [(file, first_bank, data)] with bank-padded data."""
+    layout = json.loads(path.read_text())
+    owner = {}
+    for res in layout.get("reserved", []):
+        first, last = res["banks"]
+        for bank in range(first, last + 1):
+            owner[bank] = res.get("owner", "reserved")
+
+    entries = []
+    for entry in layout.get("banks", []):
+        file = entry["file"]
+        bank = entry["bank"]
+        data = Path(file).read_bytes()
+        if not data or len(data) % TILE_BYTES:
+            fail(f"{file}: {len(data)} bytes is not a whole number of tiles")
+        data += bytes(-len(data) % BANK_BYTES)
+        count = len(data) // BANK_BYTES
+        if bank < 0 or bank + count > chr_banks:
+            fail(f"{file}: banks {bank}-{bank + count - 1} outside CHR ROM (0-{chr_banks - 1})")
+        for b in range(bank, bank + count):
+            if b in owner:
+                fail(f"{file}: bank {b} already used by {owner[b]}")
+            owner[b] = file
+        entries.append((file, bank, data))
+    return entries
+
+
+def splice(rom_path: Path, entries: list, dry_run: bool = False) -> list:
+    """Write entries into the ROM's CHR region. Returns the changed bank numbers."""
+    changed = []
+    with open(rom_path, "rb" if dry_run else "r+b") as f:
+        access = mmap.ACCESS_READ if dry_run else mmap.ACCESS_WRITE
+        with mmap.mmap(f.fileno(), 0, access=access) as rom:
+            base = parse_ines(rom[:16])["chr_offset"]
+            for _file, bank, data in entries:
+                for i in range(0, len(data), BANK_BYTES):
+                    offset = base + bank * BANK_BYTES + i
+                    block = data[i:i + BANK_BYTES]
+                    if rom[offset:offset + BANK_BYTES] == block:
+                        continue
+                    changed.append(bank + i // BANK_BYTES)
+                    if not dry_run:
+                        rom[offset:offset + BANK_BYTES] = block
+            if changed and not dry_run:
+                rom.flush()
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Splice .chr files into a linked ROM's CHR banks")
+    parser.add_argument("layout", help="CHR layout JSON")
+    parser.add_argument("rom", help="Linked iNES ROM, patched in place")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report banks that would change without writing")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("chr_splice", args)
+
+    rom_path = Path(args.rom)
+    with nestrace.phase("load"):
+        if not rom_path.exists():
+            fail(f"{rom_path} not found (link the ROM first)")
+        with open(rom_path, "rb") as f:
+            header = f.read(16)
+        try:
+            info = parse_ines(header)
+        except ValueError as e:
+            fail(f"{rom_path}: {e}")
+        if info["chr_size"] == 0:
+            fail(f"{rom_path}: header declares CHR-RAM; nothing to splice")
+        expected = info["chr_offset"] + info["chr_size"]
+        if rom_path.stat().st_size != expected:
+            fail(f"{rom_path}: {rom_path.stat().st_size} bytes, header implies {expected}")
+        entries = load_layout(Path(args.layout), info["chr_size"] // BANK_BYTES)
+
+    with nestrace.phase("write"):
+        changed = splice(rom_path, entries, args.dry_run)
+
+    total = sum(len(data) // BANK_BYTES for _f, _b, data in entries)
+    verb = "would change" if args.dry_run else "changed"
+    banks = f": {', '.join(str(b) for b in changed)}" if changed else ""
+    print(f"OK: {len(entries)} file(s), {total} CHR banks, {len(changed)} {verb}{banks} → {rom_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+collision_maps.py — Compile map screens into bit-packed collision bitmaps.
+
+Runtime collision checks otherwise fetch the metatile index, then its
+attribute byte, then mask bit 2 (solid) or bit 3 (water). This tool resolves
+that offline: for every screen of a map JSON (see nesmap.py) it emits one
+bitmap per layer, 2 bytes per metatile row (16 columns, MSB = column 0),
+30 bytes per screen. Identical bitmaps are shared between screens.
+
+Helper tables make a probe a fixed 19-cycle sequence. With X = metatile
+column (0-15), Y = metatile row (0-14) and a zero-page pointer to the
+screen's bitmap:
+
+    lda collision_row_offset, y     ; row * 2
+    ora collision_col_byte, x       ; + column / 8 (0 or 1)
+    tay
+    lda (ptr), y
+    and collision_bit_mask, x       ; nonzero = set
+
+The same sequence is written as the collision_probe macro to the .inc.
+
+Usage:
+  python3 collision_maps.py assets/maps/overworld_map.json build/overworld_collision.s
+  python3 collision_maps.py map.json out.s --layers solid --segment PRG_BANK_02 --no-tables
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from nesmap import SCREEN_COLS, SCREEN_ROWS, load_map, metatiles_path
+
+
+LAYER_BITS = {"solid": 0x04, "water": 0x08}     # metatile attr bits
+ROW_BYTES = SCREEN_COLS // 8
+BITMAP_BYTES = ROW_BYTES * SCREEN_ROWS
+PROBE_CYCLES = 4 + 4 + 2 + 5 + 4                # lda abs,y; ora abs,x; tay; lda (zp),y; and abs,x
+
+
+def attr_table(metatiles: list) -> np.ndarray:
+    """Attribute byte per metatile index, 256 entries (missing indices are 0)."""
+    attrs = np.zeros(256, dtype=np.uint8)
+    attrs[:len(metatiles)] = [mt.get("attr", 0) for mt in metatiles]
+    return attrs
+
+
+def screen_masks(m: dict, metatiles: list, layer: str) -> np.ndarray:
+    """(screens, 15, 16) boolean array: True where a cell's metatile has the layer bit."""
+    cells = np.array(m["screens"], dtype=np.uint8).reshape(-1, SCREEN_ROWS, SCREEN_COLS)
+    return (attr_table(metatiles)[cells] & LAYER_BITS[layer]) != 0
+
+
+def pack_bitmaps(masks: np.ndarray) -> np.ndarray:
+    """(screens, 30) bytes: each row of 16 cells packed MSB-first into 2 bytes."""
+    return np.packbits(masks, axis=2).reshape(len(masks), BITMAP_BYTES)
+
+
+def format_rows(data, per_line: int) -> list:
+    return ["    .byte " + ", ".join(f"${b:02X}" for b in data[i:i + per_line])
+            for i in range(0, len(data), per_line)]
+
+
+def convert(m: dict, metatiles: list, layers: list, with_tables: bool) -> tuple:
+    """Returns (asm lines, report lines)."""
+    name = m["name"]
+    out, report = [], []
+    for layer in layers:
+        bitmaps = pack_bitmaps(screen_masks(m, metatiles, layer))
+        unique = {}
+        labels = []
+        for bm in bitmaps:
+            key = bm.tobytes()
+            if key not in unique:
+                unique[key] = f"{name}_{layer}_{len(unique)}"
+            labels.append(unique[key])
+
+        out.append(f"; --- {layer} (attr bit ${LAYER_BITS[layer]:02X}): "
+                   f"{len(bitmaps)} screens, {len(unique)} unique bitmaps ---")
+        for key, label in unique.items():
+            out.append(f"{label}:")
+            out.extend(format_rows(key, ROW_BYTES * 4))
+        out.append(f".export {name}_{layer}_lo, {name}_{layer}_hi")
+        out.append(f"{name}_{layer}_lo:")
+        out.extend(f"    .byte <{label}" for label in labels)
+        out.append(f"{name}_{layer}_hi:")
+        out.extend(f"    .byte >{label}" for label in labels)
+        out.append("")
+        size = len(unique) * BITMAP_BYTES + 2 * len(labels)
+        report.append(f"  {layer:<6} {len(unique):4d} bitmaps x {BITMAP_BYTES} B + "
+                      f"{2 * len(labels)} B pointers = {size} bytes")
+
+    if with_tables:
+        out.append("; --- Probe tables ---")
+        out.append(".export collision_row_offset, collision_col_byte, collision_bit_mask")
+        out.append("collision_row_offset:")
+        out.extend(format_rows([r * ROW_BYTES for r in range(SCREEN_ROWS)], 16))
+        out.append("collision_col_byte:")
+        out.extend(format_rows([c // 8 for c in range(SCREEN_COLS)], 16))
+        out.append("collision_bit_mask:")
+        out.extend(format_rows([0x80 >> (c % 8) for c in range(SCREEN_COLS)], 16))
+        out.append("")
+    return out, report
+
+
+def probe_macro() -> str:
+    return (
+        "; collision_probe ptr — A = nonzero if cell (X = column, Y = row) is set\n"
+        f"; in the bitmap at zero-page pointer ptr. {PROBE_CYCLES} cycles (+1 per\n"
+        "; page-crossing table read). Clobbers Y.\n"
+        ".macro collision_probe ptr\n"
+        "    lda collision_row_offset, y\n"
+        "    ora collision_col_byte, x\n"
+        "    tay\n"
+        "    lda (ptr), y\n"
+        "    and collision_bit_mask, x\n"
+        ".endmacro\n"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile map screens into collision bitmaps")
+    parser.add_argument("input", help="Map JSON (see nesmap.py)")
+    parser.add_argument("output", help="Output .s assembly file")
+    parser.add_argument("--metatiles", type=str, default=None,
+                        help="Metatile JSON (default: the map's own metatiles path)")
+    parser.add_argument("--layers", type=str, default="solid,water",
+                        help="Comma-separated layers: solid, water (default: both)")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the data")
+    parser.add_argument("--no-tables", action="store_true",
+                        help="Omit the shared probe tables (when another map already emits them)")
+    parser.add_argument("--macros", type=str, default=None,
+                        help="Output .inc for the probe macro (default: output with .inc suffix)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("collision_maps", args)
+
+    layers = [l.strip() for l in args.layers.split(",") if l.strip()]
+    unknown = [l for l in layers if l not in LAYER_BITS]
+    if unknown:
+        parser.error(f"unknown layer(s): {', '.join(unknown)}")
+
+    with nestrace.phase("load"):
+        try:
+            m = load_map(args.input)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        mt_path = Path(args.metatiles) if args.metatiles else metatiles_path(m, args.input)
+        metatiles = json.loads(mt_path.read_text())["metatiles"]
+
+    with nestrace.phase("encode"):
+        body, report = convert(m, metatiles, layers, not args.no_tables)
+
+    header = [
+        "; ==========================================================",
+        "; Collision Bitmaps — auto-generated by collision_maps.py",
+        f"; Source: {args.input}",
+        "; DO NOT EDIT — regenerate from map JSON",
+        f"; {ROW_BYTES} bytes per metatile row, MSB = column 0; {BITMAP_BYTES} bytes per screen",
+        "; ==========================================================",
+        "",
+    ]
+    if args.segment:
+        header += [f'.segment "{args.segment}"', ""]
+
+    with nestrace.phase("write"):
+        Path(args.output).write_text("\n".join(header + body))
+        if not args.no_tables:
+            macros_path = Path(args.macros) if args.macros else Path(args.output).with_suffix(".inc")
+            macros_path.write_text(probe_macro())
+
+    for line in report:
+        print(line)
+    print(f"OK: {len(m['screens'])} screens, layers {', '.join(layers)} → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+flow_fields.py — Precompute per-screen enemy navigation flow fields.
+
+For every screen of a map JSON (see nesmap.py), computes direction-to-goal
+fields over the walkable metatile cells (not solid, and not water unless
+--walk-water). Goals are:
+
+- exits (always): one field per screen edge, toward its walkable border
+  cells, in player_dir order: 0 = south, 1 = north, 2 = east, 3 = west
+- sectors (--sectors CxR): one field per sector of the screen split into a
+  C x R grid, toward the walkable cells inside it — pick the player's
+  sector to walk toward the player
+
+All fields of all screens are solved together with a vectorized
+multi-source BFS (one NumPy step per distance ring).
+
+Encoding: one nibble per cell, two cells per byte (even column in the high
+nibble), 8 bytes per metatile row, 120 bytes per field:
+  bits 0-1  direction to step (player_dir: 0 down, 1 up, 2 right, 3 left)
+  bit 2     set = step; clear = stay (cell is a goal)
+  bit 3     set = goal unreachable from this cell (or cell not walkable)
+
+Identical fields are shared. {name}_flow_lo/hi are indexed by
+screen * {name}_flow_count + field.
+
+Usage:
+  python3 flow_fields.py assets/maps/overworld_map.json build/overworld_flow.s
+  python3 flow_fields.py map.json out.s --sectors 2x3 --segment PRG_BANK_03
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from collision_maps import screen_masks
+from nesmap import SCREEN_COLS, SCREEN_ROWS, load_map, metatiles_path
+
+
+# (dy, dx) per direction, indexed by player_dir
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+EXIT_NAMES = ["south", "north", "east", "west"]
+STEP_FLAG = 0x04
+UNREACHABLE = 0x08
+FIELD_BYTES = SCREEN_ROWS * SCREEN_COLS // 2
+INF = np.iinfo(np.int16).max
+
+
+def shift(a: np.ndarray, dy: int, dx: int, fill) -> np.ndarray:
+    """out[..., y, x] = a[..., y + dy, x + dx], with fill outside the screen."""
+    out = np.full_like(a, fill)
+    h, w = a.shape[-2:]
+    out[..., max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)] = \
+        a[..., max(0, dy):h - max(0, -dy), max(0, dx):w - max(0, -dx)]
+    return out
+
+
+def goal_masks(sectors) -> tuple:
+    """(F, 15, 16) goal cells shared by every screen, and field names."""
+    goals, names = [], []
+    for d, name in enumerate(EXIT_NAMES):
+        g = np.zeros((SCREEN_ROWS, SCREEN_COLS), dtype=bool)
+        if d == 0:
+            g[-1, :] = True
+        elif d == 1:
+            g[0, :] = True
+        elif d == 2:
+            g[:, -1] = True
+        else:
+            g[:, 0] = True
+        goals.append(g)
+        names.append(f"exit_{name}")
+    if sectors:
+        cols, rows = sectors
+        sw, sh = SCREEN_COLS // cols, SCREEN_ROWS // rows
+        for r in range(rows):
+            for c in range(cols):
+                g = np.zeros((SCREEN_ROWS, SCREEN_COLS), dtype=bool)
+                g[r * sh:(r + 1) * sh, c * sw:(c + 1) * sw] = True
+                goals.append(g)
+                names.append(f"sector_{c}_{r}")
+    return np.stack(goals), names
+
+
+def bfs_distances(walkable: np.ndarray, goals: np.ndarray) -> np.ndarray:
+    """Multi-source BFS. walkable (S, 15, 16), goals (F, 15, 16) → (S, F, 15, 16) int16."""
+    walk = walkable[:, np.newaxis]
+    frontier = goals[np.newaxis] & walk
+    visited = frontier.copy()
+    dist = np.where(frontier, 0, INF).astype(np.int16)
+    d = 0
+    while frontier.any():
+        d += 1
+        reach = np.zeros_like(frontier)
+        for dy, dx in DIRECTIONS:
+            reach |= shift(frontier, dy, dx, False)
+        frontier = reach & walk & ~visited
+        visited |= frontier
+        dist[frontier] = d
+    return dist
+
+
+def directions(dist: np.ndarray) -> np.ndarray:
+    """Nibble codes from BFS distances (see module docstring)."""
+    code = np.full(dist.shape, UNREACHABLE, dtype=np.uint8)
+    code[dist == 0] = 0
+    pending = (dist > 0) & (dist < INF)
+    for d, (dy, dx) in enumerate(DIRECTIONS):
+        step = pending & (shift(dist, dy, dx, INF) == dist - 1)
+        code[step] = STEP_FLAG | d
+        pending &= ~step
+    return code
+
+
+def pack_nibbles(code: np.ndarray) -> np.ndarray:
+    """(..., 15, 16) nibbles → (..., 120) bytes, even column in the high nibble."""
+    return (code[..., 0::2] << 4 | code[..., 1::2]).reshape(*code.shape[:-2], FIELD_BYTES)
+
+
+def parse_sectors(text: str) -> tuple:
+    cols, rows = (int(v) for v in text.lower().split("x"))
+    if cols < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"{text} needs at least one sector each way")
+    if SCREEN_COLS % cols or SCREEN_ROWS % rows:
+        raise argparse.ArgumentTypeError(f"{text} does not divide a 16x15 screen evenly")
+    return cols, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute enemy navigation flow fields")
+    parser.add_argument("input", help="Map JSON (see nesmap.py)")
+    parser.add_argument("output", help="Output .s assembly file")
+    parser.add_argument("--metatiles", type=str, default=None,
+                        help="Metatile JSON (default: the map's own metatiles path)")
+    parser.add_argument("--sectors", type=parse_sectors, default=None, metavar="CxR",
+                        help="Also emit fields toward each sector of a C x R split, e.g. 2x3")
+    parser.add_argument("--walk-water", action="store_true", help="Treat water cells as walkable")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the data")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("flow_fields", args)
+
+    with nestrace.phase("load"):
+        try:
+            m = load_map(args.input)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        mt_path = Path(args.metatiles) if args.metatiles else metatiles_path(m, args.input)
+        metatiles = json.loads(mt_path.read_text())["metatiles"]
+
+    with nestrace.phase("solve"):
+        blocked = screen_masks(m, metatiles, "solid")
+        if not args.walk_water:
+            blocked |= screen_masks(m, metatiles, "water")
+        goals, field_names = goal_masks(args.sectors)
+        dist = bfs_distances(~blocked, goals)
+        code = directions(dist)
+        fields = pack_nibbles(code)                     # (S, F, 120)
+
+    name = m["name"]
+    screens, count = fields.shape[:2]
+    unique = {}
+    labels = []
+    for s in range(screens):
+        for f in range(count):
+            key = fields[s, f].tobytes()
+            if key not in unique:
+                unique[key] = f"{name}_flow_{len(unique)}"
+            labels.append(unique[key])
+
+    out = [
+        "; ==========================================================",
+        "; Navigation Flow Fields — auto-generated by flow_fields.py",
+        f"; Source: {args.input}",
+        "; DO NOT EDIT — regenerate from map JSON",
+        "; Nibble per cell (even column high): bits 0-1 = player_dir to step,",
+        "; bit 2 = step, bit 3 = unreachable. 8 bytes per metatile row.",
+        f"; Fields per screen: {', '.join(field_names)}",
+        "; ==========================================================",
+        "",
+    ]
+    if args.segment:
+        out += [f'.segment "{args.segment}"', ""]
+    out.append(f"{name}_flow_count = {count}")
+    out.append(f".export {name}_flow_count")
+    out.append("")
+    for key, label in unique.items():
+        out.append(f"{label}:")
+        for i in range(0, FIELD_BYTES, 16):
+            out.append("    .byte " + ", ".join(f"${b:02X}" for b in key[i:i + 16]))
+    out.append("")
+    out.append(f".export {name}_flow_lo, {name}_flow_hi")
+    out.append(f"{name}_flow_lo:")
+    out.extend(f"    .byte <{label}" for label in labels)
+    out.append(f"{name}_flow_hi:")
+    out.extend(f"    .byte >{label}" for label in labels)
+    out.append("")
+
+    with nestrace.phase("write"):
+        Path(args.output).write_text("\n".join(out))
+
+    walk = ~blocked
+    print("  screen  fields  reachable  unique bytes")
+    seen = set()
+    for s in range(screens):
+        new = {fields[s, f].tobytes() for f in range(count)} - seen
+        seen |= new
+        reach = (dist[s] < INF)[:, walk[s]].mean() * 100 if walk[s].any() else 0.0
+        print(f"  {s:6d}  {count:6d}  {reach:8.1f}%  {len(new) * FIELD_BYTES:12d}")
+    total = len(unique) * FIELD_BYTES + 2 * len(labels)
+    print(f"OK: {screens} screens x {count} fields, {len(unique)} unique, "
+          f"{total} bytes (incl. {2 * len(labels)} B pointers) → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
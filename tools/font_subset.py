@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+font_subset.py — Pack only the glyphs the dialog uses into a compact font bank.
+
+text2asm.CHAR_MAP places every glyph at its ASCII code ($20-$5A), so the
+font occupies that tile range whether or not a glyph ever appears. This tool
+scans the dialog sources for the characters actually used (after the same
+upper-casing text2asm applies), copies those glyphs out of a full font in
+that ASCII layout, and packs them in code order from --base. Space is always
+kept, since text2asm substitutes it for unknown characters.
+
+Outputs:
+- Font CHR: the packed glyphs, padded to --pad bytes (default one 1KB bank),
+  to be placed with config/chr_layout.json (tools/chr_splice.py). The file
+  starts at the 1KB bank boundary below --base, so a base that is not a
+  multiple of 64 tiles is preceded by blank tiles and each glyph lands on
+  its charmap tile once the bank is placed
+- Character map JSON for text2asm --charmap: {"base", "chars": {char: tile}}
+
+Tile codes $FE and $FF are the newline/end codes, so the packed font must
+end below $FE.
+
+Usage:
+  python3 font_subset.py assets/text/dialog.json --font assets/font.png
+  python3 font_subset.py assets/text/*.json --font font.chr --base 0xC0 \\
+      --chr-out build/font.chr --charmap-out build/font_charmap.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import nestrace
+from nesasset import TILES_PER_BANK, TileSheet, indexed_to_chr, numpy
+from nespng import load_indexed
+from text2asm import CHAR_MAP, NEWLINE_CODE, dialog_sections
+
+
+DEFAULT_BASE = 0xC0         # last 1KB of a 4KB pattern table
+DEFAULT_CHR = "build/font.chr"
+DEFAULT_CHARMAP = "build/font_charmap.json"
+
+
+def used_glyphs(sources: list) -> tuple:
+    """Scan dialog JSON files. Returns (glyphs in CHAR_MAP, unmapped characters)."""
+    used = {' '}
+    for data in sources:
+        for _section, dialog in dialog_sections(data):
+            for line in dialog["lines"]:
+                used.update(line.upper())
+    unmapped = sorted(ch for ch in used if ch not in CHAR_MAP)
+    return sorted((ch for ch in used if ch in CHAR_MAP), key=CHAR_MAP.get), unmapped
+
+
+def load_font(path: Path) -> TileSheet:
+    """Full font in CHAR_MAP layout, from a .chr file or an indexed PNG sheet."""
+    if path.suffix.lower() == ".png":
+        return TileSheet.from_chr(indexed_to_chr(*load_indexed(path, quantize=True)))
+    return TileSheet.from_chr(path.read_bytes())
+
+
+def subset_font(font: TileSheet, glyphs: list, base: int) -> tuple:
+    """Pack glyphs from base. Returns (TileSheet, {char: tile index}).
+
+    The sheet starts at the bank boundary below base: base % 64 blank tiles
+    come first, so sheet tile i is pattern table tile base - base % 64 + i.
+    """
+    missing = [ch for ch in glyphs if CHAR_MAP[ch] >= len(font)]
+    if missing:
+        raise ValueError(f"font has {len(font)} tiles; no glyph for {''.join(missing)!r}")
+    if base + len(glyphs) > NEWLINE_CODE:
+        raise ValueError(f"{len(glyphs)} glyphs from ${base:02X} would reach the "
+                         f"${NEWLINE_CODE:02X}/$FF control codes")
+    sheet = font[[CHAR_MAP[ch] for ch in glyphs]]
+    lead = base % TILES_PER_BANK
+    if lead:
+        np = numpy()
+        sheet = TileSheet(np.concatenate([TileSheet.blank(lead).pixels, sheet.pixels]))
+    return sheet, {ch: base + i for i, ch in enumerate(glyphs)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Subset the dialog font to the glyphs in use")
+    parser.add_argument("inputs", nargs="+", help="Dialog JSON files to scan")
+    parser.add_argument("--font", type=str, required=True,
+                        help="Full font (.chr or indexed .png) with glyphs at their CHAR_MAP codes")
+    parser.add_argument("--base", type=lambda s: int(s, 0), default=DEFAULT_BASE,
+                        help=f"First tile index of the packed font (default: ${DEFAULT_BASE:02X})")
+    parser.add_argument("--chr-out", type=str, default=DEFAULT_CHR,
+                        help=f"Packed font CHR (default: {DEFAULT_CHR})")
+    parser.add_argument("--charmap-out", type=str, default=DEFAULT_CHARMAP,
+                        help=f"Character map for text2asm --charmap (default: {DEFAULT_CHARMAP})")
+    parser.add_argument("--pad", type=int, default=1024,
+                        help="Pad CHR to a multiple of N bytes (default: 1024, 0 = no padding)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("font_subset", args)
+
+    with nestrace.phase("load"):
+        sources = [json.loads(Path(p).read_text()) for p in args.inputs]
+        font = load_font(Path(args.font))
+
+    with nestrace.phase("scan"):
+        glyphs, unmapped = used_glyphs(sources)
+    if unmapped:
+        print(f"WARN: no glyph for {''.join(unmapped)!r}; text2asm renders these as space",
+              file=sys.stderr)
+
+    with nestrace.phase("encode"):
+        try:
+            sheet, charmap = subset_font(font, glyphs, args.base)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        chr_data = sheet.to_chr()
+        if args.pad > 0 and len(chr_data) % args.pad:
+            chr_data += bytes(args.pad - len(chr_data) % args.pad)
+
+    with nestrace.phase("write"):
+        for out in (args.chr_out, args.charmap_out):
+            Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.chr_out).write_bytes(chr_data)
+        Path(args.charmap_out).write_text(json.dumps(
+            {"base": args.base, "font": args.font, "chars": charmap}, indent=2) + "\n")
+
+    if len(sheet) > TILES_PER_BANK:
+        print(f"WARN: {len(glyphs)} glyphs from ${args.base:02X} span more than one 1KB bank",
+              file=sys.stderr)
+    print(f"OK: {len(glyphs)}/{len(CHAR_MAP)} glyphs used, tiles ${args.base:02X}-"
+          f"${args.base + len(glyphs) - 1:02X}, {len(CHAR_MAP) - len(glyphs)} freed "
+          f"→ {args.chr_out}, {args.charmap_out}")
+
+
+if __name__ == "__main__":
+    main()
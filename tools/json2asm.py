@@ -4,25 +4,64 @@ json2asm.py — Convert JSON data tables to ca65 assembly .byte/.word data.
 
 Supports:
 - Enemy stat tables (HP, damage, speed, behavior, drops)
-- Palette definitions (4 palettes of 4 colors)
+- Palette definitions (4 palettes of 4 colors), optionally with
+  precomputed fade, hit-flash and color-cycle steps (--effects)
 - Metatile definitions (4 tile indices + attributes per metatile)
-- Generic byte/word arrays
+- Maps: per-screen metatile index arrays (map JSON from map_import.py),
+  optionally with each screen's 64-byte attribute table (--attributes),
+  raw or RLE-coded (--rle)
+- Generic byte/word arrays, inline or from external .bin/.csv/.npy files
 
 Input:  JSON file with a specific schema
 Output: ca65 assembly source with .byte/.word directives
 
+Enemy tables can optionally be bit-packed with --pack SCHEMA.json, where the
+schema declares a bit width per field:
+
+  {"label": "enemy_stats", "fields": {"hp": 8, "damage": 3, "speed": 2, ...}}
+
+Fields are packed into the fewest bytes without straddling a byte boundary,
+and a ca65 include with one accessor macro per field is written alongside
+(enemy_get_<field>: A = field of enemy X).
+
 Usage:
   python3 json2asm.py enemies.json enemies.s --type enemies
+  python3 json2asm.py enemies.json enemies.s --type enemies --pack enemies_pack.json
   python3 json2asm.py palettes.json palettes.s --type palettes
+  python3 json2asm.py palettes.json palettes.s --type palettes --effects fade_black,flash
   python3 json2asm.py metatiles.json metatiles.s --type metatiles
+  python3 json2asm.py overworld_map.json overworld_map.s --type map
+  python3 json2asm.py overworld_map.json overworld_map.s --type map --attributes --rle
   python3 json2asm.py data.json data.s --type raw
+
+Raw entries either list "values" inline or name a "source" file relative to
+the JSON file, and are streamed to the output in bounded chunks (16 bytes or
+8 words per row):
+
+  {"sine": {"type": "byte", "values": [0, 3, 6]},
+   "dist": {"type": "word", "source": "dist.bin", "endian": "little"},
+   "lut":  {"type": "byte", "source": "lut.npy", "offset": 256, "count": 1024}}
 """
 
 import argparse
+import array
+import io
+import itertools
 import json
+import os
 import sys
 from pathlib import Path
 
+import nestrace
+from nesmap import (ATTR_TABLE_BYTES, SCREEN_COLS, SCREEN_ROWS, attribute_table, metatiles_path,
+                    screen_rows, validate_map)
+
+
+# 6502 cycle costs used for accessor macro estimates
+CYCLES_LDA_ABS_X = 4        # +1 if the indexed read crosses a page
+CYCLES_LSR_A = 2
+CYCLES_AND_IMM = 2
+
 
 def format_byte(val: int) -> str:
     """Format a byte value as ca65 hex literal."""
@@ -79,6 +118,126 @@ def convert_enemies(data: dict) -> str:
     return "\n".join(out)
 
 
+def field_access_cost(lo: int, width: int) -> tuple:
+    """Return (shift_op, shift_count, needs_mask, cycles) to fetch a field at bit lo.
+
+    High fields are cheaper to rotate left through carry (9-bit rotate, so
+    9 - lo ROLs bring bit lo to bit 0) than to shift right lo times.
+    """
+    lsr_mask = lo + width < 8
+    lsr_cycles = CYCLES_LDA_ABS_X + lo * CYCLES_LSR_A + (CYCLES_AND_IMM if lsr_mask else 0)
+    rol_cycles = CYCLES_LDA_ABS_X + (9 - lo) * CYCLES_LSR_A + CYCLES_AND_IMM
+    if lo > 0 and rol_cycles < lsr_cycles:
+        return "rol", 9 - lo, True, rol_cycles
+    return "lsr", lo, lsr_mask, lsr_cycles
+
+
+def plan_packing(fields: dict) -> list:
+    """Assign fields to bytes and bit positions.
+
+    Bytes are filled first-fit decreasing (fields never straddle a byte).
+    Within each byte the field order is chosen to minimize the summed
+    access cost: the bottom field needs only a mask, the top field only
+    shifts. Returns a list of bytes, each a list of (field, lo, width).
+    """
+    for name, width in fields.items():
+        if not 1 <= width <= 8:
+            raise ValueError(f"Field '{name}' width {width} must be 1-8 bits.")
+
+    bins = []
+    for name in sorted(fields, key=lambda n: -fields[n]):
+        for members in bins:
+            if sum(fields[m] for m in members) + fields[name] <= 8:
+                members.append(name)
+                break
+        else:
+            bins.append([name])
+
+    layout = []
+    for members in bins:
+        best = None
+        for order in itertools.permutations(members):
+            lo, placed, cost = 0, [], 0
+            for name in order:
+                placed.append((name, lo, fields[name]))
+                cost += field_access_cost(lo, fields[name])[3]
+                lo += fields[name]
+            # Leave any spare bits below the top field so it still needs no mask
+            spare = 8 - lo
+            if spare and len(placed) > 1:
+                name, top_lo, width = placed[-1]
+                cost -= field_access_cost(top_lo, width)[3]
+                placed[-1] = (name, top_lo + spare, width)
+                cost += field_access_cost(top_lo + spare, width)[3]
+            if best is None or cost < best[0]:
+                best = (cost, placed)
+        layout.append(best[1])
+    return layout
+
+
+def convert_enemies_packed(data: dict, schema: dict) -> tuple:
+    """Convert enemy stats to bit-packed SoA tables.
+
+    Returns (asm_body, macro_include, report_lines).
+    """
+    enemies = data["enemies"]
+    fields = schema["fields"]
+    base = schema.get("label", "enemy_stats")
+    layout = plan_packing(fields)
+
+    out = []
+    out.append("; Enemy index reference:")
+    for i, enemy in enumerate(enemies):
+        out.append(f";   {i} = {enemy['name']}")
+    out.append(f"; Total: {len(enemies)} enemies")
+    out.append("")
+
+    inc = []
+    inc.append("; Bit-packed enemy stat accessors: A = field of enemy X")
+    inc.append("; Clobbers: A, flags (including carry)")
+    inc.append("")
+    inc.append(".global " + ", ".join(f"{base}_{i}" for i in range(len(layout))))
+    inc.append("")
+
+    report = []
+    for b, members in enumerate(layout):
+        label = f"{base}_{b}"
+        desc = ", ".join(f"{name} bits {lo}-{lo + width - 1}" for name, lo, width in members)
+        out.append(f"; {label}: {desc}")
+        out.append(f".export {label}")
+        out.append(f"{label}:")
+        for enemy in enemies:
+            packed = 0
+            for name, lo, width in members:
+                val = enemy.get(name, 0)
+                if not 0 <= val < (1 << width):
+                    raise ValueError(
+                        f"{enemy['name']}.{name} = {val} does not fit in {width} bits.")
+                packed |= val << lo
+            out.append(f"    .byte {format_byte(packed)}  ; {enemy['name']}")
+        out.append("")
+
+        for name, lo, width in members:
+            op, shifts, needs_mask, cycles = field_access_cost(lo, width)
+            inc.append(f"; enemy_get_{name} — {width} bits, {cycles} cycles")
+            inc.append(f".macro enemy_get_{name}")
+            inc.append(f"    lda {label}, x")
+            for _ in range(shifts):
+                inc.append(f"    {op}")
+            if needs_mask:
+                inc.append(f"    and #{format_byte((1 << width) - 1)}")
+            inc.append(".endmacro")
+            inc.append("")
+            report.append(f"  {name:<12} {width} bits  byte {b}  bits {lo}-{lo + width - 1}  "
+                          f"{cycles} cycles")
+
+    packed_size = len(layout) * len(enemies)
+    unpacked_size = len(fields) * len(enemies)
+    report.insert(0, f"Packed: {len(layout)} bytes/enemy x {len(enemies)} = {packed_size} bytes "
+                     f"(unpacked: {unpacked_size} bytes)")
+    return "\n".join(out), "\n".join(inc), report
+
+
 def convert_palettes(data: dict) -> str:
     """Convert palette definitions JSON to ca65 assembly."""
     out = []
@@ -94,6 +253,95 @@ def convert_palettes(data: dict) -> str:
     return "\n".join(out)
 
 
+NES_BLACK = 0x0F
+NES_WHITE = 0x30
+NES_RED_HUE = 0x06
+FADE_STEPS = 4              # brightness levels from a color to black or white
+PALETTE_EFFECTS = ["fade_black", "fade_white", "flash", "cycle"]
+
+
+def nes_shift_brightness(color: int, delta: int) -> int:
+    """Move an NES color delta brightness rows ($10 each), clamping to $0F / $30.
+
+    Blacks ($0D, $1D, $xE, $xF) count as one row below $00.
+    """
+    hue, row = color & 0x0F, color >> 4 & 0x03
+    if hue >= 0x0E or color in (0x0D, 0x1D):
+        hue, row = 0x00, -1
+    row += delta
+    if row < 0 or (hue == 0x0D and row < 2):
+        return NES_BLACK
+    if row > 3:
+        return NES_WHITE
+    return row << 4 | hue
+
+
+def palette_effect_steps(palettes: list, effect: str, cycle: list) -> list:
+    """Steps of one effect for a palette group, each a flat list of 16 colors."""
+    base = [c for pal in palettes for c in pal]
+    if effect in ("fade_black", "fade_white"):
+        sign = -1 if effect == "fade_black" else 1
+        return [[nes_shift_brightness(c, sign * k) for c in base] for k in range(FADE_STEPS + 1)]
+    if effect == "flash":
+        # Colors 1-3 of every palette: all white, then red at the same brightness
+        white = [c if i % 4 == 0 else NES_WHITE for i, c in enumerate(base)]
+        red = [c if i % 4 == 0 or nes_shift_brightness(c, 0) == NES_BLACK
+               else (c & 0x30) | NES_RED_HUE for i, c in enumerate(base)]
+        return [white, red]
+    # cycle: rotate colors 1-3 of the chosen palettes
+    steps = []
+    for k in range(3):
+        step = []
+        for p, pal in enumerate(palettes):
+            colors = pal[1:]
+            if p in cycle:
+                colors = colors[k:] + colors[:k]
+            step += [pal[0]] + colors
+        steps.append(step)
+    return steps
+
+
+def convert_palette_effects(data: dict, prefix: str, effects: list, cycle: list) -> tuple:
+    """Precomputed effect steps for every palette group.
+
+    Each step is a 16-byte block (one palette group), so a frame's 32-byte
+    upload to $3F00 is a BG step followed by a sprite step. Identical steps
+    are stored once across all groups and effects. Returns (asm, report).
+    """
+    blocks = {}
+    tables = []
+    for group_name, palettes in data.items():
+        for effect in effects:
+            labels = []
+            for step in palette_effect_steps(palettes, effect, cycle):
+                key = bytes(step)
+                if key not in blocks:
+                    blocks[key] = f"{prefix}_palfx_{len(blocks)}"
+                labels.append(blocks[key])
+            tables.append((f"{group_name}_{effect}", labels))
+
+    out = [f"; Palette effects: {', '.join(effects)}",
+           f"; 16-byte steps, {len(blocks)} unique; FADE_STEPS = {FADE_STEPS} "
+           f"(step 0 = base palette)", ""]
+    for key, label in blocks.items():
+        out.append(f"{label}:")
+        for i in range(0, len(key), 4):
+            out.append("    .byte " + ", ".join(format_byte(c) for c in key[i:i + 4]))
+    out.append("")
+    for table, labels in tables:
+        out.append(f".export {table}_lo, {table}_hi")
+        out.append(f"{table}_lo:")
+        out.append("    .byte " + ", ".join(f"<{label}" for label in labels))
+        out.append(f"{table}_hi:")
+        out.append("    .byte " + ", ".join(f">{label}" for label in labels))
+    out.append("")
+
+    steps = sum(len(labels) for _, labels in tables)
+    report = [f"  {steps} effect steps in {len(blocks)} unique blocks: {len(blocks) * 16} bytes "
+              f"(+{2 * steps} B pointers) instead of {steps * 16}"]
+    return "\n".join(out), report
+
+
 def convert_metatiles(data: dict) -> str:
     """Convert metatile definitions JSON to ca65 assembly.
 
@@ -134,57 +382,371 @@ def convert_metatiles(data: dict) -> str:
     return "\n".join(out)
 
 
-def convert_raw(data: dict) -> str:
-    """Convert a generic byte/word array JSON to ca65 assembly."""
+RLE_MAX_RUN = 127
+
+
+def rle_encode(data: bytes) -> bytes:
+    """RLE for metatile_upload_attrs_rle: $01-$7F = that many literal bytes
+    follow, $81-$FF = repeat the next byte (n & $7F) times, $00 = end."""
+    out = bytearray()
+    literals = bytearray()
+
+    def flush():
+        if literals:
+            out.append(len(literals))
+            out.extend(literals)
+            literals.clear()
+
+    i = 0
+    while i < len(data):
+        run = 1
+        while i + run < len(data) and data[i + run] == data[i] and run < RLE_MAX_RUN:
+            run += 1
+        if run >= 3:
+            flush()
+            out += bytes([0x80 | run, data[i]])
+            i += run
+            continue
+        literals.append(data[i])
+        if len(literals) == RLE_MAX_RUN:
+            flush()
+        i += 1
+    flush()
+    out.append(0)
+    return bytes(out)
+
+
+def convert_map(data: dict, palettes: list = None, rle: bool = False) -> str:
+    """Convert a map JSON (see nesmap.py) to per-screen metatile arrays.
+
+    Identical screens are emitted once; the screen pointer tables are
+    indexed by screen number (sy * screens_x + sx). With palettes (the
+    palette bits of each metatile index), every screen's attribute table
+    is emitted too, shared between screens and optionally RLE-coded.
+    """
+    errors = validate_map(data)
+    if errors:
+        raise ValueError("; ".join(errors))
+    name = data["name"]
+    screens = data["screens"]
     out = []
 
+    unique = {}
+    labels = []
+    for screen in screens:
+        key = bytes(screen)
+        if key not in unique:
+            unique[key] = f"{name}_screen_{len(unique)}"
+        labels.append(unique[key])
+
+    out.append(f"; Map {name}: {data['screens_x']}x{data['screens_y']} screens "
+               f"({len(screens)} total, {len(unique)} unique)")
+    out.append(f"; Each screen: {SCREEN_ROWS} rows of {SCREEN_COLS} metatile indices")
+    out.append("")
+    out.append(f"{name}_screens_x = {data['screens_x']}")
+    out.append(f"{name}_screens_y = {data['screens_y']}")
+    out.append(f".export {name}_screens_x, {name}_screens_y")
+    out.append("")
+
+    for key, label in unique.items():
+        out.append(f"{label}:")
+        for row in screen_rows(list(key)):
+            out.append("    .byte " + ", ".join(format_byte(v) for v in row))
+        out.append("")
+
+    out.append(f".export {name}_screens_lo, {name}_screens_hi")
+    out.append(f"{name}_screens_lo:")
+    for label in labels:
+        out.append(f"    .byte <{label}")
+    out.append(f"{name}_screens_hi:")
+    for label in labels:
+        out.append(f"    .byte >{label}")
+    out.append("")
+
+    if palettes is not None:
+        attrs = {}
+        attr_labels = []
+        for screen in screens:
+            table = attribute_table(screen, palettes)
+            key = rle_encode(table) if rle else table
+            if key not in attrs:
+                attrs[key] = f"{name}_attrs_{len(attrs)}"
+            attr_labels.append(attrs[key])
+        size = sum(len(k) for k in attrs)
+        out.append(f"; Attribute tables: {len(attrs)} unique, {size} bytes"
+                   + (f" RLE-coded (raw {len(attrs) * ATTR_TABLE_BYTES})" if rle else ""))
+        out.append("")
+        for key, label in attrs.items():
+            out.append(f"{label}:")
+            for i in range(0, len(key), 16):
+                out.append("    .byte " + ", ".join(format_byte(v) for v in key[i:i + 16]))
+        out.append("")
+        out.append(f".export {name}_attrs_lo, {name}_attrs_hi")
+        out.append(f"{name}_attrs_lo:")
+        for label in attr_labels:
+            out.append(f"    .byte <{label}")
+        out.append(f"{name}_attrs_hi:")
+        for label in attr_labels:
+            out.append(f"    .byte >{label}")
+        out.append("")
+
+    return "\n".join(out)
+
+
+RAW_BYTES_PER_ROW = 16
+RAW_WORDS_PER_ROW = 8
+RAW_CHUNK_BYTES = 65536     # read size for binary sources
+BYTE_LITERALS = [f"${v:02X}" for v in range(256)]
+
+
+def read_raw_source(entry: dict, base_dir: Path, dtype: str):
+    """Yield chunks of integer values from an external raw source.
+
+    Formats (from "format" or the file suffix): "bin" (little-endian words
+    unless "endian": "big"), "csv" (comma/whitespace separated, decimal,
+    0x or $ hex) and "npy" (memory-mapped, integer dtype). "offset" and
+    "count" select a range of values. Raises ValueError for sources that
+    cannot hold valid values (float or out-of-range arrays, an odd byte in
+    a word file).
+    """
+    path = base_dir / entry["source"]
+    fmt = entry.get("format", path.suffix.lstrip(".").lower())
+    offset = entry.get("offset", 0)
+    count = entry.get("count")
+
+    if fmt == "npy":
+        import numpy as np
+        arr = np.load(path, mmap_mode="r").reshape(-1)
+        end = len(arr) if count is None else offset + count
+        if arr.dtype.kind not in "iu":
+            raise ValueError(f"{path}: {arr.dtype} array, need an integer dtype")
+        selected = arr[offset:end]
+        limit = 0xFFFF if dtype == "word" else 0xFF
+        if len(selected) and (selected.min() < 0 or selected.max() > limit):
+            raise ValueError(f"{path}: values {selected.min()}..{selected.max()} "
+                             f"outside the {dtype} range 0..{limit}")
+        for i in range(offset, end, RAW_CHUNK_BYTES):
+            yield arr[i:min(i + RAW_CHUNK_BYTES, end)].tolist()
+        return
+
+    if fmt == "csv":
+        def values():
+            with open(path) as f:
+                for line in f:
+                    for tok in line.replace(",", " ").split():
+                        yield int(tok[1:], 16) if tok.startswith("$") else int(tok, 0)
+        vals = itertools.islice(values(), offset, None if count is None else offset + count)
+        while True:
+            chunk = list(itertools.islice(vals, RAW_CHUNK_BYTES))
+            if not chunk:
+                return
+            yield chunk
+
+    if fmt not in ("bin", "raw"):
+        raise ValueError(f"{path}: unknown raw source format '{fmt}'")
+    width = 2 if dtype == "word" else 1
+    remaining = None if count is None else count * width
+    with open(path, "rb") as f:
+        f.seek(offset * width)
+        while remaining is None or remaining > 0:
+            size = RAW_CHUNK_BYTES if remaining is None else min(RAW_CHUNK_BYTES, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            if width == 1:
+                yield chunk
+                continue
+            if len(chunk) % 2:
+                raise ValueError(f"{path}: odd trailing byte in a word source")
+            words = array.array("H")
+            words.frombytes(chunk)
+            if (entry.get("endian", "little") == "big") != (sys.byteorder == "big"):
+                words.byteswap()
+            yield words
+
+
+def raw_rows(chunks, per_row: int):
+    """Regroup value chunks into rows of per_row values, carrying remainders across chunks."""
+    carry = []
+    for chunk in chunks:
+        if carry:
+            need = per_row - len(carry)
+            carry.extend(chunk[:need])
+            chunk = chunk[need:]
+            if len(carry) < per_row:
+                continue
+            yield carry
+            carry = []
+        full = len(chunk) - len(chunk) % per_row
+        for i in range(0, full, per_row):
+            yield chunk[i:i + per_row]
+        carry = list(chunk[full:])
+    if carry:
+        yield carry
+
+
+def write_raw(data: dict, out, base_dir: Path = Path(".")) -> int:
+    """Stream generic byte/word arrays as ca65 assembly to a text file object.
+
+    Each entry holds inline "values" or an external "source" (see
+    read_raw_source). Output is written row by row, so memory stays bounded
+    by one source chunk. Returns the number of values written.
+    """
+    total = 0
     for label, entry in data.items():
         dtype = entry.get("type", "byte")
-        values = entry["values"]
-        out.append(f".export {label}")
-        out.append(f"{label}:")
+        if "source" in entry:
+            chunks = read_raw_source(entry, base_dir, dtype)
+        else:
+            chunks = [entry["values"]]
+        limit = 0xFFFF if dtype == "word" else 0xFF
+        out.write(f".export {label}\n{label}:\n")
         if dtype == "word":
-            vals = ", ".join(format_word(v) for v in values)
-            out.append(f"    .word {vals}")
+            for row in raw_rows(chunks, RAW_WORDS_PER_ROW):
+                if min(row) < 0 or max(row) > limit:
+                    raise ValueError(f"{label}: word value out of range in {list(row)}")
+                out.write("    .word " + ", ".join(f"${v:04X}" for v in row) + "\n")
+                total += len(row)
         else:
-            # Emit in rows of 16
-            for i in range(0, len(values), 16):
-                chunk = values[i:i+16]
-                vals = ", ".join(format_byte(v) for v in chunk)
-                out.append(f"    .byte {vals}")
-        out.append("")
+            for row in raw_rows(chunks, RAW_BYTES_PER_ROW):
+                if min(row) < 0 or max(row) > limit:
+                    raise ValueError(f"{label}: byte value out of range in {list(row)}")
+                out.write("    .byte " + ", ".join([BYTE_LITERALS[v] for v in row]) + "\n")
+                total += len(row)
+        out.write("\n")
+    return total
 
-    return "\n".join(out)
+
+def convert_raw(data: dict, base_dir: Path = Path(".")) -> str:
+    """Convert a generic byte/word array JSON to ca65 assembly."""
+    out = io.StringIO()
+    write_raw(data, out, base_dir)
+    return out.getvalue()[:-1]
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Convert JSON data tables to ca65 assembly")
     parser.add_argument("input", help="Input JSON file")
     parser.add_argument("output", help="Output .s assembly file")
-    parser.add_argument("--type", choices=["enemies", "palettes", "metatiles", "raw"],
+    parser.add_argument("--type", choices=["enemies", "palettes", "metatiles", "map", "raw"],
                         required=True, help="Data type to convert")
     parser.add_argument("--segment", type=str, default=None,
                         help="Segment name to place data in (e.g., PRG_FIXED_C)")
-    args = parser.parse_args()
-
-    data = json.loads(Path(args.input).read_text())
+    parser.add_argument("--pack", type=str, default=None,
+                        help="Bit-width schema JSON for packed enemy tables (--type enemies)")
+    parser.add_argument("--macros", type=str, default=None,
+                        help="Output .inc for packed accessor macros (default: output with .inc suffix)")
+    parser.add_argument("--effects", type=str, nargs="?", const=",".join(PALETTE_EFFECTS),
+                        default=None, help="Palette effect steps to precompute (--type palettes): "
+                        f"comma-separated {', '.join(PALETTE_EFFECTS)} (default: all)")
+    parser.add_argument("--cycle-palettes", type=str, default="0,1,2,3",
+                        help="Palettes whose colors 1-3 rotate in the cycle effect (default: all)")
+    parser.add_argument("--attributes", action="store_true",
+                        help="Also emit each screen's attribute table (--type map)")
+    parser.add_argument("--rle", action="store_true",
+                        help="RLE-code the attribute tables (--type map --attributes)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("json2asm", args)
+
+    if args.pack and args.type != "enemies":
+        parser.error("--pack is only supported with --type enemies")
+    effects = []
+    if args.effects is not None:
+        if args.type != "palettes":
+            parser.error("--effects is only supported with --type palettes")
+        effects = [e.strip() for e in args.effects.split(",") if e.strip()]
+        unknown = [e for e in effects if e not in PALETTE_EFFECTS]
+        if unknown:
+            parser.error(f"unknown effect(s): {', '.join(unknown)}")
+    try:
+        cycle = [int(p) for p in args.cycle_palettes.split(",") if p.strip()]
+    except ValueError:
+        parser.error(f"--cycle-palettes: expected comma-separated palette indices, "
+                     f"got '{args.cycle_palettes}'")
+    if args.attributes and args.type != "map":
+        parser.error("--attributes is only supported with --type map")
+    if args.rle and not args.attributes:
+        parser.error("--rle requires --attributes")
+
+    with nestrace.phase("load"):
+        data = json.loads(Path(args.input).read_text())
+    if "cycle" in effects:
+        count = min((len(palettes) for palettes in data.values()), default=0)
+        bad = [p for p in cycle if p not in range(count)]
+        if bad:
+            parser.error(f"--cycle-palettes: {', '.join(map(str, bad))} not in 0-{count - 1} "
+                         f"(palettes per group in {args.input})")
 
     converters = {
         "enemies": convert_enemies,
         "palettes": convert_palettes,
         "metatiles": convert_metatiles,
+        "map": convert_map,
         "raw": convert_raw,
     }
 
     header = emit_header(args.type.title() + " Data", args.input)
-    body = converters[args.type](data)
-
     segment_directive = ""
     if args.segment:
         segment_directive = f'.segment "{args.segment}"\n\n'
 
+    if args.type == "raw":
+        # Streamed: formatting and writing happen row by row, into a temporary
+        # file so a failure part-way never leaves a truncated, fresh output
+        tmp = Path(args.output + ".tmp")
+        try:
+            with nestrace.phase("write"), open(tmp, "w") as f:
+                f.write(header + segment_directive)
+                count = write_raw(data, f, Path(args.input).parent)
+            os.replace(tmp, args.output)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            tmp.unlink(missing_ok=True)
+        print(f"OK: Generated {args.output} ({count} values)")
+        return
+
+    report = []
+    macros = None
+    with nestrace.phase("format"):
+        if args.pack:
+            schema = json.loads(Path(args.pack).read_text())
+            body, macros, report = convert_enemies_packed(data, schema)
+        elif effects:
+            body = convert_palettes(data)
+            fx, report = convert_palette_effects(data, Path(args.input).stem, effects, cycle)
+            body += "\n\n" + fx
+        elif args.attributes:
+            if "metatiles" not in data:
+                print(f"ERROR: {args.input}: no 'metatiles' path for --attributes", file=sys.stderr)
+                sys.exit(1)
+            metatiles = json.loads(metatiles_path(data, args.input).read_text())["metatiles"]
+            palettes = [mt.get("attr", 0) & 0x03 for mt in metatiles]
+            palettes += [0] * (256 - len(palettes))
+            try:
+                body = convert_map(data, palettes, args.rle)
+            except ValueError as e:
+                print(f"ERROR: {args.input}: {e}", file=sys.stderr)
+                sys.exit(1)
+        else:
+            try:
+                body = converters[args.type](data)
+            except ValueError as e:
+                print(f"ERROR: {args.input}: {e}", file=sys.stderr)
+                sys.exit(1)
+
     output = header + segment_directive + body
-    Path(args.output).write_text(output)
+    with nestrace.phase("write"):
+        Path(args.output).write_text(output)
+        if macros is not None:
+            macros_path = Path(args.macros) if args.macros else Path(args.output).with_suffix(".inc")
+            macros_path.write_text(emit_header("Enemy Stat Accessors", args.pack) + macros)
+    for line in report:
+        print(line)
     print(f"OK: Generated {args.output} ({len(output)} chars)")
 
 
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+map_import.py — Import a painted map image or a Tiled export as metatile screens.
+
+Image input: an indexed PNG (palette indices 0-3) whose size is a whole
+number of screens (256x240 pixels each). It is cut into 16x16 cells, and
+each distinct cell is looked up in a hash index keyed on the 256 pixels of
+every metatile composed from its 2x2 tiles in the tileset CHR. Cells with
+no match are an error, or with --allow-new become new metatiles when all
+four of their 8x8 tiles exist in the CHR.
+
+Tiled input: a .json export whose tile layer uses a 16x16 tileset laid out
+in metatile order, so tile gid - firstgid is the metatile index (gid 0 maps
+to metatile 0). Flip flags are ignored.
+
+Outputs the shared map JSON (see nesmap.py) for json2asm --type map, and
+the metatile JSON updated with any new metatiles.
+
+Usage:
+  python3 map_import.py overworld.png --metatiles assets/tilesets/overworld_metatiles.json \\
+      --chr assets/tilesets/overworld.chr -o assets/maps/overworld_map.json
+  python3 map_import.py overworld.png --metatiles ow_metatiles.json --chr ow.chr --allow-new
+  python3 map_import.py overworld.tmj.json --metatiles ow_metatiles.json -o ow_map.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from nesasset import TILE_SIZE, TileSheet
+from nespng import load_indexed_png
+from nesmap import (METATILE_PX, SCREEN_COLS, SCREEN_ROWS, grid_to_screens, save_map,
+                    save_metatiles)
+
+
+TILED_FLIP_MASK = 0x1FFFFFFF
+MAX_METATILES = 256
+
+
+def compose_metatiles(sheet: TileSheet, metatiles: list) -> np.ndarray:
+    """(M, 16, 16) pixel array of every metatile, from its TL/TR/BL/BR tiles."""
+    idx = np.array([[mt["tl"], mt["tr"], mt["bl"], mt["br"]] for mt in metatiles], dtype=np.intp)
+    outside = (idx < 0) | (idx >= len(sheet))
+    bad = np.nonzero(outside.any(axis=1))[0]
+    if len(bad):
+        i = int(bad[0])
+        more = f" ({len(bad)} metatiles out of range)" if len(bad) > 1 else ""
+        raise ValueError(f"metatile {metatiles[i].get('name', i)} uses tile "
+                         f"{int(idx[i][outside[i]][0])}, but the CHR has {len(sheet)} tiles{more}")
+    tiles = sheet.pixels[idx]                                   # (M, 4, 8, 8)
+    tiles = tiles.reshape(-1, 2, 2, TILE_SIZE, TILE_SIZE).transpose(0, 1, 3, 2, 4)
+    return tiles.reshape(-1, METATILE_PX, METATILE_PX)
+
+
+def cut_cells(pixels: np.ndarray) -> np.ndarray:
+    """Cut an HxW pixel array into (rows * cols, 256) 16x16 cells, row-major."""
+    h, w = pixels.shape
+    cells = pixels.reshape(h // METATILE_PX, METATILE_PX, w // METATILE_PX, METATILE_PX)
+    return cells.transpose(0, 2, 1, 3).reshape(-1, METATILE_PX * METATILE_PX)
+
+
+def import_image(pixels: np.ndarray, sheet: TileSheet, metatiles: list, allow_new: bool,
+                 new_attr: int = 0) -> tuple:
+    """Match 16x16 cells to metatiles. Returns (grid rows, new metatiles, errors)."""
+    h, w = pixels.shape
+    cols = w // METATILE_PX
+
+    index = {}
+    for i, mt in enumerate(compose_metatiles(sheet, metatiles)):
+        index.setdefault(mt.tobytes(), i)
+    if len(index) < len(metatiles):
+        print(f"WARN: {len(metatiles) - len(index)} metatiles repeat an earlier one pixel for "
+              f"pixel; cells match the first", file=sys.stderr)
+    tile_index = {}
+    for i, key in enumerate(sheet.pixels.reshape(len(sheet), -1)):
+        tile_index.setdefault(key.tobytes(), i)
+
+    # Unique cells through a 256-byte void view: one sort instead of a row-wise unique
+    cells = np.ascontiguousarray(cut_cells(pixels))
+    keys = cells.view(np.dtype((np.void, cells.shape[1]))).ravel()
+    _unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    mapping = np.zeros(len(first), dtype=np.int64)
+    added, errors = [], []
+    for u, pos in enumerate(first):
+        cell = cells[pos]
+        key = cell.tobytes()
+        if key in index:
+            mapping[u] = index[key]
+            continue
+        row, col = divmod(int(first[u]), cols)
+        where = f"cell ({col}, {row}) at pixel ({col * METATILE_PX}, {row * METATILE_PX})"
+        if not allow_new:
+            errors.append(f"{where}: no matching metatile")
+            continue
+        quads = cell.reshape(2, TILE_SIZE, 2, TILE_SIZE).transpose(0, 2, 1, 3).reshape(4, -1)
+        tiles = [tile_index.get(q.tobytes()) for q in quads]
+        if None in tiles:
+            errors.append(f"{where}: tile not in CHR")
+            continue
+        index[key] = mapping[u] = len(metatiles) + len(added)
+        added.append({"name": f"auto_{len(metatiles) + len(added)}", "tl": tiles[0],
+                      "tr": tiles[1], "bl": tiles[2], "br": tiles[3], "attr": new_attr})
+    grid = mapping[inverse.reshape(-1)].reshape(h // METATILE_PX, cols)
+    return grid.tolist(), added, errors
+
+
+def import_tiled(data: dict, layer_name: str = None) -> list:
+    """Metatile grid rows from a Tiled JSON map's tile layer."""
+    layers = [l for l in data["layers"] if l.get("type") == "tilelayer"]
+    if layer_name:
+        layers = [l for l in layers if l.get("name") == layer_name]
+    if not layers:
+        raise ValueError("no matching tile layer")
+    layer = layers[0]
+    if isinstance(layer["data"], str):
+        raise ValueError("layer data must use Tiled's CSV (array) encoding")
+    firstgid = data["tilesets"][0].get("firstgid", 1) if data.get("tilesets") else 1
+    w = layer["width"]
+    gids = [g & TILED_FLIP_MASK for g in layer["data"]]
+    values = [g - firstgid if g else 0 for g in gids]
+    return [values[r * w:(r + 1) * w] for r in range(layer["height"])]
+
+
+def fail(message: str):
+    print(f"ERROR: {message}", file=sys.stderr)
+    sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a map image or Tiled JSON as metatile screens")
+    parser.add_argument("input", help="Indexed PNG map image or Tiled JSON export")
+    parser.add_argument("--metatiles", type=str, required=True, help="Metatile JSON of the tileset")
+    parser.add_argument("--chr", type=str, default=None, help="Tileset CHR (required for images)")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="Map JSON (default: input name with _map.json)")
+    parser.add_argument("--name", type=str, default=None,
+                        help="Map label prefix (default: output file stem)")
+    parser.add_argument("--layer", type=str, default=None, help="Tiled layer name (default: first)")
+    parser.add_argument("--allow-new", action="store_true",
+                        help="Add unmatched cells as new metatiles")
+    parser.add_argument("--new-attr", type=int, default=0,
+                        help="Attribute byte for new metatiles (default: 0)")
+    parser.add_argument("--metatiles-out", type=str, default=None,
+                        help="Where to write updated metatiles (default: --metatiles)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("map_import", args)
+
+    src = Path(args.input)
+    out = Path(args.output) if args.output else src.with_name(src.stem.split(".")[0] + "_map.json")
+    mt_path = Path(args.metatiles)
+    mt_data = json.loads(mt_path.read_text())
+    metatiles = mt_data["metatiles"]
+
+    added, errors = [], []
+    with nestrace.phase("import"):
+        try:
+            if src.suffix.lower() == ".json":
+                grid = import_tiled(json.loads(src.read_text()), args.layer)
+                errors = [f"metatile {v} not in {mt_path}" for v in
+                          sorted({v for row in grid for v in row if v >= len(metatiles)})]
+            else:
+                if not args.chr:
+                    fail("--chr is required for image input")
+                pixels = load_indexed_png(src)
+                h, w = pixels.shape
+                if w % (SCREEN_COLS * METATILE_PX) or h % (SCREEN_ROWS * METATILE_PX):
+                    fail(f"{src}: {w}x{h} is not a whole number of 256x240 screens")
+                sheet = TileSheet.from_chr(Path(args.chr).read_bytes())
+                grid, added, errors = import_image(pixels, sheet, metatiles,
+                                                   args.allow_new, args.new_attr)
+        except ValueError as e:
+            fail(f"{src}: {e}")
+
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    if rows % SCREEN_ROWS or cols % SCREEN_COLS:
+        errors.append(f"{cols}x{rows} metatiles is not a whole number of 16x15 screens")
+    if len(metatiles) + len(added) > MAX_METATILES:
+        errors.append(f"{len(metatiles) + len(added)} metatiles exceed {MAX_METATILES}")
+    if errors:
+        for e in errors[:20]:
+            print(f"ERROR: {e}", file=sys.stderr)
+        if len(errors) > 20:
+            print(f"ERROR: ... and {len(errors) - 20} more", file=sys.stderr)
+        sys.exit(1)
+
+    screens_x, screens_y = cols // SCREEN_COLS, rows // SCREEN_ROWS
+    mt_out = Path(args.metatiles_out) if args.metatiles_out else mt_path
+    m = {
+        "name": args.name or out.stem,
+        "metatiles": os.path.relpath(mt_out, out.parent),
+        "screens_x": screens_x,
+        "screens_y": screens_y,
+        "screens": grid_to_screens(grid, screens_x, screens_y),
+    }
+    with nestrace.phase("write"):
+        save_map(out, m)
+        if added or args.metatiles_out:
+            mt_data["metatiles"] = metatiles + added
+            save_metatiles(mt_out, mt_data)
+
+    print(f"OK: {screens_x * screens_y} screens ({screens_x}x{screens_y}), "
+          f"{len(metatiles) + len(added)} metatiles ({len(added)} new) → {out}")
+
+
+if __name__ == "__main__":
+    main()
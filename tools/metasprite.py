@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+metasprite.py — Compile sprite sheet frames into metasprite tables and CHR.
+
+Each frame is a rectangle of an indexed sprite sheet (link.png,
+enemies.png, ...). Frames are cut into 8x8 tiles and blank tiles are
+dropped. Every remaining tile is matched against the tiles already packed,
+in all four hardware flips, so mirrored halves and repeated parts share
+one CHR tile. A frame can also be the H-mirror of another frame (flipped
+within the same rect), which costs no CHR at all.
+
+Frame definitions JSON (sheet path relative to the JSON file):
+
+  {
+    "name": "link",
+    "sheet": "link.png",
+    "cell": [16, 16],                   frame grid: cell n is n-th cell, row-major
+    "origin": [0, 0],                   default anchor inside the frame
+    "palette": 0,                       default sprite palette (0-3)
+    "frames": [
+      {"name": "walk_down_0", "cell": 0},
+      {"name": "attack_up", "rect": [16, 16, 16, 24], "origin": [0, 8]},
+      {"name": "walk_left_0", "mirror": "walk_right_0"}
+    ]
+  }
+
+Outputs:
+- CHR: the unique tiles from --base, padded to one 1KB bank
+- .s: one metasprite per frame for metasprite_put (src/sprites.s): count
+  byte, then Y offset, tile, attributes, X offset per sprite (OAM order,
+  offsets signed from the origin), plus {name}_frames_lo/hi
+- .inc: {NAME}_FRAME_<FRAME> = index equates
+
+Usage:
+  python3 metasprite.py assets/sprites/link_frames.json build/link_frames.s
+  python3 metasprite.py frames.json out.s --chr-out build/link.chr --base 0x40
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from nesasset import TILE_SIZE, TILES_PER_BANK, TileSheet
+from nespng import load_indexed_png
+
+
+FLIP_H = 0x40               # OAM attribute bits (SPR_FLIP_H / SPR_FLIP_V)
+FLIP_V = 0x80
+MAX_SPRITES = 64
+METASPRITE_SETUP_CYCLES = 64    # metasprite_put incl. jsr/rts
+METASPRITE_SPRITE_CYCLES = 77
+SPRITE_PUT_CYCLES = 70          # one jsr sprite_put, before argument setup
+
+
+class TilePool:
+    """Unique tiles, looked up in all four flips."""
+
+    def __init__(self):
+        self.tiles = []
+        self.index = {}
+
+    def add(self, tile: np.ndarray) -> tuple:
+        """Return (tile index, flip bits) drawing this 8x8 tile, packing it if new."""
+        key = TileSheet(tile[np.newaxis]).keys()[0]
+        if key not in self.index:
+            i = len(self.tiles)
+            self.tiles.append(tile)
+            sheet = TileSheet(tile[np.newaxis])
+            for flips, variant in ((0, sheet), (FLIP_H, sheet.flip_h()),
+                                   (FLIP_V, sheet.flip_v()), (FLIP_H | FLIP_V, sheet.flip_h().flip_v())):
+                self.index.setdefault(variant.keys()[0], (i, flips))
+        return self.index[key]
+
+    def sheet(self) -> TileSheet:
+        if not self.tiles:
+            return TileSheet.blank(0)
+        return TileSheet(np.stack(self.tiles))
+
+
+def frame_rect(defs: dict, frame: dict, sheet_w: int) -> list:
+    if "rect" in frame:
+        return frame["rect"]
+    cw, ch = defs["cell"]
+    row, col = divmod(frame["cell"], sheet_w // cw)
+    return [col * cw, row * ch, cw, ch]
+
+
+def compile_frames(defs: dict, pixels: np.ndarray, pool: TilePool, base: int) -> list:
+    """Returns [(frame name, [(dy, tile, attr, dx), ...])] in definition order."""
+    h, w = pixels.shape
+    default_origin = defs.get("origin", [0, 0])
+    default_palette = defs.get("palette", 0)
+    compiled = {}
+    widths = {}             # frame width - 2 * origin x, for mirrors
+    for frame in defs["frames"]:
+        name = frame["name"]
+        if name in compiled:
+            raise ValueError(f"frame '{name}' defined twice")
+        if "mirror" in frame:
+            if frame["mirror"] not in compiled:
+                raise ValueError(f"frame '{name}' mirrors '{frame['mirror']}', "
+                                 f"which must be defined before it")
+            # Mirror inside the source frame's rect: x' = width - 8 - x (from its left edge)
+            shift = widths[frame["mirror"]]
+            widths[name] = shift
+            compiled[name] = [(dy, tile, attr ^ FLIP_H, shift - TILE_SIZE - dx)
+                              for dy, tile, attr, dx in compiled[frame["mirror"]]]
+            continue
+        x, y, fw, fh = frame_rect(defs, frame, w)
+        if fw % TILE_SIZE or fh % TILE_SIZE or x < 0 or y < 0 or x + fw > w or y + fh > h:
+            raise ValueError(f"frame '{name}': rect {[x, y, fw, fh]} is not whole tiles "
+                             f"inside the {w}x{h} sheet")
+        ox, oy = frame.get("origin", default_origin)
+        palette = frame.get("palette", default_palette) & 0x03
+        tiles = TileSheet.from_indexed(pixels[y:y + fh, x:x + fw])
+        sprites = []
+        for t, blank in enumerate(tiles.blank_mask()):
+            if blank:
+                continue
+            row, col = divmod(t, fw // TILE_SIZE)
+            tile, flips = pool.add(tiles.pixels[t])
+            sprites.append((row * TILE_SIZE - oy, base + tile, flips | palette, col * TILE_SIZE - ox))
+        compiled[name] = sprites
+        widths[name] = fw - 2 * ox
+    return [(frame["name"], compiled[frame["name"]]) for frame in defs["frames"]]
+
+
+def label(text: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile sprite sheet frames into metasprites")
+    parser.add_argument("input", help="Frame definitions JSON")
+    parser.add_argument("output", help="Output .s assembly file")
+    parser.add_argument("--chr-out", type=str, default=None,
+                        help="Packed CHR (default: output with .chr suffix)")
+    parser.add_argument("--ids", type=str, default=None,
+                        help="Frame index .inc (default: output with .inc suffix)")
+    parser.add_argument("--base", type=lambda s: int(s, 0), default=0,
+                        help="Tile index of the first packed tile (default: 0)")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the data")
+    parser.add_argument("--pad", type=int, default=1024,
+                        help="Pad CHR to a multiple of N bytes (default: 1024, 0 = no padding)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("metasprite", args)
+
+    src = Path(args.input)
+    with nestrace.phase("load"):
+        defs = json.loads(src.read_text())
+        name = label(defs["name"])
+        try:
+            pixels = load_indexed_png(src.parent / defs["sheet"])
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    pool = TilePool()
+    with nestrace.phase("encode"):
+        try:
+            frames = compile_frames(defs, pixels, pool, args.base)
+        except ValueError as e:
+            print(f"ERROR: {src}: {e}", file=sys.stderr)
+            sys.exit(1)
+        sheet = pool.sheet()
+        chr_data = sheet.to_chr()
+        if args.pad > 0 and len(chr_data) % args.pad:
+            chr_data += bytes(args.pad - len(chr_data) % args.pad)
+
+    if args.base + len(sheet) > 256:
+        print(f"ERROR: {len(sheet)} tiles from ${args.base:02X} exceed the 256-tile "
+              f"pattern table", file=sys.stderr)
+        sys.exit(1)
+    errors = [f"frame '{f}': {len(s)} sprites exceed {MAX_SPRITES}"
+              for f, s in frames if len(s) > MAX_SPRITES]
+    if errors:
+        for e in errors:
+            print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    out = [
+        "; ==========================================================",
+        "; Metasprites — auto-generated by metasprite.py",
+        f"; Source: {args.input}",
+        "; DO NOT EDIT — regenerate from frame definitions",
+        "; Per frame: count, then Y offset, tile, attributes, X offset",
+        "; per sprite (for metasprite_put in src/sprites.s)",
+        "; ==========================================================",
+        "",
+    ]
+    if args.segment:
+        out += [f'.segment "{args.segment}"', ""]
+    for frame, sprites in frames:
+        out.append(f"{name}_{label(frame)}:")
+        out.append(f"    .byte {len(sprites)}")
+        for dy, tile, attr, dx in sprites:
+            out.append(f"    .byte ${dy & 0xFF:02X}, ${tile:02X}, ${attr:02X}, ${dx & 0xFF:02X}")
+    out.append("")
+    out.append(f".export {name}_frames_lo, {name}_frames_hi")
+    out.append(f"{name}_frames_lo:")
+    out.extend(f"    .byte <{name}_{label(frame)}" for frame, _ in frames)
+    out.append(f"{name}_frames_hi:")
+    out.extend(f"    .byte >{name}_{label(frame)}" for frame, _ in frames)
+    out.append("")
+
+    ids = [f"; Frame indices for {name}_frames_lo/hi — auto-generated by metasprite.py"]
+    ids += [f"{name.upper()}_FRAME_{label(frame).upper()} = {i}" for i, (frame, _) in enumerate(frames)]
+    ids.append(f"{name.upper()}_FRAME_COUNT = {len(frames)}")
+
+    chr_path = Path(args.chr_out) if args.chr_out else Path(args.output).with_suffix(".chr")
+    ids_path = Path(args.ids) if args.ids else Path(args.output).with_suffix(".inc")
+    with nestrace.phase("write"):
+        for path in (Path(args.output), chr_path, ids_path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text("\n".join(out))
+        chr_path.write_bytes(chr_data)
+        ids_path.write_text("\n".join(ids) + "\n")
+
+    print("  frame                 OAM  cycles  (sprite_put calls)")
+    for frame, sprites in frames:
+        n = len(sprites)
+        print(f"  {frame:<20} {n:4d}  {METASPRITE_SETUP_CYCLES + METASPRITE_SPRITE_CYCLES * n:6d}"
+              f"  ({SPRITE_PUT_CYCLES * n}+)")
+    placed = sum(len(s) for _, s in frames)
+    table_bytes = sum(1 + 4 * len(s) for _, s in frames) + 2 * len(frames)
+    if len(sheet) > TILES_PER_BANK:
+        print(f"WARN: {len(sheet)} tiles span more than one 1KB bank", file=sys.stderr)
+    print(f"OK: {len(frames)} frames, {placed} sprites from {len(sheet)} unique tiles "
+          f"(${args.base:02X}-${args.base + max(len(sheet), 1) - 1:02X}), {table_bytes} table bytes "
+          f"→ {args.output}, {chr_path}")
+
+
+if __name__ == "__main__":
+    main()
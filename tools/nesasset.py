@@ -0,0 +1,319 @@
+"""
+nesasset.py — Shared NES CHR tile model for the asset tools.
+
+A TileSheet holds N 8x8 tiles as one contiguous (N, 8, 8) uint8 array of
+palette indices (0-3), so memory is 64 bytes per tile regardless of how the
+tiles were produced. Raw CHR data (16 bytes per tile: 8 bytes bit-plane 0,
+then 8 bytes bit-plane 1) can be viewed without copying as an (N, 2, 8)
+array with chr_planes(), which works on bytes, bytearray, memoryview and
+mmap objects alike.
+
+Typical use:
+  sheet = TileSheet.from_chr(Path("overworld.chr").read_bytes())
+  sheet = TileSheet.from_indexed(pixels)      # HxW array of palette indices
+  data = sheet.to_chr()
+  image = sheet.to_indexed(cols=16)           # back to an HxW array
+  bank = sheet.bank(2)                        # tiles 128-191, no copy
+  mirrored = sheet.flip_h()
+  unique = len(set(sheet.keys()))
+
+parse_ines() decodes a ROM header into PRG/CHR sizes and file offsets for
+the tools that patch build/zelda2b.nes directly.
+
+The single-pass converters (png2chr, chr2png, validate_chr) use the plain
+Python byte codecs instead of a TileSheet, so they start without NumPy:
+
+  data = indexed_to_chr(pixels, width, height)    # row-major index bytes
+  pixels, width, height = chr_to_indexed(data, cols=16)
+  keys = tile_keys(data)
+
+They work on whole buffers at once (bytes.translate, slicing, and big-int
+shifts for bit packing), so they stay fast on a full 256KB CHR.
+
+NumPy and Pillow are imported on first use (numpy(), pil_image()), so the
+byte-level tools (chr_splice.py, rom_patch.py) run without either and the
+other tools pay only for what their code path touches.
+"""
+
+import sys
+
+TYPE_CHECKING = False       # typing.TYPE_CHECKING without importing typing
+if TYPE_CHECKING:
+    import numpy as np
+
+
+TILE_SIZE = 8               # pixels per side
+TILE_BYTES = 16             # bytes per tile in CHR format
+TILES_PER_BANK = 64         # tiles per 1KB CHR bank
+BANK_BYTES = TILE_BYTES * TILES_PER_BANK
+
+INES_HEADER_BYTES = 16
+INES_TRAINER_BYTES = 512
+PRG_BANK_BYTES = 8192       # MMC3 PRG bank ($8000/$A000/$C000/$E000 windows)
+
+
+def parse_ines(header: bytes) -> dict:
+    """Decode an iNES / NES 2.0 header into sizes and file offsets.
+
+    Returns a dict with mapper, nes2, trainer, prg_size, chr_size,
+    prg_offset and chr_offset (all sizes in bytes). Raises ValueError if
+    the magic number is missing.
+    """
+    if len(header) < INES_HEADER_BYTES or bytes(header[:4]) != b"NES\x1a":
+        raise ValueError("Not an iNES file (missing 'NES\\x1A' magic)")
+    flags6, flags7 = header[6], header[7]
+    nes2 = (flags7 & 0x0C) == 0x08
+    prg_units, chr_units = header[4], header[5]
+    if nes2:
+        prg_units |= (header[9] & 0x0F) << 8
+        chr_units |= (header[9] & 0xF0) << 4
+    mapper = (flags6 >> 4) | (flags7 & 0xF0)
+    if nes2:
+        mapper |= (header[8] & 0x0F) << 8
+    trainer = bool(flags6 & 0x04)
+    prg_offset = INES_HEADER_BYTES + (INES_TRAINER_BYTES if trainer else 0)
+    prg_size = prg_units * 16384
+    return {
+        "mapper": mapper,
+        "nes2": nes2,
+        "trainer": trainer,
+        "prg_size": prg_size,
+        "chr_size": chr_units * 8192,
+        "prg_offset": prg_offset,
+        "chr_offset": prg_offset + prg_size,
+    }
+
+
+# Bit 0 and bit 1 of each palette index, for bytes.translate
+_LOW_BIT = bytes(i & 1 for i in range(256))
+_HIGH_BIT = bytes((i >> 1) & 1 for i in range(256))
+
+
+def pack_bits(values: bytes, depth: int) -> bytes:
+    """Pack values below 2**depth, 8 // depth per byte, first value in the high bits.
+
+    len(values) must be a multiple of 8 // depth.
+    """
+    while depth < 8:
+        # Each byte pair (hi, lo) becomes hi << depth | lo; no byte can carry
+        half = len(values) // 2
+        hi = int.from_bytes(values[0::2], "big")
+        lo = int.from_bytes(values[1::2], "big")
+        values = ((hi << depth) | lo).to_bytes(half, "big")
+        depth *= 2
+    return values
+
+
+def unpack_bits(packed: bytes, depth: int) -> bytes:
+    """Inverse of pack_bits: one byte per depth-bit value."""
+    size = 8
+    while size > depth:
+        size //= 2
+        n = len(packed)
+        x = int.from_bytes(packed, "big")
+        mask = int.from_bytes(bytes([(1 << size) - 1]) * n, "big")
+        out = bytearray(2 * n)
+        out[0::2] = ((x >> size) & mask).to_bytes(n, "big")
+        out[1::2] = (x & mask).to_bytes(n, "big")
+        packed = bytes(out)
+    return packed
+
+
+def tile_keys(data: bytes) -> list:
+    """The 16 CHR bytes of every whole tile, equal for identical tiles."""
+    return [data[i:i + TILE_BYTES] for i in range(0, len(data) - TILE_BYTES + 1, TILE_BYTES)]
+
+
+def indexed_to_chr(pixels: bytes, width: int, height: int) -> bytes:
+    """Encode row-major palette indices (low two bits used) to CHR, tiles left-to-right, top-to-bottom."""
+    if width % TILE_SIZE != 0 or height % TILE_SIZE != 0:
+        raise ValueError(f"Image dimensions {width}x{height} must be multiples of 8.")
+    tiled = b"".join(pixels[y * width + x:y * width + x + TILE_SIZE]
+                     for ty in range(0, height, TILE_SIZE)
+                     for x in range(0, width, TILE_SIZE)
+                     for y in range(ty, ty + TILE_SIZE))
+    plane0 = pack_bits(tiled.translate(_LOW_BIT), 1)
+    plane1 = pack_bits(tiled.translate(_HIGH_BIT), 1)
+    return b"".join(plane0[i:i + TILE_SIZE] + plane1[i:i + TILE_SIZE]
+                    for i in range(0, len(plane0), TILE_SIZE))
+
+
+def chr_to_indexed(data: bytes, cols: int = 16) -> tuple:
+    """(row-major palette indices, width, height) of CHR tiles laid out cols wide.
+
+    Any trailing partial tile is ignored; missing tiles in the last row are 0.
+    """
+    keys = tile_keys(data)
+    plane0 = unpack_bits(b"".join(k[:TILE_SIZE] for k in keys), 1)
+    plane1 = unpack_bits(b"".join(k[TILE_SIZE:] for k in keys), 1)
+    tiled = (int.from_bytes(plane0, "big") | int.from_bytes(plane1, "big") << 1) \
+        .to_bytes(len(plane0), "big")
+    bands = -(-len(keys) // cols)
+    tiled += bytes((bands * cols - len(keys)) * TILE_SIZE * TILE_SIZE)
+    starts = (((band * cols + c) * TILE_SIZE + y) * TILE_SIZE
+              for band in range(bands) for y in range(TILE_SIZE) for c in range(cols))
+    image = b"".join(tiled[i:i + TILE_SIZE] for i in starts)
+    return image, cols * TILE_SIZE, bands * TILE_SIZE
+
+
+def numpy():
+    """The numpy module, imported on first use."""
+    try:
+        import numpy
+    except ImportError:
+        print("ERROR: NumPy is required. Install with: pip3 install numpy", file=sys.stderr)
+        sys.exit(1)
+    return numpy
+
+
+def pil_image():
+    """Pillow's Image module, imported on first use."""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("ERROR: Pillow is required. Install with: pip3 install Pillow", file=sys.stderr)
+        sys.exit(1)
+    return Image
+
+
+def chr_planes(buf) -> "np.ndarray":
+    """Zero-copy (N, 2, 8) view of raw CHR data: [tile, plane, row].
+
+    Any trailing partial tile is ignored. Writable buffers (bytearray,
+    writable mmap) give a writable view.
+    """
+    np = numpy()
+    count = len(buf) // TILE_BYTES * TILE_BYTES
+    return np.frombuffer(buf, dtype=np.uint8, count=count).reshape(-1, 2, TILE_SIZE)
+
+
+def planes_to_pixels(planes: "np.ndarray") -> "np.ndarray":
+    """Decode (N, 2, 8) bit-planes to (N, 8, 8) palette indices."""
+    np = numpy()
+    bits = np.unpackbits(planes[..., np.newaxis], axis=-1)   # (N, 2, 8, 8), MSB = left pixel
+    return bits[:, 0] | (bits[:, 1] << 1)
+
+
+def pixels_to_planes(pixels: "np.ndarray") -> "np.ndarray":
+    """Encode (N, 8, 8) palette indices to (N, 2, 8) bit-planes."""
+    np = numpy()
+    plane0 = np.packbits(pixels & 1, axis=-1)[..., 0]
+    plane1 = np.packbits((pixels >> 1) & 1, axis=-1)[..., 0]
+    return np.stack([plane0, plane1], axis=1)
+
+
+class TileSheet:
+    """A sequence of 8x8 2bpp tiles backed by one (N, 8, 8) uint8 array."""
+
+    __slots__ = ("pixels",)
+
+    def __init__(self, pixels: "np.ndarray"):
+        np = numpy()
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        if pixels.ndim != 3 or pixels.shape[1:] != (TILE_SIZE, TILE_SIZE):
+            raise ValueError(f"Expected an (N, 8, 8) array, got shape {pixels.shape}.")
+        self.pixels = pixels
+
+    # --- Construction ---
+
+    @classmethod
+    def blank(cls, count: int) -> "TileSheet":
+        """count tiles of colour 0."""
+        np = numpy()
+        return cls(np.zeros((count, TILE_SIZE, TILE_SIZE), dtype=np.uint8))
+
+    @classmethod
+    def from_chr(cls, data) -> "TileSheet":
+        """Decode raw CHR data (any buffer object)."""
+        return cls(planes_to_pixels(chr_planes(data)))
+
+    @classmethod
+    def from_indexed(cls, image: "np.ndarray") -> "TileSheet":
+        """Cut an HxW array of palette indices into tiles, left-to-right, top-to-bottom.
+
+        Indices above 3 are reduced to their low two bits.
+        """
+        np = numpy()
+        image = np.asarray(image, dtype=np.uint8)
+        h, w = image.shape
+        if w % TILE_SIZE != 0 or h % TILE_SIZE != 0:
+            raise ValueError(f"Image dimensions {w}x{h} must be multiples of 8.")
+        tiles = image.reshape(h // TILE_SIZE, TILE_SIZE, w // TILE_SIZE, TILE_SIZE)
+        tiles = tiles.transpose(0, 2, 1, 3).reshape(-1, TILE_SIZE, TILE_SIZE)
+        return cls(tiles & 0x03)
+
+    # --- Conversion ---
+
+    def planes(self) -> "np.ndarray":
+        """(N, 2, 8) bit-plane array."""
+        return pixels_to_planes(self.pixels)
+
+    def to_chr(self) -> bytes:
+        """Encode to raw CHR bytes."""
+        return self.planes().tobytes()
+
+    def to_indexed(self, cols: int = 16) -> "np.ndarray":
+        """Lay tiles out in a grid cols tiles wide. Missing tiles in the last row are 0."""
+        np = numpy()
+        n = len(self)
+        rows = (n + cols - 1) // cols
+        grid = np.zeros((rows * cols, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+        grid[:n] = self.pixels
+        grid = grid.reshape(rows, cols, TILE_SIZE, TILE_SIZE).transpose(0, 2, 1, 3)
+        return grid.reshape(rows * TILE_SIZE, cols * TILE_SIZE)
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return self.pixels.shape[0]
+
+    def __getitem__(self, index):
+        """A tile as an 8x8 array, or a TileSheet view for a slice / index array."""
+        np = numpy()
+        if isinstance(index, (int, np.integer)):
+            return self.pixels[index]
+        return TileSheet(self.pixels[index])
+
+    def bank(self, index: int) -> "TileSheet":
+        """The 64 tiles of 1KB bank `index` (a view, not a copy)."""
+        start = index * TILES_PER_BANK
+        return TileSheet(self.pixels[start:start + TILES_PER_BANK])
+
+    def bank_count(self) -> int:
+        """Number of 1KB banks covered, counting a partial last bank."""
+        return (len(self) + TILES_PER_BANK - 1) // TILES_PER_BANK
+
+    def pad_to_bank(self) -> "TileSheet":
+        """Copy padded with blank tiles to a whole number of 1KB banks."""
+        np = numpy()
+        missing = -len(self) % TILES_PER_BANK
+        if not missing:
+            return self
+        pad = np.zeros((missing, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+        return TileSheet(np.concatenate([self.pixels, pad]))
+
+    # --- Transforms ---
+
+    def flip_h(self) -> "TileSheet":
+        """Mirror every tile horizontally (the OAM horizontal-flip bit)."""
+        return TileSheet(self.pixels[:, :, ::-1])
+
+    def flip_v(self) -> "TileSheet":
+        """Mirror every tile vertically (the OAM vertical-flip bit)."""
+        return TileSheet(self.pixels[:, ::-1, :])
+
+    # --- Hashing ---
+
+    def keys(self) -> list:
+        """Per-tile hashable keys (the 16 CHR bytes), equal for identical tiles."""
+        data = self.to_chr()
+        return [data[i:i + TILE_BYTES] for i in range(0, len(data), TILE_BYTES)]
+
+    def blank_mask(self) -> "np.ndarray":
+        """Boolean array, True where a tile is entirely colour 0."""
+        return ~self.pixels.reshape(len(self), -1).any(axis=1)
+
+    def digest(self) -> str:
+        """SHA-1 of the CHR encoding of the whole sheet."""
+        import hashlib
+        return hashlib.sha1(self.to_chr()).hexdigest()
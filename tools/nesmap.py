@@ -0,0 +1,141 @@
+"""
+nesmap.py — Shared map format for the map tools (pure Python, no NumPy).
+
+A map is a grid of screens, each 16x15 metatiles (one 32x30-tile
+nametable). Map JSON:
+
+  {
+    "name": "overworld_map",
+    "metatiles": "../tilesets/overworld_metatiles.json",
+    "screens_x": 4,
+    "screens_y": 2,
+    "screens": [[240 metatile indices, row-major], ...]
+  }
+
+Screens are stored row-major (screen index = sy * screens_x + sx). The
+metatiles path is relative to the map file. Metatile indices are bytes.
+
+Typical use:
+  m = load_map("assets/maps/overworld_map.json")
+  grid = map_grid(m)                  # full map as rows of metatile indices
+  m["screens"] = grid_to_screens(grid, m["screens_x"], m["screens_y"])
+  save_map("assets/maps/overworld_map.json", m)
+"""
+
+import json
+from pathlib import Path
+
+
+SCREEN_COLS = 16            # metatiles per screen row
+SCREEN_ROWS = 15            # metatile rows per screen
+SCREEN_CELLS = SCREEN_COLS * SCREEN_ROWS
+METATILE_PX = 16            # pixels per metatile side
+ATTR_COLS = 8               # attribute bytes per nametable row (32x32 px each)
+ATTR_ROWS = 8               # attribute rows; the last covers metatile row 14 only
+ATTR_TABLE_BYTES = ATTR_COLS * ATTR_ROWS
+
+
+def validate_map(m: dict) -> list:
+    """Return a list of schema errors (empty if the map is well formed)."""
+    errors = []
+    for key in ("name", "screens_x", "screens_y", "screens"):
+        if key not in m:
+            errors.append(f"missing '{key}'")
+    if errors:
+        return errors
+    expected = m["screens_x"] * m["screens_y"]
+    if len(m["screens"]) != expected:
+        errors.append(f"{len(m['screens'])} screens, expected {expected} "
+                      f"({m['screens_x']}x{m['screens_y']})")
+    for i, screen in enumerate(m["screens"]):
+        if len(screen) != SCREEN_CELLS:
+            errors.append(f"screen {i}: {len(screen)} cells, expected {SCREEN_CELLS}")
+        elif not all(0 <= v <= 0xFF for v in screen):
+            errors.append(f"screen {i}: metatile index out of byte range")
+    return errors
+
+
+def load_map(path) -> dict:
+    """Load and validate a map JSON file. Raises ValueError on schema errors."""
+    m = json.loads(Path(path).read_text())
+    errors = validate_map(m)
+    if errors:
+        raise ValueError(f"{path}: " + "; ".join(errors))
+    return m
+
+
+def save_map(path, m: dict):
+    """Write a map JSON file with one screen per line."""
+    head = {k: v for k, v in m.items() if k != "screens"}
+    lines = json.dumps(head, indent=2)[:-2].splitlines()
+    lines[-1] += ","
+    lines.append('  "screens": [')
+    screens = [json.dumps(s, separators=(",", ":")) for s in m["screens"]]
+    lines += [f"    {s}," for s in screens[:-1]] + [f"    {s}" for s in screens[-1:]]
+    lines += ["  ]", "}"]
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text("\n".join(lines) + "\n")
+
+
+def save_metatiles(path, data: dict):
+    """Write a metatile JSON file in the tileset style: one metatile per line."""
+    head = {k: v for k, v in data.items() if k != "metatiles"}
+    lines = ["{"] + [f"  {json.dumps(k)}: {json.dumps(v)}," for k, v in head.items()]
+    lines.append('  "metatiles": [')
+    entries = [json.dumps(mt) for mt in data["metatiles"]]
+    lines += [f"    {e}," for e in entries[:-1]] + [f"    {e}" for e in entries[-1:]]
+    lines += ["  ]", "}"]
+    Path(path).write_text("\n".join(lines) + "\n")
+
+
+def metatiles_path(m: dict, map_path) -> Path:
+    """Resolve the map's metatile JSON path relative to the map file."""
+    return Path(map_path).parent / m["metatiles"]
+
+
+def screen_rows(screen: list) -> list:
+    """A screen's 240 cells as 15 rows of 16."""
+    return [screen[r * SCREEN_COLS:(r + 1) * SCREEN_COLS] for r in range(SCREEN_ROWS)]
+
+
+def attribute_table(screen: list, palettes: list) -> bytes:
+    """A screen's 64-byte nametable attribute table.
+
+    palettes[i] is metatile i's palette (attr bits 0-1). Each byte packs the
+    2x2 metatiles it covers: TL in bits 0-1, TR 2-3, BL 4-5, BR 6-7.
+    """
+    table = bytearray(ATTR_TABLE_BYTES)
+    for ar in range(ATTR_ROWS):
+        for ac in range(ATTR_COLS):
+            value = 0
+            for dy, dx, shift in ((0, 0, 0), (0, 1, 2), (1, 0, 4), (1, 1, 6)):
+                r, c = ar * 2 + dy, ac * 2 + dx
+                if r < SCREEN_ROWS:
+                    value |= (palettes[screen[r * SCREEN_COLS + c]] & 0x03) << shift
+            table[ar * ATTR_COLS + ac] = value
+    return bytes(table)
+
+
+def map_grid(m: dict) -> list:
+    """The whole map as rows of metatile indices (screens_y * 15 rows of screens_x * 16)."""
+    grid = []
+    for sy in range(m["screens_y"]):
+        rows = [[] for _ in range(SCREEN_ROWS)]
+        for sx in range(m["screens_x"]):
+            for r, row in enumerate(screen_rows(m["screens"][sy * m["screens_x"] + sx])):
+                rows[r].extend(row)
+        grid.extend(rows)
+    return grid
+
+
+def grid_to_screens(grid: list, screens_x: int, screens_y: int) -> list:
+    """Cut a full-map grid into row-major screens of 240 cells."""
+    screens = []
+    for sy in range(screens_y):
+        for sx in range(screens_x):
+            cells = []
+            for r in range(SCREEN_ROWS):
+                row = grid[sy * SCREEN_ROWS + r]
+                cells.extend(row[sx * SCREEN_COLS:(sx + 1) * SCREEN_COLS])
+            screens.append(cells)
+    return screens
@@ -0,0 +1,206 @@
+"""
+nespng.py — Built-in codec for indexed PNGs, the format of every CHR sheet.
+
+The asset sheets are small paletted PNGs (colour type 3, bit depth 1, 2, 4
+or 8, not interlaced). decode_indexed() reads those straight into row-major
+palette index bytes with zlib, and encode_indexed() writes them back at
+the smallest bit depth that holds the indices. Both are plain Python on
+whole buffers (see nesasset.pack_bits), so the common path imports neither
+Pillow nor NumPy and never converts through RGB.
+
+load_indexed() is what the tools call: any other PNG variant, or another
+image format, falls back to Pillow (nesasset.pil_image()). The NumPy tools
+use load_indexed_png() for the same pixels as an HxW array.
+
+Typical use:
+  pixels, width, height = load_indexed("assets/tilesets/overworld.png")
+  pixels, width, height, palette = decode_indexed(Path("link.png").read_bytes())
+  save_indexed("build/overworld_preview.png", pixels, width, height, [(0, 0, 0), ...])
+"""
+
+import struct
+import zlib
+from pathlib import Path
+
+from nesasset import TYPE_CHECKING, numpy, pack_bits, pil_image, unpack_bits
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+COLOR_INDEXED = 3
+INDEXED_DEPTHS = (1, 2, 4, 8)
+ZLIB_LEVEL = 9
+
+
+def _chunks(data: bytes):
+    """(type, payload) of every chunk, CRC checked."""
+    pos = len(PNG_SIGNATURE)
+    while pos + 12 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        payload = data[pos + 8:pos + 8 + length]
+        crc = data[pos + 8 + length:pos + 12 + length]
+        if len(payload) != length or len(crc) != 4:
+            raise ValueError(f"truncated {kind.decode('latin-1')} chunk")
+        if zlib.crc32(kind + payload) != struct.unpack(">I", crc)[0]:
+            raise ValueError(f"bad CRC in {kind.decode('latin-1')} chunk")
+        yield kind, payload
+        if kind == b"IEND":
+            return
+        pos += 12 + length
+    raise ValueError("missing IEND chunk")
+
+
+def _paeth(raw: bytes, prev: bytes) -> bytes:
+    out = bytearray(raw)
+    left = upleft = 0
+    for i, b in enumerate(out):
+        above = prev[i]
+        p = left + above - upleft
+        pa, pb, pc = abs(p - left), abs(p - above), abs(p - upleft)
+        pred = left if pa <= pb and pa <= pc else (above if pb <= pc else upleft)
+        left = out[i] = (b + pred) & 0xFF
+        upleft = above
+    return bytes(out)
+
+
+def _unfilter_row(f: int, raw: bytes, prev: bytes) -> bytes:
+    """Undo one row's filter, one byte per filter unit (bit depth <= 8)."""
+    if f == 0:
+        return raw
+    if f == 2:
+        return bytes((a + b) & 0xFF for a, b in zip(raw, prev))
+    out = bytearray(raw)
+    left = 0
+    if f == 1:
+        for i, b in enumerate(out):
+            left = out[i] = (b + left) & 0xFF
+    elif f == 3:
+        for i, b in enumerate(out):
+            left = out[i] = (b + ((left + prev[i]) >> 1)) & 0xFF
+    elif f == 4:
+        return _paeth(raw, prev)
+    else:
+        raise ValueError(f"unknown filter type {f}")
+    return bytes(out)
+
+
+def decode_indexed(data: bytes):
+    """(palette index bytes, width, height, [(r, g, b), ...]) of an indexed PNG.
+
+    Pixels are row-major, one byte each. Returns None for a valid image
+    outside the built-in path (other colour types, interlaced), so the
+    caller can hand it to Pillow. Raises ValueError for data that is not
+    a well-formed PNG.
+    """
+    if data[:len(PNG_SIGNATURE)] != PNG_SIGNATURE:
+        return None
+    header = None
+    palette = []
+    idat = []
+    for kind, payload in _chunks(data):
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", payload)
+        elif kind == b"PLTE":
+            palette = [tuple(payload[i:i + 3]) for i in range(0, len(payload) - 2, 3)]
+        elif kind == b"IDAT":
+            idat.append(payload)
+    if header is None:
+        raise ValueError("missing IHDR chunk")
+    width, height, depth, color, _compression, _filter, interlace = header
+    if color != COLOR_INDEXED or depth not in INDEXED_DEPTHS or interlace:
+        return None
+
+    row_bytes = (width * depth + 7) // 8
+    stride = row_bytes + 1
+    try:
+        raw = zlib.decompress(b"".join(idat))
+    except zlib.error as e:
+        raise ValueError(f"corrupt image data: {e}") from None
+    if len(raw) < height * stride:
+        raise ValueError(f"image data is {len(raw)} bytes, expected {height * stride}")
+    if not any(raw[0:height * stride:stride]):
+        # No filtered rows (the usual case for paletted images): slice them out
+        rows = [raw[y * stride + 1:(y + 1) * stride] for y in range(height)]
+    else:
+        rows = []
+        prev = bytes(row_bytes)
+        for y in range(height):
+            try:
+                prev = _unfilter_row(raw[y * stride], raw[y * stride + 1:(y + 1) * stride], prev)
+            except ValueError as e:
+                raise ValueError(f"row {y}: {e}") from None
+            rows.append(prev)
+
+    if depth == 8:
+        return b"".join(rows), width, height, palette
+    unpacked = unpack_bits(b"".join(rows), depth)
+    per_row = row_bytes * (8 // depth)
+    if per_row != width:
+        unpacked = b"".join(unpacked[y * per_row:y * per_row + width] for y in range(height))
+    return unpacked, width, height, palette
+
+
+def _chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + kind + payload + \
+        struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def encode_indexed(pixels: bytes, width: int, height: int, palette: list) -> bytes:
+    """Indexed PNG of row-major palette index bytes, at the smallest bit depth that fits."""
+    if len(pixels) != width * height:
+        raise ValueError(f"{len(pixels)} pixels for a {width}x{height} image")
+    top = max(pixels, default=0)
+    if top >= len(palette):
+        raise ValueError(f"index {top} has no palette entry ({len(palette)} colors)")
+    depth = next(d for d in INDEXED_DEPTHS if top < 1 << d)
+
+    per_byte = 8 // depth
+    pad = -width % per_byte
+    if pad:
+        pixels = b"".join(pixels[y * width:(y + 1) * width] + bytes(pad) for y in range(height))
+    packed = pack_bits(bytes(pixels), depth)
+    row_bytes = (width + pad) // per_byte
+    # Filter type 0 on every row: the usual choice for paletted images
+    raw = b"".join(b"\x00" + packed[y * row_bytes:(y + 1) * row_bytes] for y in range(height))
+
+    plte = bytes(c for rgb in palette[:1 << depth] for c in rgb)
+    return b"".join([
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, depth, COLOR_INDEXED, 0, 0, 0)),
+        _chunk(b"PLTE", plte),
+        _chunk(b"IDAT", zlib.compress(raw, ZLIB_LEVEL)),
+        _chunk(b"IEND", b""),
+    ])
+
+
+def load_indexed(path, quantize: bool = False) -> tuple:
+    """(row-major palette index bytes, width, height) of an image file.
+
+    Indexed PNGs are decoded here; anything else goes through Pillow. A
+    non-indexed image is an error, or with quantize reduced to 4 colours.
+    """
+    path = Path(path)
+    decoded = decode_indexed(path.read_bytes())
+    if decoded is not None:
+        return decoded[:3]
+    Image = pil_image()
+    img = Image.open(path)
+    if img.mode != "P":
+        if not quantize or img.mode not in ("RGBA", "RGB", "L"):
+            raise ValueError(f"{path}: need an indexed (P) image, got {img.mode}")
+        img = img.quantize(colors=4, method=Image.Quantize.MEDIANCUT)
+    return img.tobytes(), img.size[0], img.size[1]
+
+
+def load_indexed_png(path) -> "np.ndarray":
+    """HxW uint8 array of an image file's palette indices, reduced to 0-3."""
+    np = numpy()
+    pixels, width, height = load_indexed(path)
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(height, width) & 0x03
+
+
+def save_indexed(path, pixels: bytes, width: int, height: int, palette: list):
+    """Write row-major palette index bytes as an indexed PNG."""
+    Path(path).write_bytes(encode_indexed(pixels, width, height, palette))
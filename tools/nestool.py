@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+nestool.py — One entry point for the asset tools, with lazy subcommand imports.
+
+Each subcommand is an existing tool's main(); its module (and NumPy or
+Pillow with it) is imported only when that subcommand runs, so listing
+commands or printing help costs no more than the interpreter start.
+
+  python3 nestool.py png2chr assets/tilesets/overworld.png build/overworld.chr
+  python3 nestool.py json2asm assets/maps/overworld_map.json build/overworld_map.s --type map
+  python3 nestool.py list
+
+A batch file runs many commands in one process, so the interpreter and the
+shared modules (nesasset, numpy, PIL) load once instead of per command. One
+command per line, shell quoting, blank lines and # comments ignored:
+
+  # build/assets.nestool
+  png2chr assets/tilesets/overworld.png build/overworld.chr --pad 1024
+  validate build/overworld.chr
+  text2asm assets/text/dialog.json build/dialog.s
+
+  python3 nestool.py --batch build/assets.nestool --time
+
+The batch stops at the first failing command unless --keep-going is given.
+--time reports import and run time per command, which shows how much of a
+standalone run is start-up cost.
+"""
+
+import argparse
+import importlib
+import shlex
+import sys
+import time
+
+import nestrace
+
+
+# Subcommand → tool module. Modules are imported on first use only.
+COMMANDS = {
+    "png2chr": "png2chr",
+    "chr2png": "chr2png",
+    "validate": "validate_chr",
+    "chr-splice": "chr_splice",
+    "chr-anim": "chr_anim",
+    "chr-dupes": "chr_dupes",
+    "font-subset": "font_subset",
+    "json2asm": "json2asm",
+    "text2asm": "text2asm",
+    "map-import": "map_import",
+    "collision-maps": "collision_maps",
+    "flow-fields": "flow_fields",
+    "scroll-strips": "scroll_strips",
+    "superblocks": "superblocks",
+    "metasprite": "metasprite",
+    "sprite-overflow": "sprite_overflow",
+    "apu-render": "apu_render",
+    "rom-budget": "rom_budget",
+    "rom-patch": "rom_patch",
+    "trace": "nestrace",
+}
+
+
+def run_command(argv: list, timing: list = None) -> int:
+    """Run one subcommand in-process. Returns its exit status."""
+    if not argv:
+        return 0
+    cmd, rest = argv[0], argv[1:]
+    if cmd not in COMMANDS:
+        print(f"ERROR: unknown command '{cmd}' (see 'nestool.py list')", file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    with nestrace.phase(f"import {cmd}"):
+        module = importlib.import_module(COMMANDS[cmd])
+    t1 = time.perf_counter()
+    # argparse takes the program name from sys.argv[0]
+    prog, sys.argv[0] = sys.argv[0], f"nestool {cmd}"
+    status = 0
+    try:
+        with nestrace.phase(cmd, {"argv": rest}):
+            module.main(rest)
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        print(f"ERROR: {cmd}: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        sys.argv[0] = prog
+    if timing is not None:
+        timing.append((shlex.join(argv), (t1 - t0) * 1000, (time.perf_counter() - t1) * 1000, status))
+    return status
+
+
+def read_batch(path: str) -> list:
+    """Commands of a batch file as argv lists."""
+    commands = []
+    with open(path) as f:
+        for line in f:
+            argv = shlex.split(line, comments=True)
+            if argv:
+                commands.append(argv)
+    return commands
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Everything after the subcommand name belongs to the tool
+    split = next((i for i, a in enumerate(argv) if a in COMMANDS or a == "list"), len(argv))
+    parser = argparse.ArgumentParser(
+        description="Run NES asset tools as subcommands",
+        epilog="commands: list, " + ", ".join(COMMANDS))
+    parser.add_argument("--batch", type=str, default=None,
+                        help="File of commands to run in one process")
+    parser.add_argument("--keep-going", action="store_true",
+                        help="Run the rest of a batch after a command fails")
+    parser.add_argument("--time", action="store_true",
+                        help="Report import and run time per command")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv[:split])
+    command = argv[split:]
+    nestrace.setup("nestool", args)
+
+    if command[:1] == ["list"]:
+        for name, module in COMMANDS.items():
+            print(f"  {name:<16} {module}.py")
+        return
+    if args.batch:
+        if command:
+            parser.error("give either --batch or a command, not both")
+        try:
+            commands = read_batch(args.batch)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {args.batch}: {e}", file=sys.stderr)
+            sys.exit(1)
+    elif command:
+        commands = [command]
+    else:
+        parser.print_help()
+        sys.exit(2)
+
+    timing = [] if args.time else None
+    start = time.perf_counter()
+    failed = 0
+    for i, cmd in enumerate(commands):
+        status = run_command(cmd, timing)
+        if status:
+            failed += 1
+            if len(commands) > 1:
+                print(f"ERROR: command {i + 1} failed (exit {status}): {shlex.join(cmd)}",
+                      file=sys.stderr)
+            if not args.keep_going:
+                break
+    total = (time.perf_counter() - start) * 1000
+
+    if timing is not None:
+        print("  import ms    run ms  command", file=sys.stderr)
+        for line, import_ms, run_ms, code in timing:
+            mark = "" if code == 0 else f"  (exit {code})"
+            print(f"  {import_ms:9.1f} {run_ms:9.1f}  {line}{mark}", file=sys.stderr)
+        if not failed:
+            print(f"OK: {len(timing)} commands in {total:.1f} ms", file=sys.stderr)
+    if failed:
+        sys.exit(status if len(commands) == 1 else 1)
+
+
+if __name__ == "__main__":
+    main()
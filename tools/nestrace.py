@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+nestrace.py — Shared phase timing for the asset tools, with Chrome trace output.
+
+Tools call setup() once and wrap their work in phase() blocks (load, decode,
+encode, format, write). When profiling is off, phase() returns a shared no-op
+context manager, so instrumentation costs one function call per phase.
+
+Enable profiling with --profile on any instrumented tool, or for a whole
+build with the NESTOOL_PROFILE environment variable:
+
+  NESTOOL_PROFILE=1                 text summary on stderr only
+  NESTOOL_PROFILE=build/trace/      one <tool>-<pid>.json per run in a directory
+  NESTOOL_PROFILE=build/trace.json  all runs appended to one trace file
+
+Timestamps are wall-clock microseconds, so traces from separate processes
+line up on one timeline in chrome://tracing or Perfetto. Merge a directory
+of traces with:
+
+  python3 nestrace.py merge build/trace/*.json -o build/trace.json
+  python3 nestrace.py summary build/trace.json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+ENV_VAR = "NESTOOL_PROFILE"
+
+
+class _NullPhase:
+    """No-op context manager returned while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class Tracer:
+    """Collects complete ("X") trace events for one tool process."""
+
+    def __init__(self, tool: str, target: str):
+        self.tool = tool
+        self.target = target
+        self.pid = os.getpid()
+        self.events = []
+        self.stack = []
+        self._epoch_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+        self._start = self._perf_ns
+
+    def now_us(self) -> float:
+        """Wall-clock microseconds, measured with the high-resolution counter."""
+        return (self._epoch_ns + time.perf_counter_ns() - self._perf_ns) / 1000.0
+
+    def begin(self, name: str, args: dict = None):
+        self.stack.append((name, self.now_us(), args))
+
+    def end(self):
+        name, start, args = self.stack.pop()
+        event = {"name": name, "cat": self.tool, "ph": "X", "ts": start,
+                 "dur": self.now_us() - start, "pid": self.pid, "tid": 0}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def phase(self, name: str, args: dict = None):
+        return _Phase(self, name, args)
+
+    def trace_events(self) -> list:
+        meta = {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+                "args": {"name": f"{self.tool} ({self.pid})"}}
+        return [meta] + self.events
+
+    def finish(self):
+        """Close open phases, write the trace and print the summary."""
+        while self.stack:
+            self.end()
+        wall_ms = (time.perf_counter_ns() - self._start) / 1e6
+        if self.target not in ("", "1"):
+            write_trace(self.target, self.tool, self.pid, self.trace_events())
+        print(format_summary(self.events, wall_ms, self.tool), file=sys.stderr)
+
+
+class _Phase:
+    __slots__ = ("tracer", "name", "args")
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.tracer.begin(self.name, self.args)
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.end()
+        return False
+
+
+_tracer = None
+
+
+def add_argument(parser: argparse.ArgumentParser):
+    """Add the shared --profile option to a tool's argument parser."""
+    parser.add_argument("--profile", nargs="?", const="1", default=None, metavar="PATH",
+                        help="Time tool phases; optionally write a Chrome trace to PATH "
+                             f"(file or directory). Also enabled by ${ENV_VAR}.")
+
+
+def setup(tool: str, args: argparse.Namespace = None):
+    """Enable profiling for this process if --profile or $NESTOOL_PROFILE asks for it."""
+    global _tracer
+    target = getattr(args, "profile", None) if args is not None else None
+    if target is None:
+        target = os.environ.get(ENV_VAR)
+    if not target or target == "0" or _tracer is not None:
+        return _tracer
+    _tracer = Tracer(tool, target)
+    atexit.register(_tracer.finish)
+    return _tracer
+
+
+def phase(name: str, args: dict = None):
+    """Context manager timing one phase. No-op unless profiling is enabled."""
+    if _tracer is None:
+        return _NULL_PHASE
+    return _tracer.phase(name, args)
+
+
+def begin(name: str, args: dict = None):
+    """Open a phase explicitly (for straight-line scripts). Pair with end()."""
+    if _tracer is not None:
+        _tracer.begin(name, args)
+
+
+def end():
+    """Close the most recently opened phase."""
+    if _tracer is not None and _tracer.stack:
+        _tracer.end()
+
+
+def write_trace(target: str, tool: str, pid: int, events: list):
+    """Write events to a per-process file in a directory, or append to one trace file."""
+    path = Path(target)
+    if target.endswith(("/", os.sep)) or path.is_dir() or not path.suffix:
+        path.mkdir(parents=True, exist_ok=True)
+        (path / f"{tool}-{pid}.json").write_text(json.dumps({"traceEvents": events}))
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        text = f.read()
+        existing = json.loads(text)["traceEvents"] if text.strip() else []
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps({"traceEvents": existing + events}))
+
+
+def load_events(paths: list) -> list:
+    """Load and concatenate trace events from several trace files."""
+    events = []
+    for p in paths:
+        data = json.loads(Path(p).read_text())
+        events.extend(data["traceEvents"] if isinstance(data, dict) else data)
+    return events
+
+
+def format_summary(events: list, wall_ms: float = None, title: str = "trace") -> str:
+    """Text summary of total time per (tool, phase)."""
+    totals = {}
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        key = (e.get("cat", "?"), e["name"])
+        count, dur = totals.get(key, (0, 0.0))
+        totals[key] = (count + 1, dur + e["dur"] / 1000.0)
+
+    lines = [f"[profile] {title}" + (f": {wall_ms:.2f} ms wall" if wall_ms is not None else "")]
+    for (tool, name), (count, dur) in sorted(totals.items(), key=lambda t: -t[1][1]):
+        share = f"  {100.0 * dur / wall_ms:5.1f}%" if wall_ms else ""
+        lines.append(f"  {tool:<24} {name:<12} {count:5d}x  {dur:10.2f} ms{share}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge or summarize tool trace files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    merge = sub.add_parser("merge", help="Merge trace files into one timeline")
+    merge.add_argument("inputs", nargs="+", help="Trace JSON files")
+    merge.add_argument("-o", "--output", required=True, help="Merged trace JSON")
+    summary = sub.add_parser("summary", help="Print per-phase totals")
+    summary.add_argument("inputs", nargs="+", help="Trace JSON files")
+    args = parser.parse_args(argv)
+
+    events = load_events(args.inputs)
+    if args.command == "merge":
+        events.sort(key=lambda e: (e.get("ph") != "M", e.get("ts", 0)))
+        Path(args.output).write_text(json.dumps({"traceEvents": events}))
+        n = sum(1 for e in events if e.get("ph") == "X")
+        print(f"OK: Merged {len(args.inputs)} traces ({n} events) → {args.output}")
+    else:
+        print(format_summary(events, title=", ".join(args.inputs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+rom_budget.py — Report ROM/RAM usage from ld65 map output and track it over time.
+
+Reads:
+- The linker config (MEMORY areas and SEGMENTS load targets) for budgets
+- The ld65 map file (-m) for segment sizes and the exported symbol list
+- Optionally the ld65 debug file (--dbgfile) for symbol/scope sizes
+- Optionally the linked ROM for CHR usage per 1KB bank (all-zero tiles = free)
+
+Reports per-segment, per-memory-area and per-8KB PRG bank usage and free
+space, plus the size of every exported symbol. Each run is appended to a
+JSON-lines history file; symbols that grew by more than the threshold since
+the previous entry are flagged.
+
+Symbol sizes come from the debug file when available. Otherwise they are
+inferred from the gap to the next exported symbol in the same segment.
+
+Usage:
+  python3 rom_budget.py build/zelda2b.map
+  python3 rom_budget.py build/zelda2b.map --dbg build/zelda2b.dbg --rom build/zelda2b.nes
+  python3 rom_budget.py build/zelda2b.map --threshold 16 --fail-on-growth
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+
+PRG_BANK_SIZE = 8192
+CHR_BANK_SIZE = 1024
+TILE_SIZE = 16
+INES_HEADER_SIZE = 16
+
+DEFAULT_CONFIG = "config/mmc3.cfg"
+DEFAULT_HISTORY = "build/rom_budget.jsonl"
+
+
+# ============================================================================
+# Parsers
+# ============================================================================
+
+def parse_cfg_number(text: str) -> int:
+    """Parse a linker config number ($hex or decimal)."""
+    text = text.strip()
+    return int(text[1:], 16) if text.startswith("$") else int(text, 0)
+
+
+def parse_linker_config(path: Path) -> tuple:
+    """Parse MEMORY and SEGMENTS blocks of an ld65 config.
+
+    Returns (areas, segment_load, segment_types) where areas maps name ->
+    dict(start, size, type, file, offset) in declaration order (offset =
+    position in the output file for areas written to %O, else None),
+    segment_load maps segment name -> memory area name and segment_types
+    maps segment name -> segment type (ro, rw, bss, zp).
+    """
+    text = re.sub(r"#.*", "", path.read_text())
+    areas, segment_load, segment_types = {}, {}, {}
+
+    for block_name, body in re.findall(r"(MEMORY|SEGMENTS)\s*\{(.*?)\}", text, re.S):
+        for name, attrs in re.findall(r"(\w+)\s*:\s*([^;]*);", body):
+            fields = dict((k.strip(), v.strip()) for k, v in
+                          (a.split("=", 1) for a in attrs.split(",") if "=" in a))
+            if block_name == "MEMORY":
+                areas[name] = {
+                    "start": parse_cfg_number(fields.get("start", "0")),
+                    "size": parse_cfg_number(fields.get("size", "0")),
+                    "type": fields.get("type", "rw"),
+                    "file": fields.get("file"),
+                }
+            else:
+                segment_load[name] = fields.get("load")
+                segment_types[name] = fields.get("type", "ro")
+
+    offset = 0
+    for area in areas.values():
+        if area["file"] == "%O":
+            area["offset"] = offset
+            offset += area["size"]
+        else:
+            area["offset"] = None
+    return areas, segment_load, segment_types
+
+
+def parse_map(path: Path) -> tuple:
+    """Parse an ld65 map file.
+
+    Returns (segments, exports) where segments maps name -> dict(start, size)
+    and exports maps symbol name -> dict(value, flags).
+    """
+    segments, exports = {}, {}
+    section = None
+    for line in path.read_text().splitlines():
+        if line.startswith("Segment list:"):
+            section = "segments"
+            continue
+        if line.startswith("Exports list by name:"):
+            section = "exports"
+            continue
+        if line.startswith(("Exports list by value:", "Imports list:", "Modules list:")):
+            section = None
+            continue
+
+        if section == "segments":
+            m = re.match(r"(\w+)\s+([0-9A-F]{6})\s+([0-9A-F]{6})\s+([0-9A-F]{6})\s+([0-9A-F]{5})",
+                         line)
+            if m:
+                segments[m.group(1)] = {"start": int(m.group(2), 16), "size": int(m.group(4), 16)}
+        elif section == "exports":
+            for name, value, flags in re.findall(r"(\S+)\s+([0-9A-F]{6})\s+([A-Z]+)", line):
+                exports[name] = {"value": int(value, 16), "flags": flags}
+    return segments, exports
+
+
+def parse_dbg(path: Path) -> tuple:
+    """Parse an ld65 debug file.
+
+    Returns (segments, sizes): segments maps name -> dict(start, size, ooffs)
+    and sizes maps symbol name -> size in bytes (from the symbol itself or
+    the scope it labels).
+    """
+    records = {"seg": [], "sym": [], "scope": []}
+    for line in path.read_text().splitlines():
+        kind, _, rest = line.partition("\t")
+        if kind not in records:
+            continue
+        fields = {}
+        for part in re.findall(r'(\w+)=("[^"]*"|[^,]*)', rest):
+            fields[part[0]] = part[1].strip('"')
+        records[kind].append(fields)
+
+    segments = {}
+    for seg in records["seg"]:
+        segments[seg["name"]] = {
+            "start": int(seg.get("start", "0"), 0),
+            "size": int(seg.get("size", "0"), 0),
+            "ooffs": int(seg["ooffs"], 0) if "ooffs" in seg else None,
+        }
+
+    sizes = {}
+    sym_names = {s.get("id"): s.get("name") for s in records["sym"]}
+    for scope in records["scope"]:
+        if "size" in scope and scope.get("sym") in sym_names:
+            sizes[sym_names[scope["sym"]]] = int(scope["size"], 0)
+    for sym in records["sym"]:
+        if "size" in sym and sym.get("type") == "lab":
+            sizes.setdefault(sym["name"], int(sym["size"], 0))
+    return segments, sizes
+
+
+# ============================================================================
+# Usage computation
+# ============================================================================
+
+def segment_of(value: int, segments: dict, candidates=None):
+    """Return the name of the smallest non-empty segment containing an address, or None."""
+    best = None
+    for name, seg in segments.items():
+        if candidates is not None and name not in candidates:
+            continue
+        if seg["size"] and seg["start"] <= value < seg["start"] + seg["size"]:
+            if best is None or seg["size"] < segments[best]["size"]:
+                best = name
+    return best
+
+
+def symbol_sizes(exports: dict, segments: dict, segment_types: dict, dbg_sizes: dict) -> dict:
+    """Size of every exported label. Falls back to the gap to the next export.
+
+    Zero-page labels (flag Z) are only matched against zp segments, so they
+    are not attributed to other segments that also start at $0000.
+    """
+    zp_segs = {n for n in segments if segment_types.get(n) == "zp"}
+    other_segs = set(segments) - zp_segs
+    by_segment = {}
+    for name, exp in exports.items():
+        if "L" not in exp["flags"]:
+            continue  # equates (constants) occupy no ROM
+        candidates = zp_segs if "Z" in exp["flags"] else other_segs
+        seg = segment_of(exp["value"], segments, candidates)
+        if seg is not None:
+            by_segment.setdefault(seg, []).append((exp["value"], name))
+
+    sizes = {}
+    for seg, syms in by_segment.items():
+        syms.sort()
+        seg_end = segments[seg]["start"] + segments[seg]["size"]
+        for i, (value, name) in enumerate(syms):
+            if name in dbg_sizes:
+                sizes[name] = {"size": dbg_sizes[name], "segment": seg}
+                continue
+            nxt = seg_end
+            for later_value, _ in syms[i + 1:]:
+                if later_value > value:
+                    nxt = later_value
+                    break
+            sizes[name] = {"size": nxt - value, "segment": seg}
+    return sizes
+
+
+def area_usage(areas: dict, segment_load: dict, segments: dict) -> dict:
+    """Used/free bytes per memory area."""
+    usage = {}
+    for name, area in areas.items():
+        used = sum(seg["size"] for seg_name, seg in segments.items()
+                   if segment_load.get(seg_name) == name)
+        usage[name] = {"used": used, "size": area["size"], "free": area["size"] - used}
+    return usage
+
+
+def prg_bank_usage(areas: dict, segment_load: dict, segments: dict, dbg_segments: dict) -> dict:
+    """Used bytes per 8KB PRG bank, keyed by bank number."""
+    header = areas.get("HEADER", {"size": INES_HEADER_SIZE})["size"]
+    chr_start = min((a["offset"] for n, a in areas.items()
+                     if n.startswith("CHR") and a["offset"] is not None), default=None)
+    banks = {}
+    for seg_name, seg in segments.items():
+        if not seg["size"]:
+            continue
+        ooffs = dbg_segments.get(seg_name, {}).get("ooffs")
+        if ooffs is None:
+            area = areas.get(segment_load.get(seg_name))
+            if area is None or area["offset"] is None:
+                continue
+            ooffs = area["offset"] + (seg["start"] - area["start"])
+        if ooffs < header or (chr_start is not None and ooffs >= chr_start):
+            continue
+        pos, end = ooffs - header, ooffs - header + seg["size"]
+        while pos < end:
+            bank = pos // PRG_BANK_SIZE
+            chunk = min(end, (bank + 1) * PRG_BANK_SIZE) - pos
+            banks[bank] = banks.get(bank, 0) + chunk
+            pos += chunk
+    return banks
+
+
+def chr_bank_usage(rom: bytes) -> dict:
+    """Non-blank tiles per 1KB CHR bank, read from the iNES CHR region."""
+    prg_size = rom[4] * 16384
+    chr_size = rom[5] * 8192
+    start = INES_HEADER_SIZE + (512 if rom[6] & 0x04 else 0) + prg_size
+    chr_data = rom[start:start + chr_size]
+    blank = bytes(TILE_SIZE)
+    banks = {}
+    for bank in range(len(chr_data) // CHR_BANK_SIZE):
+        base = bank * CHR_BANK_SIZE
+        banks[bank] = sum(1 for t in range(base, base + CHR_BANK_SIZE, TILE_SIZE)
+                          if chr_data[t:t + TILE_SIZE] != blank)
+    return banks
+
+
+# ============================================================================
+# History
+# ============================================================================
+
+def load_last_entry(path: Path):
+    """Return the last JSON entry of a JSON-lines history file, or None."""
+    if not path.exists():
+        return None
+    last = None
+    for line in path.read_text().splitlines():
+        if line.strip():
+            last = line
+    return json.loads(last) if last else None
+
+
+def find_growth(previous: dict, current: dict, threshold: int) -> list:
+    """Return [(symbol, old, new)] for symbols that grew by more than threshold bytes."""
+    if not previous:
+        return []
+    old_syms = previous.get("symbols", {})
+    grown = []
+    for name, size in current["symbols"].items():
+        old = old_syms.get(name)
+        if old is not None and size - old > threshold:
+            grown.append((name, old, size))
+    return sorted(grown, key=lambda g: g[1] - g[2])
+
+
+def percent(used: int, size: int) -> str:
+    return f"{100.0 * used / size:5.1f}%" if size else "  n/a "
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report ROM budget from ld65 map output")
+    parser.add_argument("map", help="ld65 map file (ld65 -m)")
+    parser.add_argument("--dbg", type=str, default=None,
+                        help="ld65 debug file (ld65 --dbgfile) for exact symbol sizes")
+    parser.add_argument("--rom", type=str, default=None,
+                        help="Linked .nes ROM, for CHR bank usage")
+    parser.add_argument("--config", type=str, default=DEFAULT_CONFIG,
+                        help=f"Linker config (default: {DEFAULT_CONFIG})")
+    parser.add_argument("--history", type=str, default=DEFAULT_HISTORY,
+                        help=f"JSON-lines history file (default: {DEFAULT_HISTORY})")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Do not append this build to the history file")
+    parser.add_argument("--threshold", type=int, default=32,
+                        help="Flag symbols that grew by more than N bytes (default: 32)")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Number of largest symbols to list (default: 20)")
+    parser.add_argument("--fail-on-growth", action="store_true",
+                        help="Exit with status 1 if any symbol grew past the threshold")
+    args = parser.parse_args(argv)
+
+    areas, segment_load, segment_types = parse_linker_config(Path(args.config))
+    segments, exports = parse_map(Path(args.map))
+    dbg_segments, dbg_sizes = parse_dbg(Path(args.dbg)) if args.dbg else ({}, {})
+
+    usage = area_usage(areas, segment_load, segments)
+    banks = prg_bank_usage(areas, segment_load, segments, dbg_segments)
+    symbols = symbol_sizes(exports, segments, segment_types, dbg_sizes)
+
+    print("Memory areas:")
+    for name, u in usage.items():
+        print(f"  {name:<14} {u['used']:7d} / {u['size']:7d} bytes  {percent(u['used'], u['size'])}"
+              f"  free {u['free']:7d}")
+
+    print("\nSegments:")
+    for name, seg in sorted(segments.items(), key=lambda s: -s[1]["size"]):
+        area = segment_load.get(name, "?")
+        print(f"  {name:<14} ${seg['start']:06X}  {seg['size']:7d} bytes  → {area}")
+
+    print("\nPRG banks (8KB):")
+    for bank in sorted(banks):
+        print(f"  bank {bank:2d}  {banks[bank]:5d} / {PRG_BANK_SIZE} bytes  "
+              f"{percent(banks[bank], PRG_BANK_SIZE)}  free {PRG_BANK_SIZE - banks[bank]:5d}")
+
+    chr_banks = {}
+    if args.rom:
+        chr_banks = chr_bank_usage(Path(args.rom).read_bytes())
+        used_banks = {b: n for b, n in chr_banks.items() if n}
+        total_tiles = sum(chr_banks.values())
+        print(f"\nCHR: {total_tiles} non-blank tiles, {len(used_banks)} of {len(chr_banks)} "
+              f"1KB banks in use")
+        for bank, tiles in sorted(used_banks.items()):
+            print(f"  bank {bank:3d}  {tiles:2d} / 64 tiles")
+
+    print(f"\nLargest exported symbols{'' if args.dbg else ' (sizes inferred from map)'}:")
+    for name, info in sorted(symbols.items(), key=lambda s: -s[1]["size"])[:args.top]:
+        print(f"  {name:<28} {info['size']:6d} bytes  {info['segment']}")
+
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "areas": {n: u["used"] for n, u in usage.items()},
+        "segments": {n: s["size"] for n, s in segments.items()},
+        "prg_banks": {str(b): n for b, n in banks.items()},
+        "chr_banks": {str(b): n for b, n in chr_banks.items() if n},
+        "symbols": {n: s["size"] for n, s in symbols.items()},
+    }
+
+    history = Path(args.history)
+    grown = find_growth(load_last_entry(history), entry, args.threshold)
+    for name, old, new in grown:
+        print(f"GREW: {name} {old} → {new} bytes (+{new - old})")
+
+    if not args.no_history:
+        history.parent.mkdir(parents=True, exist_ok=True)
+        with history.open("a") as f:
+            f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    full = [n for n, u in usage.items() if u["free"] < 0]
+    for name in full:
+        print(f"FAIL: {name} overflowed by {-usage[name]['free']} bytes", file=sys.stderr)
+    if full or (grown and args.fail_on_growth):
+        sys.exit(1)
+    print(f"\nOK: {len(segments)} segments, {len(symbols)} exported symbols")
+
+
+if __name__ == "__main__":
+    main()
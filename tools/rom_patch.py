@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+rom_patch.py — Patch changed banks into a linked ROM in place.
+
+Keeps a manifest of per-bank hashes (8KB PRG banks, 1KB CHR banks) and the
+exported symbol addresses of build/zelda2b.nes. Freshly generated bank
+images are compared against the manifest, and only banks whose hash changed
+are written into the ROM through mmap; the manifest is updated to match.
+
+A full link (make) is run instead when patching would not be safe:
+- an image targets a fixed PRG bank (PRG_FIXED_*/VECTORS areas in the
+  linker config — banks 30 and 31), whose code other banks call into
+- the new map file exports any symbol at a different address, or exports
+  a symbol the linked ROM does not have
+- the ROM no longer matches the manifest (it was rebuilt or edited since)
+
+PRG images must be whole 8KB banks. The build has no rule that produces
+them (the Makefile links the whole ROM only), so --prg takes images built
+outside it, e.g. by linking one bank's objects with a config that writes
+only that MEMORY area. CHR images are .chr files and may span several 1KB
+banks; they are padded with blank tiles to a bank boundary.
+
+Usage:
+  python3 rom_patch.py snapshot build/zelda2b.nes --map build/zelda2b.map
+  python3 rom_patch.py apply build/zelda2b.nes --prg 4=build/bank04.bin
+  python3 rom_patch.py apply build/zelda2b.nes --chr 8=assets/tilesets/overworld.chr
+  python3 rom_patch.py apply build/zelda2b.nes --prg 4=build/bank04.bin --map build/bank04.map
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import subprocess
+import sys
+from pathlib import Path
+
+import nestrace
+from nesasset import BANK_BYTES, PRG_BANK_BYTES, parse_ines
+from rom_budget import parse_linker_config, parse_map
+
+
+DEFAULT_MANIFEST = "build/rom_manifest.json"
+DEFAULT_CONFIG = "config/mmc3.cfg"
+DEFAULT_MAKE = "make"
+
+
+def bank_hashes(data, offset: int, size: int, bank_size: int) -> list:
+    return [hashlib.sha1(data[o:o + bank_size]).hexdigest()
+            for o in range(offset, offset + size, bank_size)]
+
+
+def fixed_prg_banks(config: Path) -> list:
+    """PRG bank numbers holding fixed-bank code, from the linker config."""
+    areas, _load, _types = parse_linker_config(config)
+    prg_start = min(a["offset"] for name, a in areas.items()
+                    if a["offset"] is not None and name.startswith("PRG"))
+    banks = set()
+    for name, area in areas.items():
+        if area["offset"] is None or not ("FIXED" in name or name.startswith("VECTORS")):
+            continue
+        first = (area["offset"] - prg_start) // PRG_BANK_BYTES
+        last = (area["offset"] + area["size"] - 1 - prg_start) // PRG_BANK_BYTES
+        banks.update(range(first, last + 1))
+    return sorted(banks)
+
+
+def exported_addresses(map_path: Path) -> dict:
+    _segments, exports = parse_map(map_path)
+    return {name: e["value"] for name, e in exports.items()}
+
+
+def snapshot(rom_path: Path, map_path, config: Path) -> dict:
+    """Build a manifest for the ROM as it is on disk."""
+    data = rom_path.read_bytes()
+    info = parse_ines(data)
+    return {
+        "rom": str(rom_path),
+        "size": len(data),
+        "header": hashlib.sha1(data[:info["prg_offset"]]).hexdigest(),
+        "fixed_prg": fixed_prg_banks(config) if config.exists() else [],
+        "prg": bank_hashes(data, info["prg_offset"], info["prg_size"], PRG_BANK_BYTES),
+        "chr": bank_hashes(data, info["chr_offset"], info["chr_size"], BANK_BYTES),
+        "symbols": exported_addresses(map_path) if map_path else {},
+    }
+
+
+def parse_images(specs: list, bank_size: int, kind: str) -> list:
+    """Turn BANK=FILE specs into [(kind, bank, bytes)], one entry per bank."""
+    images = []
+    for spec in specs or []:
+        bank, _, file = spec.partition("=")
+        data = Path(file).read_bytes()
+        if kind == "chr":
+            data += bytes(-len(data) % bank_size)
+        elif not data or len(data) % bank_size:
+            raise ValueError(f"{file}: {len(data)} bytes is not a whole number of 8KB PRG banks")
+        first = int(bank, 0)
+        for i in range(0, len(data), bank_size):
+            images.append((kind, first + i // bank_size, data[i:i + bank_size]))
+    return images
+
+
+def plan(manifest: dict, images: list, new_symbols) -> tuple:
+    """Decide what to write. Returns (changed images, reason for a full link or None)."""
+    changed = []
+    for kind, bank, data in images:
+        hashes = manifest[kind]
+        if not 0 <= bank < len(hashes):
+            return [], f"{kind.upper()} bank {bank} outside ROM (0-{len(hashes) - 1})"
+        if hashlib.sha1(data).hexdigest() == hashes[bank]:
+            continue
+        if kind == "prg" and bank in manifest["fixed_prg"]:
+            return [], f"fixed PRG bank {bank} changed"
+        changed.append((kind, bank, data))
+
+    if new_symbols is not None:
+        old = manifest["symbols"]
+        moved = sorted(n for n in new_symbols if n in old and new_symbols[n] != old[n])
+        added = sorted(set(new_symbols) - set(old))
+        if moved:
+            return [], f"exported symbols moved: {', '.join(moved[:8])}"
+        if added:
+            return [], f"new exported symbols: {', '.join(added[:8])}"
+    return changed, None
+
+
+def write_banks(rom_path: Path, manifest: dict, changed: list):
+    """Write changed banks in place. Returns a reason string if the ROM is stale, else None."""
+    with open(rom_path, "r+b") as f:
+        with mmap.mmap(f.fileno(), 0) as rom:
+            info = parse_ines(rom[:16])
+            if len(rom) != manifest["size"] or \
+                    hashlib.sha1(rom[:info["prg_offset"]]).hexdigest() != manifest["header"]:
+                return "ROM size or header differs from manifest"
+            spans = []
+            for kind, bank, data in changed:
+                base, size = (info["prg_offset"], PRG_BANK_BYTES) if kind == "prg" \
+                    else (info["chr_offset"], BANK_BYTES)
+                offset = base + bank * size
+                if hashlib.sha1(rom[offset:offset + size]).hexdigest() != manifest[kind][bank]:
+                    return f"{kind.upper()} bank {bank} in ROM differs from manifest"
+                spans.append((offset, kind, bank, data))
+            for offset, kind, bank, data in spans:
+                rom[offset:offset + len(data)] = data
+                manifest[kind][bank] = hashlib.sha1(data).hexdigest()
+            rom.flush()
+    return None
+
+
+def full_link(args, reason: str):
+    if args.no_fallback:
+        print(f"FALLBACK: {reason} — full link required")
+        sys.exit(2)
+    print(f"FALLBACK: {reason} — running full link ({args.make})")
+    with nestrace.phase("link"):
+        subprocess.run(args.make, shell=True, check=True)
+    map_path = Path(args.map_after_link)
+    manifest = snapshot(Path(args.rom), map_path if map_path.exists() else None, Path(args.config))
+    write_manifest(Path(args.manifest), manifest)
+
+
+def write_manifest(path: Path, manifest: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=1) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Patch changed ROM banks in place")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    snap = sub.add_parser("snapshot", help="Record bank hashes and symbols of a linked ROM")
+    snap.add_argument("rom", help="Linked iNES ROM")
+    snap.add_argument("--map", type=str, default=None, help="ld65 map file (exported symbols)")
+
+    apply = sub.add_parser("apply", help="Write changed bank images into the ROM")
+    apply.add_argument("rom", help="Linked iNES ROM, patched in place")
+    apply.add_argument("--prg", action="append", metavar="BANK=FILE",
+                       help="8KB PRG bank image(s) starting at BANK (repeatable); "
+                            "built outside make, which links the whole ROM only")
+    apply.add_argument("--chr", action="append", metavar="BANK=FILE",
+                       help=".chr file starting at 1KB CHR bank BANK (repeatable)")
+    apply.add_argument("--map", type=str, default=None,
+                       help="Map file of the new images; exported symbols must not move")
+    apply.add_argument("--map-after-link", type=str, default="build/zelda2b.map",
+                       help="Map file to snapshot after a full link (default: build/zelda2b.map)")
+    apply.add_argument("--make", type=str, default=DEFAULT_MAKE,
+                       help=f"Full link command for the fallback (default: {DEFAULT_MAKE})")
+    apply.add_argument("--no-fallback", action="store_true",
+                       help="Exit with status 2 instead of running the full link")
+    apply.add_argument("--dry-run", action="store_true", help="Report changed banks only")
+
+    for p in (snap, apply):
+        p.add_argument("--manifest", type=str, default=DEFAULT_MANIFEST,
+                       help=f"Manifest JSON (default: {DEFAULT_MANIFEST})")
+        p.add_argument("--config", type=str, default=DEFAULT_CONFIG,
+                       help=f"Linker config, for fixed banks (default: {DEFAULT_CONFIG})")
+        nestrace.add_argument(p)
+
+    args = parser.parse_args(argv)
+    nestrace.setup("rom_patch", args)
+    rom_path = Path(args.rom)
+
+    if args.command == "snapshot":
+        with nestrace.phase("hash"):
+            manifest = snapshot(rom_path, Path(args.map) if args.map else None, Path(args.config))
+        write_manifest(Path(args.manifest), manifest)
+        print(f"OK: {len(manifest['prg'])} PRG + {len(manifest['chr'])} CHR banks, "
+              f"{len(manifest['symbols'])} symbols → {args.manifest}")
+        return
+
+    manifest_path = Path(args.manifest)
+    if not manifest_path.exists():
+        full_link(args, f"no manifest at {manifest_path}")
+        return
+    with nestrace.phase("load"):
+        manifest = json.loads(manifest_path.read_text())
+        try:
+            images = parse_images(args.prg, PRG_BANK_BYTES, "prg")
+            images += parse_images(args.chr, BANK_BYTES, "chr")
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        new_symbols = exported_addresses(Path(args.map)) if args.map else None
+
+    changed, reason = plan(manifest, images, new_symbols)
+    if reason:
+        full_link(args, reason)
+        return
+    names = ", ".join(f"{kind.upper()} {bank}" for kind, bank, _data in changed)
+    if args.dry_run or not changed:
+        verb = "would change" if args.dry_run else "changed"
+        print(f"OK: {len(images)} bank image(s), {len(changed)} {verb}" + (f": {names}" if names else ""))
+        return
+
+    with nestrace.phase("write"):
+        reason = write_banks(rom_path, manifest, changed)
+    if reason:
+        full_link(args, reason)
+        return
+    write_manifest(manifest_path, manifest)
+    print(f"OK: {len(images)} bank image(s), {len(changed)} changed: {names} → {rom_path}")
+
+
+if __name__ == "__main__":
+    main()
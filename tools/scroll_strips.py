@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+scroll_strips.py — Precompute nametable scroll strips and attribute strips.
+
+Scrolling by composing metatiles at runtime goes through metatile_draw
+(four ppu_buf_put calls per metatile) and the 32-entry PPU buffer, which
+cannot even hold one 30-tile column plus its attributes. This tool bakes
+every strip a scroll can need, for every screen of a map JSON (see
+nesmap.py), in final PPU write order:
+
+- columns: 32 tile columns of 30 tiles (write with +32 VRAM increment),
+  and 8 attribute columns of 8 bytes (rows 0-7, one PPUADDR per byte)
+- rows: 30 tile rows of 32 tiles (+1 increment), and 8 attribute rows of
+  8 bytes (sequential from $23C0 + row * 8)
+
+Identical strips are shared across screens. Pointer tables are indexed
+screen * strips_per_screen + strip:
+  {name}_cols_lo/hi       screen * 32 + tile column
+  {name}_attr_cols_lo/hi  screen * 8 + attribute column
+  {name}_rows_lo/hi       screen * 30 + tile row
+  {name}_attr_rows_lo/hi  screen * 8 + attribute row
+
+The .inc gets the NMI-side copy macros (strip_copy, strip_copy_attr_col).
+
+Usage:
+  python3 scroll_strips.py assets/maps/overworld_map.json build/overworld_strips.s
+  python3 scroll_strips.py map.json out.s --axis cols --segment PRG_BANK_04
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from collision_maps import attr_table
+from nesmap import (ATTR_COLS, ATTR_ROWS, SCREEN_COLS, SCREEN_ROWS, attribute_table, load_map,
+                    metatiles_path)
+
+
+NT_COLS = SCREEN_COLS * 2
+NT_ROWS = SCREEN_ROWS * 2
+
+# Cycle model. Composed: metatile_draw costs ~414 cycles per metatile (4
+# tiles) of game time, and ppu_buf_flush 38 cycles of vblank per byte;
+# an attribute byte needs 4 palette reads, shifts and merges.
+COMPOSE_TILE_CYCLES = 104
+COMPOSE_ATTR_CYCLES = 100
+FLUSH_BYTE_CYCLES = 38
+# Precomputed: strip_copy is lda (ptr),y / sta PPUDATA / iny per byte after
+# one PPUADDR pair; strip_copy_attr_col sets PPUADDR for each byte.
+STRIP_SETUP_CYCLES = 12
+STRIP_BYTE_CYCLES = 11
+ATTR_COL_BYTE_CYCLES = 25
+
+
+def nametables(m: dict, metatiles: list) -> np.ndarray:
+    """(screens, 30, 32) nametable tiles of every screen."""
+    quads = np.zeros((256, 2, 2), dtype=np.uint8)
+    quads[:len(metatiles)] = [[[mt["tl"], mt["tr"]], [mt["bl"], mt["br"]]] for mt in metatiles]
+    cells = np.array(m["screens"], dtype=np.uint8).reshape(-1, SCREEN_ROWS, SCREEN_COLS)
+    tiles = quads[cells]                                # (S, 15, 16, 2, 2)
+    return tiles.transpose(0, 1, 3, 2, 4).reshape(-1, NT_ROWS, NT_COLS)
+
+
+def attribute_tables(m: dict, metatiles: list) -> np.ndarray:
+    """(screens, 8, 8) attribute bytes of every screen."""
+    palettes = (attr_table(metatiles) & 0x03).tolist()
+    return np.array([list(attribute_table(s, palettes)) for s in m["screens"]],
+                    dtype=np.uint8).reshape(-1, ATTR_ROWS, ATTR_COLS)
+
+
+class StripSet:
+    """Deduplicated strips of one kind, with the per-screen pointer order."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.unique = {}
+        self.refs = []
+
+    def add_all(self, strips: np.ndarray):
+        """strips: (screens, strips per screen, length), in pointer order."""
+        for strip in strips.reshape(-1, strips.shape[-1]):
+            key = strip.tobytes()
+            if key not in self.unique:
+                self.unique[key] = f"{self.label}_{len(self.unique)}"
+            self.refs.append(self.unique[key])
+
+    def rom_bytes(self) -> int:
+        return sum(len(k) for k in self.unique) + 2 * len(self.refs)
+
+    def emit(self, table: str) -> list:
+        out = []
+        for key, label in self.unique.items():
+            out.append(f"{label}:")
+            for i in range(0, len(key), 16):
+                out.append("    .byte " + ", ".join(f"${b:02X}" for b in key[i:i + 16]))
+        out.append(f".export {table}_lo, {table}_hi")
+        out.append(f"{table}_lo:")
+        out.extend(f"    .byte <{label}" for label in self.refs)
+        out.append(f"{table}_hi:")
+        out.extend(f"    .byte >{label}" for label in self.refs)
+        out.append("")
+        return out
+
+
+def step_cycles(tiles: int, attrs: int, attr_byte_cycles: int, attr_setups: int) -> tuple:
+    """(composed game + vblank, precomputed vblank) cycles for one scroll step."""
+    composed = tiles * (COMPOSE_TILE_CYCLES + FLUSH_BYTE_CYCLES) + \
+        attrs * (COMPOSE_ATTR_CYCLES + FLUSH_BYTE_CYCLES)
+    strip = STRIP_SETUP_CYCLES + tiles * STRIP_BYTE_CYCLES + \
+        attr_setups * STRIP_SETUP_CYCLES + attrs * attr_byte_cycles
+    return composed, strip
+
+
+def copy_macros() -> str:
+    return (
+        "; strip_copy ptr, count — copy count bytes from (ptr) to PPUDATA.\n"
+        f"; Set PPUADDR and the VRAM increment first. {STRIP_BYTE_CYCLES} cycles per byte.\n"
+        ".macro strip_copy ptr, count\n"
+        "    ldy #0\n"
+        "    .repeat count\n"
+        "    lda (ptr), y\n"
+        "    sta PPUDATA\n"
+        "    iny\n"
+        "    .endrepeat\n"
+        ".endmacro\n"
+        "\n"
+        "; strip_copy_attr_col ptr, nt_hi — write an 8-byte attribute column from\n"
+        "; (ptr) to attribute column X (0-7) of the nametable at nt_hi ($20, $24, ...).\n"
+        f"; {ATTR_COL_BYTE_CYCLES} cycles per byte.\n"
+        ".macro strip_copy_attr_col ptr, nt_hi\n"
+        "    .repeat 8, i\n"
+        "    lda #nt_hi | $03\n"
+        "    sta PPUADDR\n"
+        "    txa\n"
+        "    ora #$C0 + i * 8\n"
+        "    sta PPUADDR\n"
+        "    ldy #i\n"
+        "    lda (ptr), y\n"
+        "    sta PPUDATA\n"
+        "    .endrepeat\n"
+        ".endmacro\n"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute scroll strips for a map")
+    parser.add_argument("input", help="Map JSON (see nesmap.py)")
+    parser.add_argument("output", help="Output .s assembly file")
+    parser.add_argument("--metatiles", type=str, default=None,
+                        help="Metatile JSON (default: the map's own metatiles path)")
+    parser.add_argument("--axis", choices=["cols", "rows", "both"], default="both",
+                        help="Strips for horizontal (cols), vertical (rows) or both scrolls")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the data")
+    parser.add_argument("--macros", type=str, default=None,
+                        help="Output .inc for the copy macros (default: output with .inc suffix)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("scroll_strips", args)
+
+    with nestrace.phase("load"):
+        try:
+            m = load_map(args.input)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        mt_path = Path(args.metatiles) if args.metatiles else metatiles_path(m, args.input)
+        metatiles = json.loads(mt_path.read_text())["metatiles"]
+
+    name = m["name"]
+    sets = []
+    with nestrace.phase("encode"):
+        nt = nametables(m, metatiles)
+        at = attribute_tables(m, metatiles)
+        if args.axis in ("cols", "both"):
+            cols, attr_cols = StripSet(f"{name}_col"), StripSet(f"{name}_attr_col")
+            cols.add_all(nt.transpose(0, 2, 1))
+            attr_cols.add_all(at.transpose(0, 2, 1))
+            sets += [(f"{name}_cols", cols), (f"{name}_attr_cols", attr_cols)]
+        if args.axis in ("rows", "both"):
+            rows, attr_rows = StripSet(f"{name}_row"), StripSet(f"{name}_attr_row")
+            rows.add_all(nt)
+            attr_rows.add_all(at)
+            sets += [(f"{name}_rows", rows), (f"{name}_attr_rows", attr_rows)]
+
+    out = [
+        "; ==========================================================",
+        "; Scroll Strips — auto-generated by scroll_strips.py",
+        f"; Source: {args.input}",
+        "; DO NOT EDIT — regenerate from map JSON",
+        "; Tile columns: 30 bytes top to bottom (+32 increment)",
+        "; Tile rows: 32 bytes left to right; attribute strips: 8 bytes",
+        "; ==========================================================",
+        "",
+    ]
+    if args.segment:
+        out += [f'.segment "{args.segment}"', ""]
+    for table, strips in sets:
+        out += strips.emit(table)
+
+    with nestrace.phase("write"):
+        Path(args.output).write_text("\n".join(out))
+        macros_path = Path(args.macros) if args.macros else Path(args.output).with_suffix(".inc")
+        macros_path.write_text(copy_macros())
+
+    screens = len(m["screens"])
+    for table, strips in sets:
+        print(f"  {table:<24} {len(strips.unique):5d} unique / {len(strips.refs):5d} strips, "
+              f"{strips.rom_bytes():6d} bytes")
+    steps = []
+    if args.axis in ("cols", "both"):
+        steps.append(("column", NT_ROWS, step_cycles(NT_ROWS, ATTR_ROWS, ATTR_COL_BYTE_CYCLES, 0)))
+    if args.axis in ("rows", "both"):
+        steps.append(("row", NT_COLS, step_cycles(NT_COLS, ATTR_COLS, STRIP_BYTE_CYCLES, 1)))
+    for axis, tiles, (composed, strip) in steps:
+        print(f"  {axis} step: {tiles} tiles + 8 attributes, composed ~{composed} cycles "
+              f"({tiles + 8} buffer writes), precomputed ~{strip} vblank cycles")
+    total = sum(s.rom_bytes() for _, s in sets)
+    print(f"OK: {screens} screens, {total} bytes of strips and pointers → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
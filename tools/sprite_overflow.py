@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+sprite_overflow.py — Per-scanline sprite counts and an OAM flicker schedule.
+
+The PPU shows at most 8 sprites per scanline; later sprites in OAM order are
+dropped on that line. This tool places metasprite frames (metasprite.py
+definitions) as listed in a spawn layout, counts sprites per scanline with
+a sweep over their vertical extents, and reports the worst scanlines of
+every screen.
+
+It then picks an OAM rotation schedule. Objects live in a fixed number of
+slots; each frame the game draws them starting at slot sprite_rotation[i]
+and wrapping, so a different object lands past the 8th sprite on a busy
+line each frame. Any stride coprime to the slot count visits every start
+once per period; the stride chosen is the one whose worst run of
+consecutive frames in which an object is dropped is shortest.
+
+Spawn layout JSON (sprite definition paths relative to the layout file):
+
+  {
+    "sprites": ["../sprites/link_frames.json", "../sprites/enemies_frames.json"],
+    "screens": [
+      {"name": "overworld_0", "objects": [
+        {"frame": "link.walk_down_0", "x": 120, "y": 112},
+        {"frame": "enemies.octorok_0", "x": 40, "y": 112}
+      ]}
+    ]
+  }
+
+Objects are listed in slot order. A sprite at OAM Y covers scanlines
+Y+1..Y+8.
+
+Usage:
+  python3 sprite_overflow.py assets/enemies/spawns.json build/sprite_rotation.s
+  python3 sprite_overflow.py spawns.json out.s --slots 12 --segment PRG_FIXED_C
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from metasprite import MAX_SPRITES, TilePool, compile_frames
+from nesasset import TILE_SIZE
+from nespng import load_indexed_png
+
+
+SCANLINES = 240
+SPRITES_PER_LINE = 8
+OAM_HIDDEN_Y = 0xEF         # OAM Y at or past this is off screen
+
+
+def load_frames(paths: list) -> dict:
+    """{"<defs name>.<frame>": [(dy, tile, attr, dx), ...]} from metasprite definitions."""
+    frames = {}
+    for path in paths:
+        defs = json.loads(path.read_text())
+        pixels = load_indexed_png(path.parent / defs["sheet"])
+        for frame, sprites in compile_frames(defs, pixels, TilePool(), 0):
+            frames[f"{defs['name']}.{frame}"] = sprites
+    return frames
+
+
+def place(objects: list, frames: dict) -> tuple:
+    """OAM Y of every on-screen sprite and the slot of the object it belongs to."""
+    tops, owners = [], []
+    for slot, obj in enumerate(objects):
+        if obj["frame"] not in frames:
+            raise ValueError(f"unknown frame '{obj['frame']}'")
+        for dy, _tile, _attr, _dx in frames[obj["frame"]]:
+            y = obj["y"] + dy
+            if 0 <= y < OAM_HIDDEN_Y:
+                tops.append(y)
+                owners.append(slot)
+    return np.array(tops, dtype=np.intp), np.array(owners, dtype=np.intp)
+
+
+def scanline_counts(tops: np.ndarray) -> np.ndarray:
+    """Sprites per scanline: +1 at each top line, -1 past each bottom, then a running sum."""
+    diff = np.zeros(SCANLINES + TILE_SIZE + 1, dtype=np.int32)
+    np.add.at(diff, tops + 1, 1)
+    np.add.at(diff, tops + 1 + TILE_SIZE, -1)
+    return np.cumsum(diff)[:SCANLINES]
+
+
+def coverage(tops: np.ndarray) -> np.ndarray:
+    """(sprites, 240) bool: scanlines each sprite covers."""
+    lines = np.arange(SCANLINES)
+    return (lines > tops[:, np.newaxis]) & (lines <= tops[:, np.newaxis] + TILE_SIZE)
+
+
+def dropped_objects(tops: np.ndarray, owners: np.ndarray, objects: int, slots: int) -> np.ndarray:
+    """(slots, objects) bool: object loses a sprite line when drawing starts at each slot."""
+    cover = coverage(tops)
+    dropped = np.zeros((slots, objects), dtype=bool)
+    for start in range(slots):
+        rank = (owners - start) % slots
+        order = np.argsort(rank, kind="stable")[:MAX_SPRITES]
+        ordered = cover[order]
+        lost = ordered & (np.cumsum(ordered, axis=0) > SPRITES_PER_LINE)
+        hit = order[lost.any(axis=1)]
+        dropped[start, owners[hit]] = True
+        clipped = np.setdiff1d(np.arange(len(owners)), order)
+        dropped[start, owners[clipped]] = True
+    return dropped
+
+
+def longest_run(dropped: np.ndarray) -> int:
+    """Longest cyclic run of consecutive frames any object is dropped, (frames, objects) input."""
+    if not dropped.any():
+        return 0
+    worst = 0
+    for col in dropped.T:
+        if col.all():
+            return len(col)
+        # Rotate so the cycle starts right after a visible frame
+        col = np.roll(col, -int(np.argmin(col)) - 1)
+        run = 0
+        for d in col:
+            run = run + 1 if d else 0
+            worst = max(worst, run)
+    return worst
+
+
+def choose_stride(drops: list, slots: int) -> tuple:
+    """Stride coprime to slots minimizing the worst dropped run. Returns (stride, run)."""
+    best = None
+    for stride in range(1, max(slots, 2)):
+        if math.gcd(stride, slots) != 1:
+            continue
+        schedule = [(f * stride) % slots for f in range(slots)]
+        run = max((longest_run(d[schedule]) for d in drops), default=0)
+        if best is None or run < best[1]:
+            best = (stride, run)
+    return best if best else (1, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze per-scanline sprite overflow")
+    parser.add_argument("input", help="Spawn layout JSON")
+    parser.add_argument("output", nargs="?", default=None,
+                        help="Output .s for the rotation table (omit for report only)")
+    parser.add_argument("--slots", type=int, default=None,
+                        help="Object slots rotated at runtime (default: most objects on a screen)")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the table")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("sprite_overflow", args)
+
+    src = Path(args.input)
+    with nestrace.phase("load"):
+        layout = json.loads(src.read_text())
+        try:
+            frames = load_frames([src.parent / p for p in layout["sprites"]])
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+    screens = layout["screens"]
+    slots = args.slots or max((len(s["objects"]) for s in screens), default=1)
+    too_many = [s["name"] for s in screens if len(s["objects"]) > slots]
+    if too_many:
+        print(f"ERROR: more than {slots} objects on {', '.join(too_many)}", file=sys.stderr)
+        sys.exit(1)
+
+    report, drops = [], []
+    with nestrace.phase("sweep"):
+        for screen in screens:
+            try:
+                tops, owners = place(screen["objects"], frames)
+            except ValueError as e:
+                print(f"ERROR: {screen['name']}: {e}", file=sys.stderr)
+                sys.exit(1)
+            counts = scanline_counts(tops)
+            over = counts > SPRITES_PER_LINE
+            dropped = dropped_objects(tops, owners, len(screen["objects"]), slots)
+            drops.append(dropped)
+            worst = int(np.argmax(counts)) if len(tops) else 0
+            report.append((screen["name"], len(screen["objects"]), len(tops), worst,
+                           int(counts[worst]), int(over.sum()), int(dropped[0].sum()), dropped))
+
+    with nestrace.phase("schedule"):
+        stride, run = choose_stride(drops, slots)
+        schedule = [(f * stride) % slots for f in range(slots)]
+
+    print("  screen                objs  sprites  worst line  lines>8  dropped  visible")
+    for name, objs, sprites, line, count, lines, static, dropped in report:
+        visible = 1 - dropped[schedule].mean(axis=0).max() if dropped.size else 1.0
+        print(f"  {name:<20} {objs:5d} {sprites:8d}  {line:4d} ({count:2d})  {lines:7d}  "
+              f"{static:7d}  {visible * 100:6.1f}%")
+    worst = max(report, key=lambda r: r[4]) if report else None
+    if worst and worst[4] > SPRITES_PER_LINE:
+        print(f"WARN: {sum(r[5] > 0 for r in report)} screens overflow; worst {worst[0]} "
+              f"line {worst[3]} with {worst[4]} sprites", file=sys.stderr)
+
+    if args.output:
+        out = [
+            "; ==========================================================",
+            "; OAM Rotation Schedule — auto-generated by sprite_overflow.py",
+            f"; Source: {args.input}",
+            "; DO NOT EDIT — regenerate from spawn layout",
+            f"; First object slot to draw each frame; stride {stride} over {slots} slots",
+            "; ==========================================================",
+            "",
+        ]
+        if args.segment:
+            out += [f'.segment "{args.segment}"', ""]
+        out.append(f"sprite_rotation_len = {len(schedule)}")
+        out.append(".export sprite_rotation_len, sprite_rotation")
+        out.append("sprite_rotation:")
+        for i in range(0, len(schedule), 16):
+            out.append("    .byte " + ", ".join(str(v) for v in schedule[i:i + 16]))
+        out.append("")
+        with nestrace.phase("write"):
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.output).write_text("\n".join(out))
+
+    print(f"OK: {len(screens)} screens, {slots} slots, stride {stride}, "
+          f"longest dropped run {run} frames" + (f" → {args.output}" if args.output else ""))
+
+
+if __name__ == "__main__":
+    main()
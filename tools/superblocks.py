@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+superblocks.py — Compile a map region into 32x32 superblocks of 2x2 metatiles.
+
+A screen stored as metatiles costs 240 bytes. Superblocks group 2x2
+metatiles on attribute-byte boundaries, so a screen is 8x8 superblock
+indices and each superblock carries its attribute byte precomputed (TL
+palette in bits 0-1, TR 2-3, BL 4-5, BR 6-7). The eighth superblock row
+covers only metatile row 14; its bottom half is padded with a copy of the
+top and ignored (the attribute bits 4-7 of that row are off screen), and
+it may use any superblock with the same top pair.
+
+Selection is frequency-greedy over every screen of the map: all 2x2 blocks
+are counted in one pass and the most frequent ones, up to 255, enter the
+table. A block seen once costs no more as an escape than as an entry, so
+only blocks seen at least twice are kept. Blocks left out are written
+inline after the $FF escape: TL, TR, BL, BR, attribute.
+
+Outputs:
+- {name}_sb_tl/_tr/_bl/_br/_attr: parallel superblock arrays
+- {name}_sb_screen_N: 64 indices per screen, row-major (escapes inline),
+  identical screens shared, indexed by {name}_sb_screens_lo/hi
+
+Usage:
+  python3 superblocks.py assets/maps/overworld_map.json build/overworld_sb.s
+  python3 superblocks.py map.json out.s --max-blocks 128 --segment PRG_BANK_05
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import nestrace
+from collision_maps import attr_table
+from nesmap import ATTR_ROWS, SCREEN_CELLS, SCREEN_COLS, SCREEN_ROWS, load_map, metatiles_path
+
+
+ESCAPE = 0xFF
+MAX_BLOCKS = 255
+ENTRY_BYTES = 5             # 4 metatiles + attribute
+
+
+def screen_blocks(m: dict) -> np.ndarray:
+    """(screens, 8, 8) uint32 keys: TL | TR << 8 | BL << 16 | BR << 24."""
+    cells = np.array(m["screens"], dtype=np.uint32).reshape(-1, SCREEN_ROWS, SCREEN_COLS)
+    cells = np.concatenate([cells, cells[:, -1:]], axis=1)          # pad row 15 = row 14
+    tl, tr = cells[:, 0::2, 0::2], cells[:, 0::2, 1::2]
+    bl, br = cells[:, 1::2, 0::2], cells[:, 1::2, 1::2]
+    return tl | tr << 8 | bl << 16 | br << 24
+
+
+def select_blocks(keys: np.ndarray, limit: int) -> np.ndarray:
+    """Most frequent block keys (seen at least twice), most frequent first."""
+    values, counts = np.unique(keys, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    chosen = order[counts[order] >= 2][:limit]
+    return values[chosen]
+
+
+def block_attr(keys, palettes: np.ndarray):
+    """Attribute byte of each block key."""
+    keys = np.asarray(keys, dtype=np.uint32)
+    attr = np.zeros(keys.shape, dtype=np.uint8)
+    for shift in range(4):
+        attr |= (palettes[(keys >> (8 * shift)) & 0xFF] & 0x03) << (2 * shift)
+    return attr
+
+
+def encode_screens(blocks: np.ndarray, table: np.ndarray, palettes: np.ndarray) -> tuple:
+    """Encode every screen. Returns ([bytes per screen], escape count)."""
+    index = {int(k): i for i, k in enumerate(table)}
+    top_index = {}
+    for i, k in enumerate(table):
+        top_index.setdefault(int(k) & 0xFFFF, i)                # most frequent first
+    streams, escapes = [], 0
+    for screen in blocks:
+        out = bytearray()
+        for r, row in enumerate(screen):
+            for key in row.tolist():
+                i = index.get(key)
+                if i is None and r == ATTR_ROWS - 1:
+                    i = top_index.get(key & 0xFFFF)
+                if i is not None:
+                    out.append(i)
+                    continue
+                escapes += 1
+                out.append(ESCAPE)
+                out += key.to_bytes(4, "little")
+                out.append(int(block_attr(key, palettes)))
+        streams.append(bytes(out))
+    return streams, escapes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a map into 2x2-metatile superblocks")
+    parser.add_argument("input", help="Map JSON (see nesmap.py)")
+    parser.add_argument("output", help="Output .s assembly file")
+    parser.add_argument("--metatiles", type=str, default=None,
+                        help="Metatile JSON (default: the map's own metatiles path)")
+    parser.add_argument("--max-blocks", type=int, default=MAX_BLOCKS,
+                        help=f"Superblock table size limit (default and maximum: {MAX_BLOCKS})")
+    parser.add_argument("--segment", type=str, default=None, help="Segment name for the data")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("superblocks", args)
+
+    if not 1 <= args.max_blocks <= MAX_BLOCKS:
+        parser.error(f"--max-blocks must be 1-{MAX_BLOCKS} (${ESCAPE:02X} is the escape)")
+
+    with nestrace.phase("load"):
+        try:
+            m = load_map(args.input)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        mt_path = Path(args.metatiles) if args.metatiles else metatiles_path(m, args.input)
+        palettes = attr_table(json.loads(mt_path.read_text())["metatiles"]) & 0x03
+
+    with nestrace.phase("select"):
+        blocks = screen_blocks(m)
+        table = select_blocks(blocks, args.max_blocks)
+
+    with nestrace.phase("encode"):
+        streams, escapes = encode_screens(blocks, table, palettes)
+        attrs = block_attr(table, palettes)
+
+    name = m["name"]
+    unique = {}
+    labels = []
+    for stream in streams:
+        if stream not in unique:
+            unique[stream] = f"{name}_sb_screen_{len(unique)}"
+        labels.append(unique[stream])
+
+    out = [
+        "; ==========================================================",
+        "; Superblocks — auto-generated by superblocks.py",
+        f"; Source: {args.input}",
+        "; DO NOT EDIT — regenerate from map JSON",
+        "; Superblock = 2x2 metatiles (32x32 px) + attribute byte",
+        f"; Screens: 8x8 indices, row-major; ${ESCAPE:02X} = inline TL, TR, BL, BR, attr",
+        "; ==========================================================",
+        "",
+    ]
+    if args.segment:
+        out += [f'.segment "{args.segment}"', ""]
+    out.append(f"{name}_sb_count = {len(table)}")
+    out.append(f"{name}_sb_escape = ${ESCAPE:02X}")
+    out.append(f".export {name}_sb_count, {name}_sb_escape")
+    out.append("")
+    columns = [("tl", table & 0xFF), ("tr", table >> 8 & 0xFF),
+               ("bl", table >> 16 & 0xFF), ("br", table >> 24), ("attr", attrs)]
+    for suffix, values in columns:
+        out.append(f".export {name}_sb_{suffix}")
+        out.append(f"{name}_sb_{suffix}:")
+        values = [int(v) for v in values]
+        for i in range(0, len(values), 16):
+            out.append("    .byte " + ", ".join(f"${v:02X}" for v in values[i:i + 16]))
+        out.append("")
+    for stream, label in unique.items():
+        out.append(f"{label}:")
+        for i in range(0, len(stream), 16):
+            out.append("    .byte " + ", ".join(f"${v:02X}" for v in stream[i:i + 16]))
+    out.append("")
+    out.append(f".export {name}_sb_screens_lo, {name}_sb_screens_hi")
+    out.append(f"{name}_sb_screens_lo:")
+    out.extend(f"    .byte <{label}" for label in labels)
+    out.append(f"{name}_sb_screens_hi:")
+    out.extend(f"    .byte >{label}" for label in labels)
+    out.append("")
+
+    with nestrace.phase("write"):
+        Path(args.output).write_text("\n".join(out))
+
+    screens = len(streams)
+    raw = screens * SCREEN_CELLS
+    table_bytes = len(table) * ENTRY_BYTES
+    stream_bytes = sum(len(s) for s in unique)
+    total = table_bytes + stream_bytes + 2 * screens
+    distinct = len(np.unique(blocks))
+    print(f"  blocks:  {blocks.size} placed, {distinct} distinct, {len(table)} in table, "
+          f"{escapes} escaped")
+    print(f"  table:   {table_bytes} bytes; screens: {len(unique)} unique, {stream_bytes} bytes "
+          f"+ {2 * screens} B pointers")
+    print(f"  metatile screens {raw} bytes → {total} bytes ({raw / max(total, 1):.1f}x), "
+          f"attributes included")
+    if total >= raw:
+        print(f"WARN: superblocks do not pay off for {name}: too few recurring 2x2 blocks",
+              file=sys.stderr)
+    print(f"OK: {screens} screens → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,26 @@ NES text encoding:
 - Characters A-Z map to tile indices $41-$5A (matching ASCII layout in font).
 - Numbers 0-9 map to $30-$39.
 - Space = $20, ! = $21, ? = $3F, . = $2E, , = $2C, ' = $27, - = $2D
+- --charmap replaces this layout with a compact one from font_subset.py.
+
+Layout: lines are limited to 28 characters and dialogs to one 4-line box.
+With --paginate, longer dialogs are split into box-sized pages, and each page
+is emitted ready to stream into ppu_buf_put: per line the nametable address
+(hi, lo), the length and the tiles, then $00. Page pointer tables and
+per-string first-page/page-count tables replace the runtime $FE/$FF scan.
+
+Banks: with --banks, strings are placed in switchable PRG bank segments
+(PRG_BANK_NN, mapped at $8000 through mmc3_set_prg_8000), keeping each
+town / section together in one bank where it fits (first fit, in table
+order). Strings are not exported; an .inc of TEXT_<ID> index constants is
+written instead, text_table_bank gives each string's bank, and the pointer
+tables stay in --segment so they are always mapped.
 
 Usage:
   python3 text2asm.py dialog.json dialog.s
+  python3 text2asm.py dialog.json dialog.s --charmap build/font_charmap.json
+  python3 text2asm.py dialog.json dialog.s --paginate --box-x 2 --box-y 20
+  python3 text2asm.py dialog.json dialog.s --banks 0-3
 """
 
 import argparse
@@ -19,6 +36,8 @@ import json
 import sys
 from pathlib import Path
 
+import nestrace
+
 
 # NES tile mapping for printable characters
 CHAR_MAP = {}
@@ -40,24 +59,50 @@ CHAR_MAP[':'] = 0x3A
 
 NEWLINE_CODE = 0xFE
 END_DIALOG_CODE = 0xFF
+PAGE_END_CODE = 0x00        # --paginate: addr_hi of 0 ends a page
+
+# Dialog box layout (see "encoding" in assets/text/dialog.json)
+MAX_LINE_CHARS = 28
+LINES_PER_BOX = 4
+NAMETABLE_BASE = 0x2000
+NAMETABLE_COLS = 32
+NAMETABLE_ROWS = 30
+
+SECTION_TITLES = {"signs": "Signs", "items": "Item Pickups", "story": "Story"}
+
 
+def load_charmap(path: str) -> dict:
+    """Load a character map written by font_subset.py (char -> tile index)."""
+    return json.loads(Path(path).read_text())["chars"]
 
-def encode_text(text: str) -> list:
+
+def dialog_sections(data: dict):
+    """Yield (section, dialog) for every dialog in table order: npcs by town, then signs, items, story."""
+    for town, dialogs in data.get("npcs", {}).items():
+        for dialog in dialogs:
+            yield town, dialog
+    for section in ("signs", "items", "story"):
+        for dialog in data.get(section, []):
+            yield section, dialog
+
+
+def encode_text(text: str, char_map: dict = CHAR_MAP) -> list:
     """Encode a string to NES tile indices."""
     result = []
+    space = char_map.get(' ', 0x20)
     for ch in text.upper():
-        if ch in CHAR_MAP:
-            result.append(CHAR_MAP[ch])
+        if ch in char_map:
+            result.append(char_map[ch])
         else:
-            result.append(0x20)  # Unknown → space
+            result.append(space)  # Unknown → space
     return result
 
 
-def encode_dialog(lines: list) -> list:
+def encode_dialog(lines: list, char_map: dict = CHAR_MAP) -> list:
     """Encode a multi-line dialog to NES format."""
     result = []
     for i, line in enumerate(lines):
-        result.extend(encode_text(line))
+        result.extend(encode_text(line, char_map))
         if i < len(lines) - 1:
             result.append(NEWLINE_CODE)
     result.append(END_DIALOG_CODE)
@@ -74,95 +119,221 @@ def format_bytes(data: list, per_line: int = 16) -> str:
     return "\n".join(lines)
 
 
-def main():
+def paginate(lines: list) -> list:
+    """Split a dialog's lines into dialog-box pages of LINES_PER_BOX lines."""
+    return [lines[i:i + LINES_PER_BOX] for i in range(0, len(lines), LINES_PER_BOX)] or [[]]
+
+
+def validate_dialog(dialog: dict, allow_pages: bool) -> list:
+    """Return layout errors for one dialog (line width, and box height unless paginating)."""
+    errors = []
+    for n, line in enumerate(dialog["lines"]):
+        if len(line) > MAX_LINE_CHARS:
+            errors.append(f"{dialog['id']}: line {n + 1} has {len(line)} chars "
+                          f"(max {MAX_LINE_CHARS}): {line!r}")
+    if not allow_pages and len(dialog["lines"]) > LINES_PER_BOX:
+        errors.append(f"{dialog['id']}: {len(dialog['lines'])} lines exceed one "
+                      f"{LINES_PER_BOX}-line box (use --paginate)")
+    return errors
+
+
+def line_address(box_x: int, box_y: int, line_step: int, line: int) -> int:
+    """Nametable 0 address of the first tile of a dialog-box line."""
+    return NAMETABLE_BASE + (box_y + line * line_step) * NAMETABLE_COLS + box_x
+
+
+def encode_page(lines: list, args, char_map: dict) -> list:
+    """Encode one page as (addr_hi, addr_lo, len, chars...) records ending in $00.
+
+    Returns one byte list per line, the last one followed by the terminator.
+    """
+    records = []
+    for i, line in enumerate(lines):
+        addr = line_address(args.box_x, args.box_y, args.line_step, i)
+        chars = encode_text(line, char_map)
+        records.append([addr >> 8, addr & 0xFF, len(chars)] + chars)
+    records.append([PAGE_END_CODE])
+    return records
+
+
+def parse_banks(spec: str) -> list:
+    """Parse a bank list such as "0-3" or "2,4,6-7"."""
+    banks = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        banks.extend(range(int(first), int(last or first) + 1))
+    return banks
+
+
+def assign_banks(strings: list, banks: list, bank_size: int) -> tuple:
+    """First-fit whole sections into banks, splitting a section only if no bank can hold it.
+
+    strings is [(section, label, body, size)] in table order. Returns (bank
+    number per string, bytes used per bank).
+    """
+    used = {bank: 0 for bank in banks}
+    result = [None] * len(strings)
+    groups = {}
+    for i, (section, _label, _body, _size) in enumerate(strings):
+        groups.setdefault(section, []).append(i)
+
+    def place(size):
+        for bank in banks:
+            if used[bank] + size <= bank_size:
+                used[bank] += size
+                return bank
+        return None
+
+    for section, members in groups.items():
+        bank = place(sum(strings[i][3] for i in members))
+        if bank is not None:
+            for i in members:
+                result[i] = bank
+            continue
+        for i in members:
+            bank = place(strings[i][3])
+            if bank is None:
+                raise ValueError(f"{strings[i][1]} ({strings[i][3]} bytes) does not fit in "
+                                 f"banks {', '.join(map(str, banks))}")
+            result[i] = bank
+    return result, used
+
+
+def section_title(section: str) -> str:
+    return SECTION_TITLES.get(section, section)
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Convert dialog JSON to ca65 assembly")
     parser.add_argument("input", help="Input JSON file")
     parser.add_argument("output", help="Output .s assembly file")
     parser.add_argument("--segment", type=str, default="PRG_FIXED_C",
                         help="Segment name (default: PRG_FIXED_C)")
-    args = parser.parse_args()
+    parser.add_argument("--charmap", type=str, default=None,
+                        help="Character map JSON from font_subset.py (default: ASCII layout)")
+    parser.add_argument("--banks", type=parse_banks, default=None,
+                        help="Spread strings over these switchable PRG banks, e.g. 0-3; "
+                             "tables stay in --segment")
+    parser.add_argument("--bank-segment", type=str, default="PRG_BANK_{:02d}",
+                        help="Segment name format for --banks (default: PRG_BANK_{:02d})")
+    parser.add_argument("--bank-size", type=int, default=8192,
+                        help="Bytes available per bank (default: 8192)")
+    parser.add_argument("--ids", type=str, default=None,
+                        help="With --banks: .inc of TEXT_<ID> string indices "
+                             "(default: output with .inc suffix)")
+    parser.add_argument("--paginate", action="store_true",
+                        help="Emit pre-laid-out dialog-box pages instead of $FE/$FF strings")
+    parser.add_argument("--box-x", type=int, default=2,
+                        help="Dialog box text column in tiles (default: 2)")
+    parser.add_argument("--box-y", type=int, default=20,
+                        help="Dialog box first text row in tiles (default: 20)")
+    parser.add_argument("--line-step", type=int, default=2,
+                        help="Rows between text lines (default: 2)")
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("text2asm", args)
+
+    with nestrace.phase("load"):
+        data = json.loads(Path(args.input).read_text())
+        char_map = load_charmap(args.charmap) if args.charmap else CHAR_MAP
+
+    errors = []
+    for _section, dialog in dialog_sections(data):
+        errors.extend(validate_dialog(dialog, args.paginate))
+    last_row = args.box_y + (LINES_PER_BOX - 1) * args.line_step
+    if args.paginate and (args.box_x + MAX_LINE_CHARS > NAMETABLE_COLS or last_row >= NAMETABLE_ROWS):
+        errors.append(f"dialog box at ({args.box_x}, {args.box_y}) with line step "
+                      f"{args.line_step} does not fit the nametable")
+    if errors:
+        for e in errors:
+            print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    data = json.loads(Path(args.input).read_text())
+    nestrace.begin("format")
     out = []
 
     out.append("; ==========================================================")
     out.append("; Dialog Text Data — auto-generated by text2asm.py")
     out.append(f"; Source: {args.input}")
     out.append("; DO NOT EDIT — regenerate from JSON source")
-    out.append("; Encoding: tile indices. $FE=newline, $FF=end of dialog")
+    if args.paginate:
+        out.append("; Encoding: pages of line records: addr_hi, addr_lo, len, tiles...;")
+        out.append(f";   ${PAGE_END_CODE:02X} ends a page. Box at ({args.box_x}, {args.box_y}), "
+                   f"{LINES_PER_BOX} lines, step {args.line_step}")
+    else:
+        out.append("; Encoding: tile indices. $FE=newline, $FF=end of dialog")
+    if args.charmap:
+        out.append(f"; Character map: {args.charmap}")
     out.append("; ==========================================================")
     out.append("")
-    out.append(f'.segment "{args.segment}"')
-    out.append("")
+    if args.banks is None:
+        out.append(f'.segment "{args.segment}"')
+        out.append("")
 
     total_bytes = 0
+    strings = []            # (section, label, body lines, size)
+    page_labels = []
+    first_page = []
+    page_count = []
 
-    # NPC dialogs
-    if "npcs" in data:
-        for town, dialogs in data["npcs"].items():
-            out.append(f"; --- {town} ---")
-            for dialog in dialogs:
-                label = f"text_{dialog['id']}"
-                encoded = encode_dialog(dialog["lines"])
-                total_bytes += len(encoded)
-                out.append(f".export {label}")
-                out.append(f"{label}:")
-                out.append(format_bytes(encoded))
-                out.append("")
-
-    # Signs
-    if "signs" in data:
-        out.append("; --- Signs ---")
-        for sign in data["signs"]:
-            label = f"text_{sign['id']}"
-            encoded = encode_dialog(sign["lines"])
-            total_bytes += len(encoded)
-            out.append(f".export {label}")
-            out.append(f"{label}:")
-            out.append(format_bytes(encoded))
-            out.append("")
+    for section, dialog in dialog_sections(data):
+        label = f"text_{dialog['id']}"
+        body = [f"{label}:"]
+        if not args.paginate:
+            encoded = encode_dialog(dialog["lines"], char_map)
+            body.append(format_bytes(encoded))
+            size = len(encoded)
+        else:
+            pages = paginate(dialog["lines"])
+            first_page.append(len(page_labels))
+            page_count.append(len(pages))
+            size = 0
+            for n, page in enumerate(pages):
+                page_label = f"{label}_p{n}"
+                page_labels.append(page_label)
+                body.append(f"{page_label}:")
+                for record in encode_page(page, args, char_map):
+                    size += len(record)
+                    body.append(format_bytes(record))
+        total_bytes += size
+        strings.append((section, label, body, size))
+    all_labels = [label for _section, label, _body, _size in strings]
 
-    # Item pickups
-    if "items" in data:
-        out.append("; --- Item Pickups ---")
-        for item in data["items"]:
-            label = f"text_{item['id']}"
-            encoded = encode_dialog(item["lines"])
-            total_bytes += len(encoded)
+    if args.banks is None:
+        current = None
+        for section, label, body, _size in strings:
+            if section != current:
+                out.append(f"; --- {section_title(section)} ---")
+                current = section
             out.append(f".export {label}")
-            out.append(f"{label}:")
-            out.append(format_bytes(encoded))
+            out.extend(body)
             out.append("")
-
-    # Story text
-    if "story" in data:
-        out.append("; --- Story ---")
-        for entry in data["story"]:
-            label = f"text_{entry['id']}"
-            encoded = encode_dialog(entry["lines"])
-            total_bytes += len(encoded)
-            out.append(f".export {label}")
-            out.append(f"{label}:")
-            out.append(format_bytes(encoded))
+    else:
+        try:
+            string_banks, used = assign_banks(strings, args.banks, args.bank_size)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        for bank in args.banks:
+            members = [i for i, b in enumerate(string_banks) if b == bank]
+            if not members:
+                continue
+            out.append(f'.segment "{args.bank_segment.format(bank)}"')
+            out.append(f"; Bank {bank}: {used[bank]} / {args.bank_size} bytes")
             out.append("")
+            current = None
+            for i in members:
+                section, _label, body, _size = strings[i]
+                if section != current:
+                    out.append(f"; --- {section_title(section)} ---")
+                    current = section
+                out.extend(body)
+                out.append("")
+        out.append(f'.segment "{args.segment}"')
+        out.append("")
 
     # String table (pointer table for indexed lookup)
     out.append("; --- String Pointer Table ---")
-    all_labels = []
-    if "npcs" in data:
-        for town, dialogs in data["npcs"].items():
-            for dialog in dialogs:
-                all_labels.append(f"text_{dialog['id']}")
-    if "signs" in data:
-        for sign in data["signs"]:
-            all_labels.append(f"text_{sign['id']}")
-    if "items" in data:
-        for item in data["items"]:
-            all_labels.append(f"text_{item['id']}")
-    if "story" in data:
-        for entry in data["story"]:
-            all_labels.append(f"text_{entry['id']}")
-
     out.append(f"; Total: {len(all_labels)} strings, {total_bytes} bytes")
     out.append(f".export text_table_lo, text_table_hi")
     out.append("text_table_lo:")
@@ -171,11 +342,45 @@ def main():
     out.append("text_table_hi:")
     for label in all_labels:
         out.append(f"    .byte >{label}")
+    if args.banks is not None:
+        out.append(".export text_table_bank")
+        out.append("text_table_bank:")
+        out.append(format_bytes(string_banks))
     out.append("")
 
+    if args.paginate:
+        if len(page_labels) > 256:
+            print(f"ERROR: {len(page_labels)} pages exceed the 256 indexable by "
+                  f"text_first_page", file=sys.stderr)
+            sys.exit(1)
+        out.append("; --- Page Tables ---")
+        out.append(f"; {len(page_labels)} pages. String i shows pages "
+                   f"text_first_page[i] .. + text_page_count[i] - 1")
+        out.append(".export text_page_lo, text_page_hi, text_first_page, text_page_count")
+        out.append("text_page_lo:")
+        for label in page_labels:
+            out.append(f"    .byte <{label}")
+        out.append("text_page_hi:")
+        for label in page_labels:
+            out.append(f"    .byte >{label}")
+        out.append("text_first_page:")
+        out.append(format_bytes(first_page))
+        out.append("text_page_count:")
+        out.append(format_bytes(page_count))
+        out.append("")
+
     output = "\n".join(out)
-    Path(args.output).write_text(output)
-    print(f"OK: {len(all_labels)} strings, {total_bytes} text bytes → {args.output}")
+    nestrace.end()
+
+    with nestrace.phase("write"):
+        Path(args.output).write_text(output)
+        if args.banks is not None:
+            ids_path = Path(args.ids) if args.ids else Path(args.output).with_suffix(".inc")
+            ids = [f"; String indices for {args.output} — auto-generated by text2asm.py"]
+            ids += [f"{label.upper()} = {i}" for i, label in enumerate(all_labels)]
+            ids_path.write_text("\n".join(ids) + "\n")
+    pages = f", {len(page_labels)} pages" if args.paginate else ""
+    print(f"OK: {len(all_labels)} strings{pages}, {total_bytes} text bytes → {args.output}")
 
 
 if __name__ == "__main__":
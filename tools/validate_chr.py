@@ -7,6 +7,8 @@ Checks:
 - File size is a multiple of 1024 bytes (each CHR bank = 1KB = 64 tiles)
 - Optional: check that file fits in specified number of banks
 - Reports tile count and bank count
+- Reports unique and blank tiles, and warns about entirely blank banks with
+  used banks after them (trailing blank banks are padding and only counted)
 
 Usage:
   python3 validate_chr.py file.chr
@@ -18,6 +20,9 @@ import argparse
 import sys
 from pathlib import Path
 
+import nestrace
+from nesasset import BANK_BYTES, TILE_BYTES, tile_keys
+
 
 def validate_chr(filepath: str, max_banks: int = 0) -> bool:
     """Validate a single CHR file. Returns True if valid."""
@@ -46,26 +51,44 @@ def validate_chr(filepath: str, max_banks: int = 0) -> bool:
         print(f"FAIL: {filepath} — {banks:.1f} banks exceeds max {max_banks}")
         return False
 
+    data = path.read_bytes()
+    keys = tile_keys(data)
+    unique = len(set(keys))
+    blank = keys.count(bytes(TILE_BYTES))
+    empty_banks = [b for b in range(-(-len(data) // BANK_BYTES))
+                   if not any(data[b * BANK_BYTES:(b + 1) * BANK_BYTES])]
+    # Banks up to the last one holding data; blank banks past it are padding
+    used_banks = -(-len(data.rstrip(b"\x00")) // BANK_BYTES)
+    gaps = [b for b in empty_banks if b < used_banks]
+    if gaps:
+        warnings.append(f"blank banks: {', '.join(str(b) for b in gaps)}")
+    padding = len(empty_banks) - len(gaps)
+    padding_str = f", {padding} blank padding" if padding else ""
+
     status = "OK"
     warn_str = ""
     if warnings:
         warn_str = " [WARN: " + "; ".join(warnings) + "]"
 
-    print(f"{status}: {filepath} — {tiles} tiles, {size} bytes ({banks:.1f} banks){warn_str}")
+    print(f"{status}: {filepath} — {tiles} tiles ({unique} unique, {blank} blank), "
+          f"{size} bytes ({banks:.1f} banks{padding_str}){warn_str}")
     return True
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Validate NES CHR files")
     parser.add_argument("files", nargs="+", help="CHR files to validate")
     parser.add_argument("--max-banks", type=int, default=0,
                         help="Maximum number of 1KB CHR banks allowed (0=no limit)")
-    args = parser.parse_args()
+    nestrace.add_argument(parser)
+    args = parser.parse_args(argv)
+    nestrace.setup("validate_chr", args)
 
     all_ok = True
     for f in args.files:
-        if not validate_chr(f, args.max_banks):
-            all_ok = False
+        with nestrace.phase("validate", {"file": f}):
+            if not validate_chr(f, args.max_banks):
+                all_ok = False
 
     if not all_ok:
         sys.exit(1)